@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import ctypes
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Final
+
+HERE: Final[Path] = Path(__file__).resolve().parent
+BASELINE: Final[Path] = HERE / "bench_baseline.json"
+
+
+class _FakeFn:
+    def __init__(self) -> None:
+        self.argtypes: Any = None
+        self.restype: Any = None
+
+    def __call__(self, *args: Any) -> int:
+        return 0
+
+
+class _FakeDLL:
+    def __init__(self, name: str, *args: Any, **kwargs: Any) -> None:
+        self._name: str = name
+        self._fns: dict[str, _FakeFn] = {}
+
+    def __getattr__(self, nm: str) -> _FakeFn:
+        if nm.startswith("_"):
+            raise AttributeError(nm)
+        return self._fns.setdefault(nm, _FakeFn())
+
+
+def _stub_win32() -> None:
+    if sys.platform == "win32":
+        return
+    setattr(ctypes, "WinDLL", _FakeDLL)
+    if not hasattr(ctypes, "WINFUNCTYPE"):
+        setattr(ctypes, "WINFUNCTYPE", ctypes.CFUNCTYPE)
+
+
+_stub_win32()
+sys.path.insert(0, str(HERE))
+
+import encodepool  # noqa: E402
+import franz  # noqa: E402
+import ghostring  # noqa: E402
+import pipeline  # noqa: E402
+
+SMALL: Final[str] = json.dumps({
+    "observation": "The login dialog is open. The username field is focused.",
+    "regions": [{"bbox_2d": [400, 300, 600, 340], "label": "username"}, {"bbox_2d": [400, 360, 600, 400], "label": "password"}],
+    "actions": [{"type": "click", "bbox_2d": [400, 300, 600, 340]}, {"type": "type", "bbox_2d": [400, 300, 600, 340], "params": "admin"}],
+})
+
+LARGE: Final[str] = json.dumps({
+    "observation": " ".join(f"Step {i}: the board changed near square {i % 64}; keep the plan and watch the clock." for i in range(400)),
+    "regions": [{"bbox_2d": [i % 900, i * 7 % 900, i % 900 + 60, i * 7 % 900 + 40], "label": f"piece {i}"} for i in range(200)],
+    "actions": [{"type": "drag_start" if i % 2 == 0 else "drag_end", "bbox_2d": [i * 3 % 950, i * 5 % 950, i * 3 % 950 + 40, i * 5 % 950 + 40]} for i in range(100)],
+})
+
+MALFORMED: Final[str] = (
+    "Sure! Here is my answer:\n```json\n{'observation': 'The menu is open, the File item is highlighted',\n"
+    "'regions': [{'bbox_2d': [10, 10, 120, 40], 'label': 'File',},],\n"
+    "'actions': [{'type': 'click', 'bbox_2d': [10, 10, 120, 40], 'params': None,},\n"
+    "{'type': 'type', 'bbox_2d': [10, 50, 300, 80], 'params': 'hello wor"
+)
+
+
+def _frame(w: int, h: int) -> bytes:
+    row: bytes = bytes((x * 7 + 13) & 0xFF for x in range(w * 4))
+    return b"".join(row[(y % 97) * 4:] + row[:(y % 97) * 4] for y in range(h))
+
+
+def _geo(w: int, h: int) -> franz.Geometry:
+    return franz.Geometry(version=0, screen_w=w, screen_h=h, crop=(0, 0, w, h), out_w=w, out_h=h)
+
+
+def _fill_ring(n: int) -> None:
+    franz.GHOST_RING = ghostring.GhostRing()
+    for i in range(n):
+        x, y = i * 37 % 900, i * 53 % 900
+        franz.GHOST_RING.add(ghostring.Ghost(bbox_2d=[x, y, x + 80, y + 50], turn=i % 10, image_b64="A" * 4000, label=f"g{i}"))
+
+
+class _Writer:
+    def __init__(self) -> None:
+        self.n: int = 0
+
+    def write(self, data: bytes) -> None:
+        self.n += len(data)
+
+    async def drain(self) -> None:
+        return None
+
+
+def _server_bench(path: str) -> Callable[[], None]:
+    loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    franz.S = franz.State()
+    franz.S.raw = encodepool.Frame.from_b64("A" * 400_000)
+    franz.S.observation = json.loads(LARGE)["observation"]
+    franz.S.actions_data = json.loads(LARGE)["actions"]
+    franz.S.heat_data = franz.S.actions_data
+    franz.S.raw_display = {"observation": franz.S.observation, "regions": [], "actions": franz.S.actions_data}
+    srv: franz.Server = franz.Server("127.0.0.1", 0)
+    req: bytes = f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode()
+
+    async def one() -> None:
+        r: asyncio.StreamReader = asyncio.StreamReader()
+        r.feed_data(req)
+        r.feed_eof()
+        await srv._proc(r, _Writer())  # type: ignore[arg-type]
+
+    return lambda: loop.run_until_complete(one())
+
+
+def benchmarks() -> dict[str, Callable[[], Any]]:
+    b: dict[str, Callable[[], Any]] = {}
+    for name, raw in (("small", SMALL), ("large", LARGE), ("malformed", MALFORMED)):
+        b[f"pipeline.process[{name}]"] = lambda raw=raw: pipeline.process(raw)
+        res: pipeline.PipelineResult = pipeline.process(raw)
+        b[f"pipeline.to_json[{name}]"] = lambda res=res: pipeline.to_json(res)
+    for name, (w, h) in (("512x288", (512, 288)), ("1280x720", (1280, 720)), ("4k", (3840, 2160))):
+        frame: bytes = _frame(w, h)
+        geo: franz.Geometry = _geo(w, h)
+        b[f"png_bgra[{name}]"] = lambda frame=frame, w=w, h=h: encodepool.png_bgra(frame, w, h)
+        b[f"crop_bgra[{name}]"] = lambda frame=frame, w=w, h=h: encodepool.crop_bgra(frame, w, h, w // 4, h // 4, w * 3 // 4, h * 3 // 4)
+        b[f"_bbox_crop_b64[{name}]"] = lambda frame=frame, geo=geo: franz._bbox_crop_b64(frame, geo, [300, 300, 500, 450])
+    for n in (12, 200, 1000):
+        b[f"_ghosts_for_overlay[{n}]"] = lambda n=n: (_fill_ring(n) if len(franz.GHOST_RING) != n else None, franz._ghosts_for_overlay(10))
+    b["server[/state]"] = _server_bench("/state")
+    b["server[/frame]"] = _server_bench("/frame")
+    return b
+
+
+def measure(fn: Callable[[], Any], min_time: float, repeats: int) -> dict[str, Any]:
+    fn()
+    n: int = 1
+    while True:
+        t0: float = time.perf_counter()
+        for _ in range(n):
+            fn()
+        dt: float = time.perf_counter() - t0
+        if dt >= min_time or n >= 1 << 20:
+            break
+        n *= 2 if dt <= 0 else max(2, min(10, int(min_time / dt) + 1))
+    runs: list[float] = [dt / n]
+    for _ in range(repeats - 1):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        runs.append((time.perf_counter() - t0) / n)
+    return {"us": round(statistics.median(runs) * 1e6, 3), "min_us": round(min(runs) * 1e6, 3), "n": n, "repeats": repeats}
+
+
+def run(filt: str, min_time: float, repeats: int) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    for name, fn in benchmarks().items():
+        if filt and filt not in name:
+            continue
+        results[name] = measure(fn, min_time, repeats)
+        print(f"{name:40s} {results[name]['us']:>14.1f} us", file=sys.stderr)
+    return {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+
+
+def mismatch(cur: dict[str, Any], base: dict[str, Any]) -> list[str]:
+    a: dict[str, Any] = cur.get("meta", {})
+    b: dict[str, Any] = base.get("meta", {})
+    return [f"{k} {b.get(k)!r} != {a.get(k)!r}" for k in ("platform", "cpus", "python") if a.get(k) != b.get(k)]
+
+
+def compare(cur: dict[str, Any], base: dict[str, Any], threshold: float) -> list[str]:
+    bad: list[str] = []
+    for name, r in cur["results"].items():
+        b: Any = base.get("results", {}).get(name)
+        if not b:
+            print(f"{name:40s} {'new':>10s}", file=sys.stderr)
+            continue
+        pct: float = (r["us"] / b["us"] - 1) * 100 if b["us"] else 0.0
+        flag: str = "REGRESSION" if pct > threshold else ""
+        print(f"{name:40s} {b['us']:>12.1f} -> {r['us']:>12.1f} us {pct:+7.1f}% {flag}", file=sys.stderr)
+        if flag:
+            bad.append(name)
+    return bad
+
+
+def main() -> None:
+    ap: argparse.ArgumentParser = argparse.ArgumentParser(description="Franz hot-path micro-benchmarks")
+    ap.add_argument("-k", "--filter", default="", help="only benchmarks whose name contains this")
+    ap.add_argument("-o", "--out", help="write results JSON here")
+    ap.add_argument("--save-baseline", action="store_true", help=f"write results to {BASELINE.name}")
+    ap.add_argument("--compare", nargs="?", const=str(BASELINE), help="compare against a baseline JSON")
+    ap.add_argument("--threshold", type=float, default=25.0, help="allowed slowdown in percent")
+    ap.add_argument("--strict", action="store_true", help="fail on regressions even if the baseline machine differs")
+    ap.add_argument("--min-time", type=float, default=0.2)
+    ap.add_argument("--repeats", type=int, default=5)
+    a: argparse.Namespace = ap.parse_args()
+    cur: dict[str, Any] = run(a.filter, a.min_time, a.repeats)
+    text: str = json.dumps(cur, indent=2)
+    if a.out:
+        Path(a.out).write_text(text + "\n", "utf-8")
+    if a.save_baseline:
+        BASELINE.write_text(text + "\n", "utf-8")
+    if a.compare:
+        base: dict[str, Any] = json.loads(Path(a.compare).read_text("utf-8"))
+        bad: list[str] = compare(cur, base, a.threshold)
+        other: list[str] = mismatch(cur, base)
+        if other:
+            print(f"warning: baseline is from another machine ({'; '.join(other)}); "
+                  f"timings are not comparable, rerun with --save-baseline here", file=sys.stderr)
+        if bad:
+            print(f"{len(bad)} regression(s) over {a.threshold:g}%: {', '.join(bad)}", file=sys.stderr)
+            if not other or a.strict:
+                sys.exit(1)
+    if not a.out and not a.save_baseline:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import random
+import time
+from typing import Any
+
+
+def backoff(attempt: int, base: float = 1.0, cap: float = 30.0, rng: random.Random | None = None) -> float:
+    d: float = min(cap, base * 2 ** max(0, attempt - 1))
+    return d / 2 + (rng or random).uniform(0, d / 2)
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = 4, cooldown: float = 30.0, cooldown_max: float = 300.0) -> None:
+        self.threshold: int = max(1, threshold)
+        self.base_cooldown: float = cooldown
+        self.cooldown: float = cooldown
+        self.cooldown_max: float = max(cooldown, cooldown_max)
+        self.state: str = "closed"
+        self.failures: int = 0
+        self.opened_at: float = 0.0
+        self.opens: int = 0
+
+    def wait_s(self, now: float | None = None) -> float:
+        if self.state != "open":
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.opened_at + self.cooldown - now)
+
+    def allow(self, now: float | None = None) -> bool:
+        if self.state == "open" and self.wait_s(now) <= 0:
+            self.state = "half_open"
+        return self.state != "open"
+
+    def success(self) -> None:
+        self.state, self.failures, self.cooldown = "closed", 0, self.base_cooldown
+
+    def failure(self, now: float | None = None) -> None:
+        self.failures += 1
+        if self.state == "half_open":
+            self.cooldown = min(self.cooldown_max, self.cooldown * 2)
+        elif self.failures < self.threshold:
+            return
+        self.state = "open"
+        self.opened_at = time.monotonic() if now is None else now
+        self.opens += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "opens": self.opens,
+                "cooldown_s": self.cooldown, "retry_in_s": round(self.wait_s(), 2)}
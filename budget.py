@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Final
+
+_SENT: Final[re.Pattern[str]] = re.compile(r"(?<=[.!?])\s+")
+_LIST: Final[re.Pattern[str]] = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+_HEAD: Final[re.Pattern[str]] = re.compile(r"^\s*(?:#{1,6}\s*(?P<md>.+?)\s*$|(?P<lb>[A-Za-z][\w /-]{0,40}):)")
+ELLIPSIS: Final[str] = "\u2026"
+MIN_KEEP: Final[int] = 24
+
+
+class Estimator:
+    def __init__(self, chars_per_token: float = 4.0, decay: float = 0.9) -> None:
+        self.a: float = 1.0 / max(0.5, chars_per_token)
+        self.b: float = 0.0
+        self.decay: float = decay
+        self.samples: int = 0
+        self._s: list[float] = [0.0] * 5
+
+    def tokens(self, chars: int) -> int:
+        return int(self.a * chars + 0.5)
+
+    def prompt(self, chars: int) -> int:
+        return int(self.a * chars + self.b + 0.5)
+
+    def observe(self, chars: int, prompt_tokens: int) -> None:
+        d: float = self.decay
+        n, sx, sy, sxx, sxy = (v * d for v in self._s)
+        x: float = float(chars)
+        y: float = float(prompt_tokens)
+        self._s = [n + 1, sx + x, sy + y, sxx + x * x, sxy + x * y]
+        self.samples += 1
+        n, sx, sy, sxx, sxy = self._s
+        var: float = n * sxx - sx * sx
+        if self.samples >= 2 and var > 1e-6 * n * n:
+            self.a = min(2.0, max(0.05, (n * sxy - sx * sy) / var))
+        self.b = max(0.0, (sy - self.a * sx) / n)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"a": round(self.a, 5), "b": round(self.b, 1), "samples": self.samples}
+
+
+@dataclass
+class Section:
+    head: str
+    lines: list[str] = field(default_factory=list)
+    keep: bool = False
+
+
+def _sections(text: str, keep: tuple[str, ...]) -> list[Section]:
+    out: list[Section] = [Section("")]
+    lines: list[str] = text.splitlines()
+    alone: bool = sum(1 for line in lines if line.strip()) == 1
+    for line in lines:
+        m: re.Match[str] | None = _HEAD.match(line)
+        inline: bool = m is not None and m.group("lb") is not None and bool(line[m.end():].strip())
+        if m and not (inline and alone):
+            name: str = (m.group("md") or m.group("lb") or "").lower()
+            protect: bool = any(k in name for k in keep)
+            if not inline or protect:
+                out.append(Section(line, keep=protect))
+                if inline:
+                    out.append(Section(""))
+                continue
+        out[-1].lines.append(line)
+    return out
+
+
+def _join(secs: list[Section]) -> str:
+    parts: list[str] = []
+    for s in secs:
+        if s.head:
+            parts.append(s.head)
+        parts.extend(s.lines)
+    return "\n".join(parts).strip()
+
+
+def _dedupe(secs: list[Section]) -> int:
+    seen: set[str] = set()
+    dropped: int = 0
+    for s in secs:
+        lines: list[str] = []
+        for line in s.lines:
+            kept: list[str] = []
+            for sent in _SENT.split(line):
+                key: str = " ".join(sent.lower().split())
+                if key and key in seen:
+                    dropped += 1
+                    continue
+                if key:
+                    seen.add(key)
+                kept.append(sent)
+            if kept or not line.strip():
+                lines.append(" ".join(kept))
+        s.lines = lines
+    return dropped
+
+
+def _cap_lists(secs: list[Section], cap: int) -> int:
+    dropped: int = 0
+    for s in secs:
+        if s.keep:
+            continue
+        out: list[str] = []
+        run: list[str] = []
+        for line in s.lines + [""]:
+            if _LIST.match(line):
+                run.append(line)
+                continue
+            if len(run) > cap:
+                dropped += len(run) - cap
+                run = run[-cap:]
+            out.extend(run)
+            run = []
+            out.append(line)
+        s.lines = out[:-1]
+    return dropped
+
+
+def _cut(line: str, over: int) -> tuple[str, int, int]:
+    sents: list[str] = _SENT.split(line.strip())
+    dropped: int = 0
+    while len(sents) > 1 and over > 0:
+        over -= len(sents[0]) + 1
+        sents.pop(0)
+        dropped += 1
+    rest: str = " ".join(sents)
+    if over <= 0:
+        return rest, dropped, 0
+    tail: str = rest[-max(1, len(rest) - over - len(ELLIPSIS)):]
+    sp: int = tail.find(" ")
+    if 0 <= sp < len(tail) - 1:
+        tail = tail[sp + 1:]
+    return ELLIPSIS + tail, dropped, len(rest) - len(tail)
+
+
+def _trim(secs: list[Section], over: int) -> tuple[int, int, int]:
+    lines: int = 0
+    sents: int = 0
+    chars: int = 0
+    left: int = sum(1 for s in secs if not s.keep for line in s.lines if line.strip())
+    for s in secs:
+        if s.keep:
+            continue
+        while s.lines and over > 0:
+            line: str = s.lines[0]
+            if not line.strip():
+                over -= len(line) + 1
+                s.lines.pop(0)
+            elif left > 1 and len(line) - over < MIN_KEEP:
+                over -= len(line) + 1
+                s.lines.pop(0)
+                lines += 1
+                left -= 1
+            else:
+                s.lines[0], n, c = _cut(line, over)
+                over -= len(line) - len(s.lines[0])
+                sents += n
+                chars += c
+                break
+        if over <= 0:
+            break
+    return lines, sents, chars
+
+
+def compact(
+    text: str, budget: int, est: Estimator, list_cap: int = 8, keep: tuple[str, ...] = ("goal", "lesson"),
+) -> tuple[str, list[str]]:
+    if budget <= 0 or est.tokens(len(text)) <= budget:
+        return text, []
+    steps: list[str] = []
+    secs: list[Section] = _sections(text, keep)
+    n: int = _dedupe(secs)
+    if n:
+        steps.append(f"dedupe:{n}")
+    out: str = _join(secs)
+    if est.tokens(len(out)) > budget:
+        n = _cap_lists(secs, list_cap)
+        if n:
+            steps.append(f"list_cap:{n}")
+        out = _join(secs)
+    if est.tokens(len(out)) > budget:
+        lines, sents, chars = _trim(secs, len(out) - int(budget / est.a))
+        steps.extend(f"{k}:{n}" for k, n in (("trim_lines", lines), ("trim_sentences", sents), ("trim_chars", chars)) if n)
+        out = _join(secs) or text
+    if est.tokens(len(out)) > budget:
+        steps.append("over_budget")
+    return out, steps
@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import operator
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Final
+
+Rect = tuple[int, int, int, int]
+
+PNG_SIG: Final[bytes] = b"\x89PNG\r\n\x1a\n"
+BLOB: Final[str] = "\x00blob\x00"
+BLOB_JSON: Final[str] = json.dumps(BLOB)[1:-1]
+
+
+def crop_bgra(bgra: bytes, sw: int, sh: int, x1: int, y1: int, x2: int, y2: int) -> tuple[bytes, int, int]:
+    cw: int = x2 - x1
+    ch: int = y2 - y1
+    if cw <= 0 or ch <= 0 or (cw, ch) == (sw, sh):
+        return bytes(bgra), sw, sh
+    src: memoryview = memoryview(bgra)
+    out: bytearray = bytearray(cw * ch * 4)
+    ss: int = sw * 4
+    ds: int = cw * 4
+    for y in range(ch):
+        so: int = (y1 + y) * ss + x1 * 4
+        do: int = y * ds
+        out[do:do + ds] = src[so:so + ds]
+    return bytes(out), cw, ch
+
+
+def scale_bgra(bgra: bytes, sw: int, sh: int, dw: int, dh: int) -> bytes:
+    if (dw, dh) == (sw, sh) or dw <= 0 or dh <= 0:
+        return bytes(bgra)
+    src: memoryview = memoryview(bgra).cast("I")
+    cols: list[int] = [x * sw // dw for x in range(dw)]
+    pick: Callable[[Any], Any] = operator.itemgetter(*cols) if dw > 1 else (lambda r: (r[cols[0]],))
+    out: array[int] = array("I")
+    row: array[int] = array("I")
+    last: int = -1
+    for y in range(dh):
+        sy: int = y * sh // dh
+        if sy != last:
+            row = array("I", pick(src[sy * sw:(sy + 1) * sw]))
+            last = sy
+        out.extend(row)
+    return out.tobytes()
+
+
+def png_bgra(bgra: bytes, w: int, h: int, level: int = 6) -> bytes:
+    n: int = w * h
+    src: memoryview = memoryview(bgra)[:n * 4]
+    rgba: bytearray = bytearray(n * 4)
+    rgba[0::4] = src[2::4]
+    rgba[1::4] = src[1::4]
+    rgba[2::4] = src[0::4]
+    rgba[3::4] = b"\xff" * n
+    stride: int = w * 4
+    rows: bytearray = bytearray((stride + 1) * h)
+    mv: memoryview = memoryview(rgba)
+    for y in range(h):
+        o: int = y * (stride + 1) + 1
+        rows[o:o + stride] = mv[y * stride:(y + 1) * stride]
+
+    def ck(t: bytes, b: bytes) -> bytes:
+        c: bytes = t + b
+        return struct.pack(">I", len(b)) + c + struct.pack(">I", zlib.crc32(c) & 0xFFFFFFFF)
+
+    return (
+        PNG_SIG
+        + ck(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 6, 0, 0, 0))
+        + ck(b"IDAT", zlib.compress(rows, level))
+        + ck(b"IEND", b"")
+    )
+
+
+def png_b64(bgra: bytes, w: int, h: int, rect: Rect | None = None, level: int = 6) -> str:
+    if rect is not None:
+        x1, y1, x2, y2 = rect
+        if x2 - x1 <= 0 or y2 - y1 <= 0:
+            return ""
+        bgra, w, h = crop_bgra(bgra, w, h, x1, y1, x2, y2)
+    return base64.b64encode(png_bgra(bgra, w, h, level)).decode("ascii")
+
+
+def _shm_png_b64(name: str, size: int, w: int, h: int, rect: Rect | None, level: int) -> str:
+    shm: shared_memory.SharedMemory = shared_memory.SharedMemory(name)
+    try:
+        return png_b64(bytes(shm.buf[:size]), w, h, rect, level)
+    finally:
+        shm.close()
+
+
+def _shm_png(name: str, size: int, w: int, h: int, level: int) -> bytes:
+    shm: shared_memory.SharedMemory = shared_memory.SharedMemory(name)
+    try:
+        return png_bgra(bytes(shm.buf[:size]), w, h, level)
+    finally:
+        shm.close()
+
+
+def splice_json(obj: Any, blobs: list[bytes]) -> bytes:
+    parts: list[str] = json.dumps(obj, ensure_ascii=False).split(BLOB_JSON)
+    if len(parts) != len(blobs) + 1:
+        raise ValueError(f"{len(parts) - 1} blob slots for {len(blobs)} blobs")
+    out: list[bytes] = [parts[0].encode("utf-8")]
+    for b, p in zip(blobs, parts[1:]):
+        out += (b, p.encode("utf-8"))
+    return b"".join(out)
+
+
+class _Shared:
+    def __init__(self, data: bytes) -> None:
+        self.shm: shared_memory.SharedMemory = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        self.shm.buf[:len(data)] = data
+        self.size: int = len(data)
+        self._refs: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            self._refs += 1
+
+    def release(self, _: Any = None) -> None:
+        with self._lock:
+            self._refs -= 1
+            if self._refs:
+                return
+        self.shm.close()
+        self.shm.unlink()
+
+
+class Frame:
+    def __init__(self, bgra: bytes = b"", w: int = 0, h: int = 0, pool: EncodePool | None = None,
+                 png: bytes = b"", b64: bytes = b"") -> None:
+        self.w: int = w
+        self.h: int = h
+        self.pool: EncodePool | None = pool
+        self._bgra: bytes = bgra
+        self._png: bytes = png
+        self._b64: bytes = b64
+        self._digest: str = ""
+        self._memo: dict[str, Any] = {}
+        self._lock: threading.RLock = threading.RLock()
+        self.encodes: int = 0
+        self.reused: bool = False
+
+    @classmethod
+    def from_b64(cls, b64: str | bytes) -> Frame:
+        return cls(b64=b64.encode("ascii") if isinstance(b64, str) else b64)
+
+    def __bool__(self) -> bool:
+        return bool(self._bgra or self._png or self._b64)
+
+    @property
+    def bgra(self) -> bytes:
+        return self._bgra
+
+    @property
+    def png(self) -> bytes:
+        with self._lock:
+            if not self._png:
+                if self._b64:
+                    self._png = base64.b64decode(self._b64)
+                elif self._bgra:
+                    self._png = (self.pool.png(self._bgra, self.w, self.h) if self.pool is not None
+                                 else png_bgra(self._bgra, self.w, self.h))
+                    self.encodes += 1
+            return self._png
+
+    @property
+    def b64_bytes(self) -> bytes:
+        with self._lock:
+            if not self._b64 and self:
+                self._b64 = base64.b64encode(self.png)
+            return self._b64
+
+    @property
+    def b64(self) -> str:
+        return self.b64_bytes.decode("ascii")
+
+    @property
+    def digest(self) -> str:
+        with self._lock:
+            if not self._digest and self:
+                self._digest = hashlib.blake2b(self._bgra or self.png, digest_size=16).hexdigest()
+            return self._digest
+
+    def memo(self, key: str, fn: Callable[[Frame], Any]) -> Any:
+        with self._lock:
+            if key not in self._memo:
+                self._memo[key] = fn(self)
+            return self._memo[key]
+
+    def adopt(self, prev: Frame | None) -> bool:
+        if prev is None or prev is self or not self._bgra or (prev.w, prev.h) != (self.w, self.h):
+            return False
+        if not prev._bgra or prev.digest != self.digest:
+            return False
+        with prev._lock:
+            png, b64, memo = prev._png, prev._b64, dict(prev._memo)
+        with self._lock:
+            self._png, self._b64 = self._png or png, self._b64 or b64
+            self._memo = {**memo, **self._memo}
+            self.reused = bool(png or b64)
+        return self.reused
+
+    def nbytes(self) -> dict[str, int]:
+        return {"bgra": len(self._bgra), "png": len(self._png), "b64": len(self._b64)}
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"w": self.w, "h": self.h, "digest": self.digest, "encodes": self.encodes, "reused": self.reused,
+                **self.nbytes()}
+
+
+class EncodePool:
+    def __init__(self, backend: str = "thread", workers: int = 2, max_pending: int = 8, level: int = 6) -> None:
+        self.backend: str = backend if backend in ("thread", "process", "inline") else "thread"
+        self.level: int = level
+        self.workers: int = max(1, workers)
+        self._ex: Executor | None = None
+        if self.backend == "thread":
+            self._ex = ThreadPoolExecutor(self.workers, thread_name_prefix="encode")
+        elif self.backend == "process":
+            self._ex = ProcessPoolExecutor(self.workers)
+        self._slots: threading.BoundedSemaphore = threading.BoundedSemaphore(max(1, max_pending))
+        self.submitted: int = 0
+        self.waited_ms: float = 0.0
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Future[Any]:
+        if self._ex is None:
+            f: Future[Any] = Future()
+            try:
+                f.set_result(fn(*args))
+            except Exception as e:
+                f.set_exception(e)
+            return f
+        t0: float = time.perf_counter()
+        self._slots.acquire()
+        self.waited_ms += (time.perf_counter() - t0) * 1000
+        self.submitted += 1
+        try:
+            fut: Future[Any] = self._ex.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    def encode(self, bgra: bytes, w: int, h: int, rects: list[Rect | None]) -> list[Future[str]]:
+        if self.backend != "process":
+            return [self._submit(png_b64, bgra, w, h, r, self.level) for r in rects]
+        shared: _Shared = _Shared(bgra)
+        futs: list[Future[str]] = []
+        shared.acquire()
+        try:
+            for r in rects:
+                shared.acquire()
+                try:
+                    f: Future[str] = self._submit(_shm_png_b64, shared.shm.name, shared.size, w, h, r, self.level)
+                except BaseException:
+                    shared.release()
+                    raise
+                f.add_done_callback(shared.release)
+                futs.append(f)
+        finally:
+            shared.release()
+        return futs
+
+    def frame(self, bgra: bytes, w: int, h: int) -> str:
+        return self.encode(bgra, w, h, [None])[0].result()
+
+    def png(self, bgra: bytes, w: int, h: int) -> bytes:
+        if self.backend != "process":
+            return self._submit(png_bgra, bgra, w, h, self.level).result()
+        shared: _Shared = _Shared(bgra)
+        shared.acquire()
+        try:
+            return self._submit(_shm_png, shared.shm.name, shared.size, w, h, self.level).result()
+        finally:
+            shared.release()
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": self.backend, "workers": self.workers, "submitted": self.submitted,
+                "waited_ms": round(self.waited_ms, 3)}
+
+    def close(self) -> None:
+        if self._ex is not None:
+            self._ex.shutdown(wait=True, cancel_futures=True)
+            self._ex = None
+
+
+def _bench(backend: str, w: int = 1280, h: int = 720, frames: int = 6) -> dict[str, Any]:
+    import asyncio
+    import os
+
+    bgra: bytes = os.urandom(w * h) * 4
+    pool: EncodePool = EncodePool(backend, 2)
+
+    async def run() -> dict[str, Any]:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        lags: list[float] = []
+        done: asyncio.Event = asyncio.Event()
+
+        async def probe() -> None:
+            while not done.is_set():
+                t0: float = time.perf_counter()
+                await asyncio.sleep(0.002)
+                lags.append((time.perf_counter() - t0) * 1000 - 2.0)
+
+        task: asyncio.Task[None] = asyncio.create_task(probe())
+        t0: float = time.perf_counter()
+        for _ in range(frames):
+            rects: list[Rect | None] = [None, (0, 0, 200, 120), (400, 300, 640, 420), (900, 100, 1200, 400)]
+            futs: list[Future[str]] = await loop.run_in_executor(None, pool.encode, bgra, w, h, rects)
+            await asyncio.gather(*(asyncio.wrap_future(f) for f in futs))
+        wall: float = (time.perf_counter() - t0) * 1000
+        done.set()
+        await task
+        lags.sort()
+        return {
+            "backend": backend, "frames": frames, "ms_per_frame": round(wall / frames, 2),
+            "loop_lag_p50_ms": round(lags[len(lags) // 2], 3) if lags else None,
+            "loop_lag_max_ms": round(lags[-1], 3) if lags else None,
+        }
+
+    try:
+        return asyncio.run(run())
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--bench"]:
+        for b in sys.argv[2:] or ["inline", "thread", "process"]:
+            print(json.dumps(_bench(b)))
+    else:
+        print("usage: encodepool.py --bench [inline|thread|process ...]")
+        sys.exit(2)
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Hashable
+
+
+class Lease:
+    def __init__(self, ttl: float = 5.0) -> None:
+        self.ttl: float = ttl
+        self.holder: str = ""
+        self.expires: float = 0.0
+        self.grants: int = 0
+
+    def current(self, now: float | None = None) -> str:
+        now = time.monotonic() if now is None else now
+        return self.holder if self.holder and now < self.expires else ""
+
+    def claim(self, client: str, now: float | None = None) -> bool:
+        if not client:
+            return False
+        now = time.monotonic() if now is None else now
+        held: str = self.current(now)
+        if held and held != client:
+            return False
+        if held != client:
+            self.holder = client
+            self.grants += 1
+        self.expires = now + self.ttl
+        return True
+
+    def release(self, client: str) -> bool:
+        if not client or client != self.holder:
+            return False
+        self.holder, self.expires = "", 0.0
+        return True
+
+    def as_dict(self) -> dict[str, Any]:
+        left: float = max(0.0, self.expires - time.monotonic()) if self.current() else 0.0
+        return {"holder": self.current(), "ttl": self.ttl, "expires_in": round(left, 2), "grants": self.grants}
+
+
+class Broadcast:
+    def __init__(self) -> None:
+        self._key: Hashable = object()
+        self._data: bytes = b""
+        self.version: int = 0
+        self.builds: int = 0
+        self.hits: int = 0
+
+    def get(self, key: Hashable, build: Callable[[int], bytes]) -> bytes:
+        if key == self._key:
+            self.hits += 1
+            return self._data
+        self.version += 1
+        self._data = build(self.version)
+        self._key = key
+        self.builds += 1
+        return self._data
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"version": self.version, "builds": self.builds, "hits": self.hits, "bytes": len(self._data)}
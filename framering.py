@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import struct
+import sys
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Final, Iterator
+
+MAGIC: Final[bytes] = b"FRRING01"
+HEAD: Final[struct.Struct] = struct.Struct("<8sIIQ")
+META: Final[struct.Struct] = struct.Struct("<qQIIIIQd")
+META_SIZE: Final[int] = 64
+PAGE: Final[int] = 4096
+
+
+@dataclass(frozen=True)
+class Slot:
+    index: int
+    turn: int
+    w: int
+    h: int
+    size: int
+    crc: int
+    dhash: int
+    ts: float
+    seq: int
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"slot": self.index, "turn": self.turn, "w": self.w, "h": self.h, "size": self.size,
+                "crc": f"{self.crc:08x}", "dhash": f"{self.dhash:016x}", "ts": round(self.ts, 3)}
+
+
+def _layout(slots: int, slot_bytes: int) -> tuple[int, int]:
+    data_off: int = -(-(HEAD.size + slots * META_SIZE) // PAGE) * PAGE
+    return data_off, data_off + slots * slot_bytes
+
+
+class FrameRing:
+    def __init__(self, path: Path, slots: int = 0, slot_bytes: int = 0) -> None:
+        self.path: Path = path
+        self.writable: bool = slots > 0
+        if self.writable:
+            self.slots: int = slots
+            self.slot_bytes: int = -(-slot_bytes // PAGE) * PAGE
+            self._off, total = _layout(self.slots, self.slot_bytes)
+            with open(path, "wb") as f:
+                f.truncate(total)
+            self._f: Any = open(path, "r+b")
+            self._mm: mmap.mmap = mmap.mmap(self._f.fileno(), total)
+            HEAD.pack_into(self._mm, 0, MAGIC, self.slots, self.slot_bytes, 0)
+        else:
+            self._f = open(path, "rb")
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.slots, self.slot_bytes, _ = HEAD.unpack_from(self._mm, 0)
+            if magic != MAGIC:
+                self.close()
+                raise ValueError(f"{path}: not a frame ring")
+            self._off = _layout(self.slots, self.slot_bytes)[0]
+        self.dropped: int = 0
+
+    @classmethod
+    def open(cls, path: Path) -> FrameRing:
+        return cls(path)
+
+    @property
+    def written(self) -> int:
+        return int(HEAD.unpack_from(self._mm, 0)[3])
+
+    def _meta(self, i: int) -> tuple[int, ...]:
+        return META.unpack_from(self._mm, HEAD.size + i * META_SIZE)
+
+    def put(self, turn: int, bgra: bytes | memoryview, w: int, h: int, dhash: int = 0) -> int:
+        n: int = len(bgra)
+        if n > self.slot_bytes:
+            self.dropped += 1
+            return -1
+        count: int = self.written
+        i: int = count % self.slots
+        mo: int = HEAD.size + i * META_SIZE
+        seq: int = self._meta(i)[1]
+        META.pack_into(self._mm, mo, -1, seq + 1, 0, 0, 0, 0, 0, 0.0)
+        o: int = self._off + i * self.slot_bytes
+        self._mm[o:o + n] = bgra
+        META.pack_into(self._mm, mo, turn, seq + 2, w, h, n, zlib.crc32(bgra), dhash, time.time())
+        HEAD.pack_into(self._mm, 0, MAGIC, self.slots, self.slot_bytes, count + 1)
+        return i
+
+    def slot(self, i: int) -> Slot | None:
+        turn, seq, w, h, size, crc, dhash, ts = self._meta(i)
+        if turn < 0 or seq % 2 or not size:
+            return None
+        return Slot(i, turn, w, h, size, crc, dhash, ts, seq)
+
+    def entries(self) -> list[Slot]:
+        count: int = self.written
+        out: list[Slot] = []
+        for k in range(max(0, count - self.slots), count):
+            s: Slot | None = self.slot(k % self.slots)
+            if s is not None:
+                out.append(s)
+        return out
+
+    def find(self, turn: int) -> Slot | None:
+        for s in reversed(self.entries()):
+            if s.turn == turn:
+                return s
+        return None
+
+    def view(self, s: Slot) -> memoryview:
+        o: int = self._off + s.index * self.slot_bytes
+        return memoryview(self._mm)[o:o + s.size]
+
+    def read(self, turn: int, verify: bool = False) -> tuple[bytes, Slot] | None:
+        for _ in range(3):
+            s: Slot | None = self.find(turn)
+            if s is None:
+                return None
+            with self.view(s) as mv:
+                data: bytes = bytes(mv)
+            if self._meta(s.index)[1] == s.seq:
+                if verify and zlib.crc32(data) != s.crc:
+                    raise ValueError(f"turn {turn}: crc mismatch")
+                return data, s
+        return None
+
+    def __iter__(self) -> Iterator[Slot]:
+        return iter(self.entries())
+
+    def stats(self) -> dict[str, Any]:
+        return {"slots": self.slots, "slot_bytes": self.slot_bytes, "written": self.written,
+                "turns": [s.turn for s in self.entries()], "dropped": self.dropped}
+
+    def close(self) -> None:
+        try:
+            self._mm.close()
+        except BufferError:
+            return
+        self._f.close()
+
+
+def main() -> None:
+    ap: argparse.ArgumentParser = argparse.ArgumentParser(description="Inspect a Franz frame ring")
+    ap.add_argument("ring", type=Path, help="frames.ring file or run directory")
+    ap.add_argument("--png", nargs=2, metavar=("TURN", "OUT"), help="write the frame of TURN as PNG")
+    ap.add_argument("--verify", action="store_true", help="check every frame against its crc")
+    a: argparse.Namespace = ap.parse_args()
+    path: Path = a.ring / "frames.ring" if a.ring.is_dir() else a.ring
+    ring: FrameRing = FrameRing.open(path)
+    try:
+        if a.png:
+            import encodepool
+            got: tuple[bytes, Slot] | None = ring.read(int(a.png[0]), verify=True)
+            if got is None:
+                print(f"turn {a.png[0]} not in ring", file=sys.stderr)
+                sys.exit(1)
+            data, s = got
+            Path(a.png[1]).write_bytes(encodepool.png_bgra(data, s.w, s.h))
+            return
+        bad: int = 0
+        for s in ring:
+            row: dict[str, Any] = s.as_dict()
+            if a.verify:
+                got = ring.read(s.turn, verify=False)
+                row["ok"] = got is not None and zlib.crc32(got[0]) == s.crc
+                bad += not row["ok"]
+            print(json.dumps(row))
+        if bad:
+            sys.exit(1)
+    finally:
+        ring.close()
+
+
+if __name__ == "__main__":
+    main()
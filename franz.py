@@ -1,35 +1,46 @@
-import subprocess
-import sys
-
-selector_process = subprocess.run(['python', 'region_selector.py'])
-if selector_process.returncode != 0:
-    print("Region selector failed, exiting.")
-    sys.exit(1)
-
+import argparse
 import asyncio
-import base64
 import ctypes
 import ctypes.wintypes as W
+import gc
 import http.client
 import json
 import logging
-import struct
+import subprocess
+import sys
+import threading
 import time
 import urllib.parse
 import webbrowser
-import zlib
-from collections import deque
-from dataclasses import dataclass, field
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Any, Final
-
+from typing import Any, Awaitable, Callable, Final, Hashable
+
+import breaker
+import budget
+import encodepool
+import fanout
+import framering
+import ghostring
+import logqueue
+import memwatch
 import pipeline
+import pipeline_host
+import runpack
+import sampleprof
+import simenv
+import stagewatch
+import stuckloop
+import timeline
 
 HERE: Final[Path] = Path(__file__).resolve().parent
 CONFIG_PATH: Final[Path] = HERE / "config.json"
 PANEL_HTML: Final[Path] = HERE / "panel.html"
 CONFIG_HTML: Final[Path] = HERE / "config.html"
 PIPELINE_PY: Final[Path] = HERE / "pipeline.py"
+WIN32: Final[bool] = sys.platform == "win32"
 NORM: Final[int] = 1000
 SRCCOPY: Final[int] = 0x00CC0020
 CAPTUREBLT: Final[int] = 0x40000000
@@ -39,9 +50,18 @@ LUP: Final[int] = 0x0004
 RDN: Final[int] = 0x0008
 RUP: Final[int] = 0x0010
 WHEEL: Final[int] = 0x0800
-WHEEL_DELTA: Final[int] = 120
 KEYEVENTF_KEYUP: Final[int] = 0x0002
 KEYEVENTF_EXTENDEDKEY: Final[int] = 0x0001
+KEYEVENTF_UNICODE: Final[int] = 0x0004
+INPUT_KEYBOARD: Final[int] = 1
+CF_UNICODETEXT: Final[int] = 13
+GMEM_MOVEABLE: Final[int] = 0x0002
+FOVEA_PROMPT: Final[str] = (
+    "\n\nImages after the first are higher-resolution zooms of parts of image 1; each is labelled with its "
+    "[x1,y1,x2,y2] in image 1. Coordinates are always 0-1000 of image 1, unless an action or region has "
+    "\"image\": N, then its bbox_2d is 0-1000 inside image N. To see small text or details next turn, add "
+    "\"zoom\": [{{\"bbox_2d\": [x1,y1,x2,y2], \"label\": \"...\"}}] (up to {k})."
+)
 EXTENDED_VKS: Final[frozenset[int]] = frozenset({0x21, 0x22, 0x23, 0x24, 0x25, 0x26, 0x27, 0x28, 0x2D, 0x2E})
 
 log: Final[logging.Logger] = logging.getLogger("franz")
@@ -77,48 +97,49 @@ VK_MAP: Final[dict[str, int]] = {
 }
 
 
-def setup_logging(run_dir: Path) -> None:
+def _log_context() -> tuple[int, str]:
+    return S.turn, S.phase
+
+
+def setup_logging(run_dir: Path) -> logqueue.LogQueue:
     level: int = getattr(logging, str(cfg("log_level", "INFO")).upper(), logging.INFO)
-    fmt: logging.Formatter = logging.Formatter(
-        "[%(name)s][%(asctime)s.%(msecs)03d][%(levelname)s] %(message)s", datefmt="%H:%M:%S"
+    return logqueue.start(
+        level, run_dir, _log_context, text_file=bool(cfg("log_to_file", True)), jsonl=bool(cfg("log_jsonl", False)),
+        max_mb=float(cfg("log_max_mb", 20)), backups=int(cfg("log_backups", 3)),
+        rate_per_s=float(cfg("log_rate_per_s", 10)), burst=int(cfg("log_rate_burst", 20)),
+        queue_size=int(cfg("log_queue_size", 10000)),
     )
-    root: logging.Logger = logging.getLogger()
-    root.setLevel(level)
-    root.handlers.clear()
-    sh: logging.StreamHandler[Any] = logging.StreamHandler()
-    sh.setFormatter(fmt)
-    root.addHandler(sh)
-    if cfg("log_to_file", True):
-        fh: logging.FileHandler = logging.FileHandler(run_dir / "main.log", encoding="utf-8")
-        fh.setFormatter(fmt)
-        root.addHandler(fh)
 
 
 def make_run_dir() -> Path:
     base: Path = HERE / str(cfg("runs_dir", "runs"))
     base.mkdir(exist_ok=True)
-    n: int = sum(1 for d in base.iterdir() if d.is_dir() and d.name.startswith("run_"))
-    rd: Path = base / f"run_{n + 1:04d}"
-    rd.mkdir(parents=True, exist_ok=True)
+    counter: Path = base / ".last_run"
+    try:
+        n: int = int(counter.read_text("ascii"))
+    except (OSError, ValueError):
+        n = sum(1 for d in base.iterdir() if d.is_dir() and d.name.startswith("run_"))
+    while True:
+        n += 1
+        rd: Path = base / f"run_{n:04d}"
+        try:
+            rd.mkdir()
+            break
+        except FileExistsError:
+            continue
+    counter.write_text(str(n), "ascii")
     return rd
 
 
-@dataclass
-class Ghost:
-    bbox_2d: list[int]
-    turn: int
-    image_b64: str
-    label: str = ""
-
-
 @dataclass
 class State:
     phase: str = "init"
     error: str | None = None
     turn: int = 0
     run_dir: Path | None = None
-    annotated_b64: str = ""
-    raw_b64: str = ""
+    annotated: encodepool.Frame = field(default_factory=encodepool.Frame)
+    annotated_delta: encodepool.Frame = field(default_factory=encodepool.Frame)
+    raw: encodepool.Frame = field(default_factory=encodepool.Frame)
     raw_seq: int = 0
     vlm_json: str = ""
     observation: str = ""
@@ -127,52 +148,124 @@ class State:
     heat_data: list[dict[str, Any]] = field(default_factory=list)
     raw_display: dict[str, Any] = field(default_factory=dict)
     ghosts_overlay: list[dict[str, Any]] = field(default_factory=list)
+    ghosts_seq: int = 0
     msg_id: int = 0
     pending_seq: int = 0
     annotated_seq: int = -1
     annotated_event: asyncio.Event = field(default_factory=asyncio.Event)
     next_vlm: str | None = None
+    fovea_boxes: list[list[int]] = field(default_factory=list)
+    usage: Counter[str] = field(default_factory=Counter)
     next_event: asyncio.Event = field(default_factory=asyncio.Event)
     lock: asyncio.Lock = field(default_factory=asyncio.Lock)
 
 
 S: State
 STOP: asyncio.Event
-GHOST_RING: deque[Ghost] = deque()
+GHOST_RING: ghostring.GhostRing = ghostring.GhostRing()
+INPUT: timeline.InputBackend
+TYPE_VERIFIER: timeline.TypeVerifier | None = None
+PIPE: pipeline_host.PipelineHost | None = None
+ARCHIVE: runpack.FilesWriter | runpack.PackWriter | None = None
+BUDGET: budget.Estimator = budget.Estimator()
+ENCODER: encodepool.EncodePool = encodepool.EncodePool("inline")
+ARCHIVE_IO: ThreadPoolExecutor | None = None
+MEM: memwatch.MemoryWatch | None = None
+STUCK: stuckloop.StuckDetector | None = None
+FRAMES: framering.FrameRing | None = None
+WATCH: stagewatch.StageWatch = stagewatch.StageWatch({})
+BREAKER: breaker.CircuitBreaker = breaker.CircuitBreaker()
+GHOST_SCALE: float = 1.0
+LEASE: fanout.Lease = fanout.Lease()
+CAST: dict[str, fanout.Broadcast] = {k: fanout.Broadcast() for k in ("state", "frame", "ghosts")}
+FOVEA_SRC: tuple[bytes, int, int] | None = None
+PROF: sampleprof.SampleProfiler | None = None
+PROF_LAST: dict[str, Any] = {}
+PROFILE_TURNS: int = 0
+SIM: simenv.SimDesktop | None = None
+MOCK: simenv.MockVLM | None = None
+HEADLESS: bool = False
+MAX_TURNS: int = 0
+HEADLESS_CFG: Final[dict[str, Any]] = {
+    "capture_crop": {"x1": 0, "y1": 0, "x2": NORM, "y2": NORM}, "capture_width": 0, "capture_height": 0,
+    "capture_scale_percent": 100, "capture_delay": 0.0, "physical_execution": True, "boot_enabled": True,
+}
 
 
 def set_phase(p: str, err: str | None = None) -> None:
     S.phase, S.error = p, err
+    WATCH.enter(p, S.turn)
     log.info("phase=%s err=%s", p, err)
 
 
-ctypes.WinDLL("shcore", use_last_error=True).SetProcessDpiAwareness(2)
+if WIN32:
+    ctypes.WinDLL("shcore", use_last_error=True).SetProcessDpiAwareness(2)
 
-_u32: ctypes.WinDLL = ctypes.WinDLL("user32", use_last_error=True)
-_g32: ctypes.WinDLL = ctypes.WinDLL("gdi32", use_last_error=True)
+    _u32: ctypes.WinDLL = ctypes.WinDLL("user32", use_last_error=True)
+    _g32: ctypes.WinDLL = ctypes.WinDLL("gdi32", use_last_error=True)
+    _k32: ctypes.WinDLL = ctypes.WinDLL("kernel32", use_last_error=True)
+    _winmm: ctypes.WinDLL = ctypes.WinDLL("winmm")
 
 
-def _s(dll: ctypes.WinDLL, nm: str, at: list[Any], rt: Any) -> None:
+def _s(dll: Any, nm: str, at: list[Any], rt: Any) -> None:
     f: Any = getattr(dll, nm)
     f.argtypes = at
     f.restype = rt
 
 
-_s(_u32, "GetDC", [W.HWND], W.HDC)
-_s(_u32, "ReleaseDC", [W.HWND, W.HDC], ctypes.c_int)
-_s(_u32, "GetSystemMetrics", [ctypes.c_int], ctypes.c_int)
-_s(_g32, "CreateCompatibleDC", [W.HDC], W.HDC)
-_s(_g32, "CreateDIBSection", [W.HDC, ctypes.c_void_p, W.UINT, ctypes.POINTER(ctypes.c_void_p), W.HANDLE, W.DWORD], W.HBITMAP)
-_s(_g32, "SelectObject", [W.HDC, W.HGDIOBJ], W.HGDIOBJ)
-_s(_g32, "BitBlt", [W.HDC, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, W.HDC, ctypes.c_int, ctypes.c_int, W.DWORD], W.BOOL)
-_s(_g32, "StretchBlt", [W.HDC, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, W.HDC, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, W.DWORD], W.BOOL)
-_s(_g32, "SetStretchBltMode", [W.HDC, ctypes.c_int], ctypes.c_int)
-_s(_g32, "SetBrushOrgEx", [W.HDC, ctypes.c_int, ctypes.c_int, ctypes.c_void_p], W.BOOL)
-_s(_g32, "DeleteObject", [W.HGDIOBJ], W.BOOL)
-_s(_g32, "DeleteDC", [W.HDC], W.BOOL)
-_s(_u32, "SetCursorPos", [ctypes.c_int, ctypes.c_int], W.BOOL)
-_s(_u32, "mouse_event", [W.DWORD, W.DWORD, W.DWORD, ctypes.c_long, ctypes.c_ulong], None)
-_s(_u32, "keybd_event", [W.BYTE, W.BYTE, W.DWORD, ctypes.POINTER(ctypes.c_ulong)], None)
+if WIN32:
+    _s(_u32, "GetDC", [W.HWND], W.HDC)
+    _s(_u32, "ReleaseDC", [W.HWND, W.HDC], ctypes.c_int)
+    _s(_u32, "GetSystemMetrics", [ctypes.c_int], ctypes.c_int)
+    _s(_g32, "CreateCompatibleDC", [W.HDC], W.HDC)
+    _s(_g32, "CreateDIBSection", [W.HDC, ctypes.c_void_p, W.UINT, ctypes.POINTER(ctypes.c_void_p), W.HANDLE, W.DWORD], W.HBITMAP)
+    _s(_g32, "SelectObject", [W.HDC, W.HGDIOBJ], W.HGDIOBJ)
+    _s(_g32, "BitBlt", [W.HDC, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, W.HDC, ctypes.c_int, ctypes.c_int, W.DWORD], W.BOOL)
+    _s(_g32, "StretchBlt", [W.HDC, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, W.HDC, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, W.DWORD], W.BOOL)
+    _s(_g32, "SetStretchBltMode", [W.HDC, ctypes.c_int], ctypes.c_int)
+    _s(_g32, "SetBrushOrgEx", [W.HDC, ctypes.c_int, ctypes.c_int, ctypes.c_void_p], W.BOOL)
+    _s(_g32, "DeleteObject", [W.HGDIOBJ], W.BOOL)
+    _s(_g32, "DeleteDC", [W.HDC], W.BOOL)
+    _s(_u32, "SetCursorPos", [ctypes.c_int, ctypes.c_int], W.BOOL)
+    _s(_u32, "mouse_event", [W.DWORD, W.DWORD, W.DWORD, ctypes.c_long, ctypes.c_ulong], None)
+    _s(_u32, "keybd_event", [W.BYTE, W.BYTE, W.DWORD, ctypes.POINTER(ctypes.c_ulong)], None)
+    _s(_u32, "VkKeyScanW", [W.WCHAR], ctypes.c_short)
+    _s(_winmm, "timeBeginPeriod", [W.UINT], W.UINT)
+    _s(_winmm, "timeEndPeriod", [W.UINT], W.UINT)
+
+
+class _KBDI(ctypes.Structure):
+    _fields_ = [
+        ("wVk", W.WORD), ("wScan", W.WORD), ("dwFlags", W.DWORD),
+        ("time", W.DWORD), ("dwExtraInfo", ctypes.c_size_t),
+    ]
+
+
+class _MSI(ctypes.Structure):
+    _fields_ = [
+        ("dx", W.LONG), ("dy", W.LONG), ("mouseData", W.DWORD),
+        ("dwFlags", W.DWORD), ("time", W.DWORD), ("dwExtraInfo", ctypes.c_size_t),
+    ]
+
+
+class _INU(ctypes.Union):
+    _fields_ = [("ki", _KBDI), ("mi", _MSI)]
+
+
+class _INPUT(ctypes.Structure):
+    _fields_ = [("type", W.DWORD), ("u", _INU)]
+
+
+if WIN32:
+    _s(_u32, "SendInput", [W.UINT, ctypes.POINTER(_INPUT), ctypes.c_int], W.UINT)
+    _s(_u32, "OpenClipboard", [W.HWND], W.BOOL)
+    _s(_u32, "EmptyClipboard", [], W.BOOL)
+    _s(_u32, "SetClipboardData", [W.UINT, W.HANDLE], W.HANDLE)
+    _s(_u32, "CloseClipboard", [], W.BOOL)
+    _s(_k32, "GlobalAlloc", [W.UINT, ctypes.c_size_t], W.HGLOBAL)
+    _s(_k32, "GlobalLock", [W.HGLOBAL], ctypes.c_void_p)
+    _s(_k32, "GlobalUnlock", [W.HGLOBAL], W.BOOL)
+    _s(_k32, "GlobalFree", [W.HGLOBAL], W.HGLOBAL)
 
 
 class _BIH(ctypes.Structure):
@@ -201,6 +294,8 @@ def _bmi(w: int, h: int) -> _BMI:
 
 
 def _screen() -> tuple[int, int]:
+    if SIM is not None:
+        return SIM.w, SIM.h
     return int(_u32.GetSystemMetrics(0)), int(_u32.GetSystemMetrics(1))
 
 
@@ -222,14 +317,93 @@ def _crop_px(bw: int, bh: int) -> tuple[int, int, int, int]:
     )
 
 
-def _n2s(nx: int, ny: int) -> tuple[int, int]:
+def _frame_size(cw: int, ch: int) -> tuple[int, int]:
+    ow: int = int(cfg("capture_width", 0))
+    oh: int = int(cfg("capture_height", 0))
+    if ow > 0 and oh > 0:
+        return ow, oh
+    p: int = int(cfg("capture_scale_percent", 100))
+    if 0 < p != 100:
+        return max(1, (cw * p + 50) // 100), max(1, (ch * p + 50) // 100)
+    return cw, ch
+
+
+def _out_size(cw: int, ch: int) -> tuple[int, int]:
+    ow, oh = _frame_size(cw, ch)
+    fo: int = int(cfg("fovea_overview", 448)) if int(cfg("fovea_crops", 0)) > 0 else 0
+    if 0 < fo < max(ow, oh):
+        return max(1, ow * fo // max(ow, oh)), max(1, oh * fo // max(ow, oh))
+    return ow, oh
+
+
+@dataclass(frozen=True)
+class Geometry:
+    version: int
+    screen_w: int
+    screen_h: int
+    crop: tuple[int, int, int, int]
+    out_w: int
+    out_h: int
+
+    @property
+    def crop_w(self) -> int:
+        return max(1, self.crop[2] - self.crop[0])
+
+    @property
+    def crop_h(self) -> int:
+        return max(1, self.crop[3] - self.crop[1])
+
+    def n2s(self, nx: int, ny: int) -> tuple[int, int]:
+        x1, y1 = self.crop[0], self.crop[1]
+        cw, ch = self.crop_w, self.crop_h
+        px: int = x1 + (clamp(nx) * (cw - 1) + NORM // 2) // NORM if cw > 1 else x1
+        py: int = y1 + (clamp(ny) * (ch - 1) + NORM // 2) // NORM if ch > 1 else y1
+        return px, py
+
+    def s2n(self, sx: int, sy: int) -> tuple[int, int]:
+        cw, ch = self.crop_w, self.crop_h
+        nx: int = clamp(((sx - self.crop[0]) * NORM + (cw - 1) // 2) // (cw - 1)) if cw > 1 else 0
+        ny: int = clamp(((sy - self.crop[1]) * NORM + (ch - 1) // 2) // (ch - 1)) if ch > 1 else 0
+        return nx, ny
+
+    def bboxes_to_img(self, bboxes: list[list[int]]) -> list[tuple[int, int, int, int]]:
+        w, h = self.out_w, self.out_h
+        return [
+            (clamp(b[0] * w // NORM, 0, w), clamp(b[1] * h // NORM, 0, h),
+             clamp(b[2] * w // NORM, 0, w), clamp(b[3] * h // NORM, 0, h))
+            for b in bboxes
+        ]
+
+    def with_output(self, w: int, h: int) -> "Geometry":
+        return self if (w, h) == (self.out_w, self.out_h) else replace(self, out_w=w, out_h=h)
+
+
+_CFG_VER: int = 0
+_GEO: Geometry | None = None
+
+
+def _build_geometry(version: int) -> Geometry:
     sw, sh = _screen()
-    x1, y1, x2, y2 = _crop_px(sw, sh)
-    cw: int = max(1, x2 - x1)
-    ch: int = max(1, y2 - y1)
-    px: int = x1 + (clamp(nx) * (cw - 1) + NORM // 2) // NORM if cw > 1 else x1
-    py: int = y1 + (clamp(ny) * (ch - 1) + NORM // 2) // NORM if ch > 1 else y1
-    return px, py
+    crop: tuple[int, int, int, int] = _crop_px(sw, sh)
+    ow, oh = _out_size(max(1, crop[2] - crop[0]), max(1, crop[3] - crop[1]))
+    return Geometry(version=version, screen_w=sw, screen_h=sh, crop=crop, out_w=ow, out_h=oh)
+
+
+def geometry() -> Geometry:
+    global _GEO
+    g: Geometry | None = _GEO
+    if g is None or g.version != _CFG_VER:
+        g = _build_geometry(_CFG_VER)
+        _GEO = g
+    return g
+
+
+def _set_config(obj: dict[str, Any]) -> None:
+    global _CFG, _CFG_VER, _GEO
+    _CFG = obj
+    _CFG_VER += 1
+    _GEO = _build_geometry(_CFG_VER)
+    log.info("config v%d crop=%s out=%dx%d", _CFG_VER, _GEO.crop, _GEO.out_w, _GEO.out_h)
 
 
 def _dib(dc: Any, w: int, h: int) -> tuple[Any, int]:
@@ -238,8 +412,9 @@ def _dib(dc: Any, w: int, h: int) -> tuple[Any, int]:
     return (hbmp, int(bits.value)) if hbmp and bits.value else (None, 0)
 
 
-def _capture_full() -> tuple[bytes, int, int] | None:
-    sw, sh = _screen()
+def _capture_full(sw: int, sh: int) -> tuple[bytes, int, int] | None:
+    if SIM is not None:
+        return SIM.render(), SIM.w, SIM.h
     sdc: Any = _u32.GetDC(0)
     if not sdc:
         return None
@@ -262,23 +437,9 @@ def _capture_full() -> tuple[bytes, int, int] | None:
     return raw, sw, sh
 
 
-def _crop_bgra(bgra: bytes, sw: int, sh: int, x1: int, y1: int, x2: int, y2: int) -> tuple[bytes, int, int]:
-    cw: int = x2 - x1
-    ch: int = y2 - y1
-    if cw <= 0 or ch <= 0:
-        return bgra, sw, sh
-    src: memoryview = memoryview(bgra)
-    out: bytearray = bytearray(cw * ch * 4)
-    ss: int = sw * 4
-    ds: int = cw * 4
-    for y in range(ch):
-        so: int = (y1 + y) * ss + x1 * 4
-        do: int = y * ds
-        out[do:do + ds] = src[so:so + ds]
-    return bytes(out), cw, ch
-
-
 def _stretch(bgra: bytes, sw: int, sh: int, dw: int, dh: int) -> bytes | None:
+    if not WIN32:
+        return encodepool.scale_bgra(bgra, sw, sh, dw, dh)
     sdc: Any = _u32.GetDC(0)
     if not sdc:
         return None
@@ -322,83 +483,66 @@ def _stretch(bgra: bytes, sw: int, sh: int, dw: int, dh: int) -> bytes | None:
     return result
 
 
-def _to_png(bgra: bytes, w: int, h: int) -> bytes:
-    stride: int = w * 4
-    src: memoryview = memoryview(bgra)
-    rows: bytearray = bytearray()
-    for y in range(h):
-        rows.append(0)
-        row: memoryview = src[y * stride:(y + 1) * stride]
-        for i in range(0, len(row), 4):
-            rows.extend((row[i + 2], row[i + 1], row[i], 255))
+def _bbox_crop_b64(bgra: bytes, geo: Geometry, bbox: list[int]) -> str:
+    return ENCODER.encode(bgra, geo.out_w, geo.out_h, [geo.bboxes_to_img([bbox])[0]])[0].result()
 
-    def ck(t: bytes, b: bytes) -> bytes:
-        c: bytes = t + b
-        return struct.pack(">I", len(b)) + c + struct.pack(">I", zlib.crc32(c) & 0xFFFFFFFF)
 
-    return (
-        b"\x89PNG\r\n\x1a\n"
-        + ck(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 6, 0, 0, 0))
-        + ck(b"IDAT", zlib.compress(bytes(rows), 6))
-        + ck(b"IEND", b"")
-    )
-
-
-def _bbox_crop_b64(bgra: bytes, img_w: int, img_h: int, bbox: list[int]) -> str:
-    x1: int = clamp(bbox[0] * img_w // NORM, 0, img_w)
-    y1: int = clamp(bbox[1] * img_h // NORM, 0, img_h)
-    x2: int = clamp(bbox[2] * img_w // NORM, 0, img_w)
-    y2: int = clamp(bbox[3] * img_h // NORM, 0, img_h)
-    cw: int = x2 - x1
-    ch: int = y2 - y1
-    if cw <= 0 or ch <= 0:
-        return ""
-    cropped, cw2, ch2 = _crop_bgra(bgra, img_w, img_h, x1, y1, x2, y2)
-    return base64.b64encode(_to_png(cropped, cw2, ch2)).decode("ascii")
-
-
-def capture() -> tuple[str, int, int, bytes]:
+def capture() -> tuple[encodepool.Frame, Geometry]:
+    global FOVEA_SRC
     d: float = float(cfg("capture_delay", 0.0))
     if d > 0:
         time.sleep(d)
-    cap: tuple[bytes, int, int] | None = _capture_full()
+    geo: Geometry = geometry()
+    cap: tuple[bytes, int, int] | None = _capture_full(geo.screen_w, geo.screen_h)
     if not cap:
-        return "", 0, 0, b""
+        return encodepool.Frame(), geo
     bgra, w, h = cap
-    cr: Any = cfg("capture_crop")
-    if isinstance(cr, dict) and all(k in cr for k in ("x1", "y1", "x2", "y2")):
-        bgra, w, h = _crop_bgra(bgra, w, h, *_crop_px(w, h))
-    ow: int = int(cfg("capture_width", 0))
-    oh: int = int(cfg("capture_height", 0))
-    dw: int = 0
-    dh: int = 0
-    if ow > 0 and oh > 0:
-        dw, dh = ow, oh
-    else:
-        p: int = int(cfg("capture_scale_percent", 100))
-        if 0 < p != 100:
-            dw, dh = max(1, (w * p + 50) // 100), max(1, (h * p + 50) // 100)
-    if dw > 0 and dh > 0 and (w, h) != (dw, dh):
-        s: bytes | None = _stretch(bgra, w, h, dw, dh)
+    bgra, w, h = encodepool.crop_bgra(bgra, w, h, *geo.crop)
+    FOVEA_SRC = (bgra, w, h) if int(cfg("fovea_crops", 0)) > 0 else None
+    if (w, h) != (geo.out_w, geo.out_h):
+        s: bytes | None = _stretch(bgra, w, h, geo.out_w, geo.out_h)
         if s:
-            bgra, w, h = s, dw, dh
-    b64: str = base64.b64encode(_to_png(bgra, w, h)).decode("ascii")
-    log.info("capture %dx%d b64=%d", w, h, len(b64))
-    return b64, w, h, bgra
-
-
-def _build_ghosts(ghost_regions: list[dict[str, Any]], raw_bgra: bytes, img_w: int, img_h: int, turn: int) -> None:
-    max_ghosts: int = int(cfg("ghost_max", 12))
-    for g in ghost_regions:
-        bbox: list[int] = g["bbox_2d"]
-        crop_b64: str = _bbox_crop_b64(raw_bgra, img_w, img_h, bbox)
+            bgra, w, h = s, geo.out_w, geo.out_h
+    geo = geo.with_output(w, h)
+    frame: encodepool.Frame = encodepool.Frame(bgra, w, h, ENCODER)
+    frame.adopt(S.raw)
+    png: int = len(_encoded(frame).png)
+    log.debug("capture %dx%d png=%d reused=%s", w, h, png, frame.reused,
+              extra={"fields": {"w": w, "h": h, "png": png, "reused": frame.reused}})
+    return frame, geo
+
+
+async def _build_ghosts(ghost_regions: list[dict[str, Any]], raw_bgra: bytes, geo: Geometry, turn: int) -> dict[str, int]:
+    max_ghosts: int = max(1, int(int(cfg("ghost_max", 12)) * GHOST_SCALE))
+    thresh: float = float(cfg("ghost_merge_iou", 0.5))
+    regions: list[dict[str, Any]] = ghostring.nms(ghost_regions, thresh)
+    fresh: list[dict[str, Any]] = []
+    matched: int = 0
+    for g in regions:
+        key: int | None = GHOST_RING.match(g["bbox_2d"], g.get("label", ""), thresh)
+        if key is None:
+            fresh.append(g)
+        else:
+            GHOST_RING.touch(key, turn)
+            matched += 1
+    encoded: int = 0
+    rects: list[tuple[int, int, int, int] | None] = list(geo.bboxes_to_img([g["bbox_2d"] for g in fresh]))
+    futs: list[Future[str]] = await asyncio.get_running_loop().run_in_executor(
+        None, ENCODER.encode, raw_bgra, geo.out_w, geo.out_h, rects,
+    )
+    crops: list[str] = await asyncio.gather(*(asyncio.wrap_future(f) for f in futs))
+    for g, crop_b64 in zip(fresh, crops):
         if not crop_b64:
             continue
-        GHOST_RING.append(Ghost(
-            bbox_2d=list(bbox), turn=turn, image_b64=crop_b64, label=g.get("label", ""),
+        encoded += 1
+        GHOST_RING.add(ghostring.Ghost(
+            bbox_2d=list(g["bbox_2d"]), turn=turn, image_b64=crop_b64, label=g.get("label", ""), first_turn=turn,
         ))
-    while len(GHOST_RING) > max_ghosts:
-        GHOST_RING.popleft()
+    evicted: int = GHOST_RING.evict(max_ghosts)
+    return {
+        "regions": len(ghost_regions), "suppressed": len(ghost_regions) - len(regions),
+        "matched": matched, "encoded": encoded, "evicted": evicted, "kept": len(GHOST_RING),
+    }
 
 
 def _ghosts_for_overlay(current_turn: int) -> list[dict[str, Any]]:
@@ -410,33 +554,213 @@ def _ghosts_for_overlay(current_turn: int) -> list[dict[str, Any]]:
             continue
         out.append({
             "bbox_2d": g.bbox_2d, "turn": g.turn, "age": age,
-            "image_b64": g.image_b64, "label": g.label,
+            "image_b64": g.image_b64, "label": g.label, "hits": g.hits, "id": g.gid,
         })
     return out
 
 
 def _ghosts_summary(ghosts: list[dict[str, Any]]) -> list[dict[str, Any]]:
     return [
-        {"bbox_2d": g["bbox_2d"], "turn": g["turn"], "age": g["age"], "label": g["label"]}
+        {"bbox_2d": g["bbox_2d"], "turn": g["turn"], "age": g["age"], "label": g["label"], "hits": g["hits"]}
         for g in ghosts
     ]
 
 
-def _bbox_center(bbox: list[int]) -> tuple[int, int]:
-    return (bbox[0] + bbox[2]) // 2, (bbox[1] + bbox[3]) // 2
+def _fovea_regions(result: pipeline.PipelineResult) -> list[dict[str, Any]]:
+    k: int = int(cfg("fovea_crops", 0))
+    ghosts: list[dict[str, Any]] = sorted(S.ghosts_overlay, key=lambda g: g.get("age", 0)) if cfg("fovea_ghosts", True) else []
+    out: list[dict[str, Any]] = []
+    for r in [*({**z, "source": "zoom"} for z in result.zoom), *({**g, "source": "ghost"} for g in ghosts)]:
+        if len(out) >= k:
+            break
+        if all(ghostring.iou(r["bbox_2d"], o["bbox_2d"]) < 0.5 for o in out):
+            out.append({"bbox_2d": list(r["bbox_2d"]), "label": str(r.get("label", "")), "source": r["source"]})
+    return out
+
+
+def _fovea_crops(regions: list[dict[str, Any]], geo: Geometry) -> list[dict[str, Any]]:
+    global FOVEA_SRC
+    src: tuple[bytes, int, int] | None = FOVEA_SRC
+    FOVEA_SRC = None
+    if src is None or not regions:
+        return []
+    bgra, fw, fh = src
+    pad: float = float(cfg("fovea_pad", 0.15))
+    cap: int = max(16, int(cfg("fovea_crop_px", 448)))
+    bw, bh = _frame_size(geo.crop_w, geo.crop_h)
+    budget: int = int(cfg("fovea_pixel_budget", 0)) or bw * bh
+    plan: list[tuple[dict[str, Any], list[int], tuple[int, int, int, int], float]] = []
+    for r in regions:
+        b: list[int] = r["bbox_2d"]
+        px: int = int((b[2] - b[0]) * pad)
+        py: int = int((b[3] - b[1]) * pad)
+        box: list[int] = [clamp(b[0] - px), clamp(b[1] - py), clamp(b[2] + px), clamp(b[3] + py)]
+        rect: tuple[int, int, int, int] = (box[0] * fw // NORM, box[1] * fh // NORM, box[2] * fw // NORM, box[3] * fh // NORM)
+        cw, ch = rect[2] - rect[0], rect[3] - rect[1]
+        if cw < 8 or ch < 8:
+            continue
+        plan.append((r, box, rect, min(1.0, cap / max(cw, ch))))
+    left: int = budget - geo.out_w * geo.out_h
+    want: float = sum((p[2][2] - p[2][0]) * (p[2][3] - p[2][1]) * p[3] ** 2 for p in plan)
+    f: float = (max(0, left) / want) ** 0.5 if want > left else 1.0
+    out: list[dict[str, Any]] = []
+    for r, box, rect, sc in plan:
+        cw, ch = rect[2] - rect[0], rect[3] - rect[1]
+        dw, dh = int(cw * sc * f), int(ch * sc * f)
+        if dw < 16 or dh < 16:
+            continue
+        data, _, _ = encodepool.crop_bgra(bgra, fw, fh, *rect)
+        if (dw, dh) != (cw, ch):
+            data = _stretch(data, cw, ch, dw, dh) or encodepool.scale_bgra(data, cw, ch, dw, dh)
+        out.append({"bbox_2d": box, "label": r["label"], "source": r["source"], "w": dw, "h": dh,
+                    "scale": round(dw / cw, 3), "frame": _encoded(encodepool.Frame(data, dw, dh, ENCODER))})
+    return out
+
+
+def _encoded(frame: encodepool.Frame) -> encodepool.Frame:
+    frame.b64_bytes
+    return frame
+
+
+def _dhash(frame: encodepool.Frame) -> int:
+    return int(frame.memo("dhash", lambda f: stuckloop.frame_hash(f.bgra, f.w, f.h)))
+
+
+def _ring_put(turn: int, frame: encodepool.Frame) -> None:
+    assert FRAMES is not None
+    if FRAMES.put(turn, frame.bgra, frame.w, frame.h, _dhash(frame)) < 0:
+        log.warning("frame ring: %d bytes exceed slot size %d, turn %d not kept",
+                    len(frame.bgra), FRAMES.slot_bytes, turn)
+
+
+def _ring_frame(turn: int) -> dict[str, Any] | None:
+    got: tuple[bytes, framering.Slot] | None = FRAMES.read(turn) if FRAMES is not None else None
+    if got is None:
+        return None
+    data, slot = got
+    return {**slot.as_dict(), "image_b64": encodepool.Frame(data, slot.w, slot.h, ENCODER).b64}
 
 
-def _jl(path: Path, obj: dict[str, Any]) -> None:
-    with path.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(obj, ensure_ascii=False, separators=(",", ":")))
-        f.write("\n")
+def _memory_holders() -> dict[str, int]:
+    raw: dict[str, int] = S.raw.nbytes()
+    return {
+        "raw_encoded": raw["png"] + raw["b64"],
+        "annotated": sum(S.annotated.nbytes().values()) + sum(S.annotated_delta.nbytes().values()),
+        "raw_bgra": raw["bgra"], "ghost_ring": sum(len(g.image_b64) for g in GHOST_RING),
+        "vlm_json": len(S.vlm_json) + len(S.observation),
+        "broadcast": sum(c.as_dict()["bytes"] for c in CAST.values()),
+    }
 
 
-def _save_artifact(rd: Path, turn: int, suffix: str, b64: str, extra: dict[str, Any]) -> None:
-    nm: str = f"turn_{turn:04d}_{suffix}.png"
-    if b64:
-        (rd / nm).write_bytes(base64.b64decode(b64))
-    _jl(rd / "turns.jsonl", {"turn": turn, "stage": suffix, **extra, f"{suffix}_png": nm})
+async def _memory_turn(turn: int) -> None:
+    global GHOST_SCALE
+    assert MEM is not None
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    rep: dict[str, Any] = await loop.run_in_executor(None, MEM.sample, turn, _memory_holders())
+    steps: list[str] = []
+    if rep["over_budget"]:
+        GHOST_SCALE = max(0.125, GHOST_SCALE / 2)
+        n: int = GHOST_RING.evict(max(1, int(int(cfg("ghost_max", 12)) * GHOST_SCALE)))
+        steps.append(f"ghost_scale={GHOST_SCALE:g} evicted={n}")
+        async with S.lock:
+            S.annotated = S.annotated_delta = encodepool.Frame()
+            S.ghosts_overlay = _ghosts_for_overlay(turn)
+            S.ghosts_seq += 1
+        steps.append("dropped annotated")
+        steps.append(f"gc={gc.collect()}")
+        log.warning("memory %.1fMB over budget %.1fMB: %s", rep["rss_mb"], rep["budget_mb"], "; ".join(steps))
+    elif GHOST_SCALE < 1.0 and MEM.relieved(int(rep["rss_mb"] * memwatch.MB)):
+        GHOST_SCALE = min(1.0, GHOST_SCALE * 2)
+        steps.append(f"ghost_scale={GHOST_SCALE:g}")
+    rep["degrade"] = steps
+    await loop.run_in_executor(ARCHIVE_IO, _save_record, turn, "memory", rep)
+
+
+def debug_memory(stop: bool = False) -> dict[str, Any]:
+    global MEM
+    if stop:
+        if MEM is not None:
+            MEM.stop()
+            if not float(cfg("memory_budget_mb", 0)) and not int(cfg("memory_snapshot_every", 0)):
+                MEM = None
+        return {"ok": True, "tracing": False}
+    if MEM is None:
+        MEM = memwatch.MemoryWatch(
+            S.run_dir or HERE, float(cfg("memory_budget_mb", 0)), 0, int(cfg("memory_trace_frames", 1)),
+        )
+    rep: dict[str, Any] = MEM.sample(S.turn, _memory_holders())
+    rep["snapshot"] = MEM.snapshot(S.turn)
+    return rep
+
+
+def _profile_done(p: sampleprof.SampleProfiler, first: int) -> None:
+    global PROF_LAST
+    rd: Path = S.run_dir or HERE
+    files: dict[str, str] = p.write(rd / f"profile_t{first:04d}-{max(first, S.turn):04d}")
+    PROF_LAST = {"running": False, "turns": [first, S.turn], "files": files, **p.top(int(cfg("profile_top", 15)))}
+    log.info("profile t%d-%d done: %d samples overhead=%.2f%% -> %s", first, S.turn, p.samples,
+             PROF_LAST["overhead_pct"], files["pstats"])
+
+
+def start_profile(turns: int) -> dict[str, Any]:
+    global PROF
+    if PROF is not None and PROF.running:
+        return {"error": "profile already running", **profile_status()}
+    first: int = S.turn + 1
+    last: int = S.turn + max(1, turns)
+    deadline: float = time.monotonic() + float(cfg("profile_max_s", 300))
+    PROF = sampleprof.SampleProfiler(float(cfg("profile_interval_ms", 5)) / 1000, bool(cfg("profile_idle", False)))
+    PROF.start(lambda: S.turn > last or STOP.is_set() or time.monotonic() > deadline,
+               lambda p: _profile_done(p, first))
+    log.info("profiling turns %d-%d every %.1fms", first, last, PROF.interval * 1000)
+    return {"running": True, "turns": [first, last], "interval_ms": PROF.interval * 1000}
+
+
+def profile_status() -> dict[str, Any]:
+    if PROF is not None and PROF.running:
+        return {"running": True, "samples": PROF.samples, "turn": S.turn, "last": PROF_LAST or None}
+    return PROF_LAST or {"running": False}
+
+
+def check_stuck(turn: int, result: pipeline.PipelineResult, frame: encodepool.Frame) -> tuple[str, str]:
+    assert STUCK is not None
+    det: stuckloop.Detection | None = STUCK.update(turn, result.actions, _dhash(frame), result.next_turn)
+    rec: stuckloop.Detection | None = STUCK.recovered
+    if rec is not None:
+        saved: dict[str, Any] = STUCK.savings(rec, int(rec.info["recovered_after"]))
+        log.info("stuck loop from t=%d recovered after %d turns, saved ~%d turns ~%.0fs",
+                 rec.turn, rec.info["recovered_after"], saved["saved_turns_est"], saved["saved_s_est"])
+        _save_record(turn, "stuck_recovered", {**rec.as_dict(), **saved})
+    if det is None:
+        return "", ""
+    response: str = str(cfg("stuck_response", "hint"))
+    saved = STUCK.savings(det, 0) if response in ("pause", "stop") else {}
+    log.warning("stuck loop t=%d: %s x%d frame_static=%d obs_similar=%d -> %s %s", turn, det.action, det.repeats,
+                det.frame_static, det.obs_similar, response, saved)
+    _save_record(turn, "stuck", {**det.as_dict(), "response": response, **saved})
+    hint: str = str(cfg("stuck_hint", "")).replace("{repeats}", str(det.repeats)).replace("{action}", det.action)
+    return response, hint
+
+
+def _make_archive(rd: Path) -> runpack.FilesWriter | runpack.PackWriter:
+    if str(cfg("archive_format", "pack")) == "files":
+        return runpack.FilesWriter(rd)
+    return runpack.PackWriter(
+        rd / runpack.PACK_NAME, int(cfg("pack_index_every", 0)), float(cfg("pack_index_s", 60.0)),
+    )
+
+
+def _save_artifact(
+    turn: int, suffix: str, frame: encodepool.Frame, extra: dict[str, Any], delta: encodepool.Frame | None = None,
+) -> None:
+    assert ARCHIVE is not None
+    nm: str = ARCHIVE.png(turn, suffix, frame.png, delta.png if delta else None)
+    _save_record(turn, suffix, {**extra, f"{suffix}_png": nm})
+
+
+def _save_record(turn: int, stage: str, extra: dict[str, Any]) -> None:
+    assert ARCHIVE is not None
+    ARCHIVE.record({"turn": turn, "stage": stage, **extra})
 
 
 def _mto(x: int, y: int) -> None:
@@ -456,176 +780,175 @@ def _kev(vk: int, up: bool = False) -> None:
     _u32.keybd_event(vk, 0, flags, None)
 
 
-def _type_text(text: str) -> None:
-    for ch in text:
-        vk_scan: int = ctypes.windll.user32.VkKeyScanW(ord(ch))
-        if vk_scan == -1:
-            continue
-        vk: int = vk_scan & 0xFF
-        shift: bool = bool(vk_scan & 0x100)
-        ctrl_mod: bool = bool(vk_scan & 0x200)
-        alt_mod: bool = bool(vk_scan & 0x400)
-        if ctrl_mod:
-            _kev(0x11)
-        if alt_mod:
-            _kev(0x12)
-        if shift:
-            _kev(0x10)
-        _kev(vk)
+def _vk_scan(ch: str) -> int:
+    return int(_u32.VkKeyScanW(ch)) if WIN32 else timeline.ascii_vk_scan(ch)
+
+
+def _send_unicode(text: str) -> None:
+    units: bytes = text.encode("utf-16-le")
+    n: int = len(units) // 2
+    arr: ctypes.Array[_INPUT] = (_INPUT * (n * 2))()
+    for i in range(n):
+        code: int = units[2 * i] | (units[2 * i + 1] << 8)
+        for j, flags in ((2 * i, KEYEVENTF_UNICODE), (2 * i + 1, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP)):
+            arr[j].type = INPUT_KEYBOARD
+            arr[j].u.ki.wScan = code
+            arr[j].u.ki.dwFlags = flags
+    sent: int = int(_u32.SendInput(n * 2, arr, ctypes.sizeof(_INPUT)))
+    if sent != n * 2:
+        log.warning("SendInput sent %d of %d unicode events", sent, n * 2)
+
+
+def _set_clipboard(text: str) -> bool:
+    data: bytes = text.encode("utf-16-le") + b"\x00\x00"
+    for _ in range(10):
+        if _u32.OpenClipboard(None):
+            break
         time.sleep(0.01)
-        _kev(vk, True)
-        if shift:
-            _kev(0x10, True)
-        if alt_mod:
-            _kev(0x12, True)
-        if ctrl_mod:
-            _kev(0x11, True)
-        time.sleep(0.02)
-
-
-def _press_hotkey(keys_str: str) -> None:
-    keys: list[str] = [k.strip().lower() for k in keys_str.split()]
-    vks: list[int] = []
-    for k in keys:
-        vk: int | None = VK_MAP.get(k)
-        if vk is not None:
-            vks.append(vk)
-        elif len(k) == 1:
-            vk_scan: int = ctypes.windll.user32.VkKeyScanW(ord(k))
-            if vk_scan != -1:
-                vks.append(vk_scan & 0xFF)
-    for vk_code in vks:
-        _kev(vk_code)
-        time.sleep(0.02)
-    for vk_code in reversed(vks):
-        _kev(vk_code, True)
-        time.sleep(0.02)
-
-
-def execute(actions: list[dict[str, Any]]) -> None:
+    else:
+        log.warning("clipboard busy")
+        return False
+    try:
+        _u32.EmptyClipboard()
+        h: Any = _k32.GlobalAlloc(GMEM_MOVEABLE, len(data))
+        if not h:
+            return False
+        ptr: Any = _k32.GlobalLock(h)
+        ctypes.memmove(ptr, data, len(data))
+        _k32.GlobalUnlock(h)
+        if not _u32.SetClipboardData(CF_UNICODETEXT, h):
+            _k32.GlobalFree(h)
+            return False
+        return True
+    finally:
+        _u32.CloseClipboard()
+
+
+class Win32Backend:
+    name: str = "win32"
+
+    def __init__(self) -> None:
+        _winmm.timeBeginPeriod(1)
+        self.paste_fallbacks: int = 0
+        self._skip_paste: bool = False
+
+    def _type_instead(self, text: str) -> None:
+        n: int = max(1, int(cfg("type_batch_size", 32)))
+        for i, line in enumerate(text.replace("\r\n", "\n").split("\n")):
+            if i:
+                _kev(timeline.VK_RETURN)
+                _kev(timeline.VK_RETURN, True)
+            for j in range(0, len(line), n):
+                _send_unicode(line[j:j + n])
+
+    def send(self, ev: timeline.InputEvent) -> None:
+        if self._skip_paste and ev.kind in ("key_down", "key_up") and ev.code in (timeline.VK_CONTROL, timeline.VK_V):
+            self._skip_paste = not (ev.kind == "key_up" and ev.code == timeline.VK_CONTROL)
+            return
+        match ev.kind:
+            case "move":
+                _mto(ev.x, ev.y)
+            case "down":
+                _mev(RDN if ev.code else LDN)
+            case "up":
+                _mev(RUP if ev.code else LUP)
+            case "wheel":
+                _mev(WHEEL, ev.code)
+            case "key_down":
+                _kev(ev.code)
+            case "key_up":
+                _kev(ev.code, True)
+            case "text":
+                _send_unicode(ev.text)
+            case "clipboard":
+                if not _set_clipboard(ev.text):
+                    self.paste_fallbacks += 1
+                    self._skip_paste = True
+                    log.warning("clipboard unavailable, typing %d chars via SendInput instead of pasting", len(ev.text))
+                    self._type_instead(ev.text)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        _winmm.timeEndPeriod(1)
+
+
+def _make_input_backend(rd: Path) -> timeline.InputBackend:
+    global TYPE_VERIFIER
+    if SIM is not None:
+        return SIM
+    kind: str = str(cfg("input_backend", "win32")).lower()
+    if kind == "recording":
+        rb: timeline.RecordingBackend = timeline.RecordingBackend(rd / "input_events.jsonl")
+        if cfg("type_verify", False):
+            TYPE_VERIFIER = rb
+        return rb
+    return Win32Backend()
+
+
+def _timing() -> timeline.Timing:
+    return timeline.Timing(
+        action_delay=float(cfg("action_delay_seconds", 0.05)),
+        settle=float(cfg("input_settle_delay", 0.03)),
+        drag_steps=max(1, int(cfg("drag_duration_steps", 20))),
+        drag_step_delay=float(cfg("drag_step_delay", 0.01)),
+        char_gap=float(cfg("type_key_delay", 0.02)),
+        type_mode=str(cfg("type_mode", "auto")),
+        paste_threshold=int(cfg("type_paste_threshold", 64)),
+        batch_size=max(1, int(cfg("type_batch_size", 32))),
+        batch_delay=float(cfg("type_batch_delay", 0.005)),
+    )
+
+
+def execute(actions: list[dict[str, Any]], abort: threading.Event | None = None) -> dict[str, Any]:
     if not cfg("physical_execution", True):
         log.info("exec skip %d", len(actions))
-        return
-    ad: float = float(cfg("action_delay_seconds", 0.05))
-    ds: int = max(1, int(cfg("drag_duration_steps", 20)))
-    dd: float = float(cfg("drag_step_delay", 0.01))
-    drag_start: tuple[int, int] | None = None
-
-    for a in actions:
-        atype: str = a.get("type", "")
-        cx, cy = _bbox_center(a["bbox_2d"])
-        sx, sy = _n2s(cx, cy)
-
-        match atype:
-            case "click":
-                log.info("exec click (%d,%d)", sx, sy)
-                _mto(sx, sy)
-                time.sleep(0.03)
-                _mev(LDN)
-                time.sleep(0.03)
-                _mev(LUP)
-            case "double_click":
-                log.info("exec double_click (%d,%d)", sx, sy)
-                _mto(sx, sy)
-                time.sleep(0.03)
-                _mev(LDN)
-                time.sleep(0.03)
-                _mev(LUP)
-                time.sleep(0.05)
-                _mev(LDN)
-                time.sleep(0.03)
-                _mev(LUP)
-            case "right_click":
-                log.info("exec right_click (%d,%d)", sx, sy)
-                _mto(sx, sy)
-                time.sleep(0.03)
-                _mev(RDN)
-                time.sleep(0.03)
-                _mev(RUP)
-            case "drag_start":
-                drag_start = (sx, sy)
-                log.info("exec drag_start (%d,%d)", sx, sy)
-            case "drag_end":
-                if drag_start is None:
-                    drag_start = (sx, sy)
-                ex, ey = sx, sy
-                bx, by = drag_start
-                log.info("exec drag (%d,%d)->(%d,%d)", bx, by, ex, ey)
-                _mto(bx, by)
-                time.sleep(0.03)
-                _mev(LDN)
-                time.sleep(0.03)
-                for i in range(1, ds + 1):
-                    _mto(bx + (ex - bx) * i // ds, by + (ey - by) * i // ds)
-                    time.sleep(dd)
-                time.sleep(0.03)
-                _mev(LUP)
-                drag_start = None
-            case "scroll_up":
-                clicks: int = 3
-                params: str = a.get("params", "")
-                if params.strip().isdigit():
-                    clicks = int(params.strip())
-                log.info("exec scroll_up %d at (%d,%d)", clicks, sx, sy)
-                _mto(sx, sy)
-                time.sleep(0.03)
-                for _ in range(clicks):
-                    _mev(WHEEL, WHEEL_DELTA)
-                    time.sleep(0.03)
-            case "scroll_down":
-                clicks = 3
-                params = a.get("params", "")
-                if params.strip().isdigit():
-                    clicks = int(params.strip())
-                log.info("exec scroll_down %d at (%d,%d)", clicks, sx, sy)
-                _mto(sx, sy)
-                time.sleep(0.03)
-                for _ in range(clicks):
-                    _mev(WHEEL, -WHEEL_DELTA)
-                    time.sleep(0.03)
-            case "type":
-                text: str = a.get("params", "")
-                log.info("exec type '%s'", text)
-                _type_text(text)
-            case "hotkey":
-                keys_str_val: str = a.get("params", "")
-                log.info("exec hotkey '%s'", keys_str_val)
-                _press_hotkey(keys_str_val)
-            case "key":
-                key_name: str = a.get("params", "").strip().lower()
-                vk_val: int | None = VK_MAP.get(key_name)
-                if vk_val is not None:
-                    log.info("exec key '%s' vk=0x%02X", key_name, vk_val)
-                    _kev(vk_val)
-                    time.sleep(0.03)
-                    _kev(vk_val, True)
-            case _:
-                log.warning("exec unknown action type: '%s'", atype)
-        time.sleep(ad)
+        return {}
+    tl: timeline.Timeline = timeline.compile_actions(actions, geometry().n2s, _timing(), VK_MAP, _vk_scan)
+    log.info("exec %d actions -> %d events (coalesced %d) est=%.3fs",
+             tl.actions, len(tl.events), tl.coalesced, tl.duration)
+    stats: dict[str, Any] = timeline.replay(tl, INPUT, TYPE_VERIFIER, abort)
+    log.info("exec done %.1fms planned=%.1fms jitter mean=%.3fms max=%.3fms",
+             stats["actual_ms"], stats["planned_ms"], stats["jitter_mean_ms"], stats["jitter_max_ms"],
+             extra={"fields": {"exec": stats}})
+    return stats
 
 
-def call_vlm(obs: str, ann_b64: str) -> tuple[str, dict[str, Any], str | None]:
+def _png_part() -> dict[str, Any]:
+    return {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{encodepool.BLOB}"}}
+
+
+def call_vlm(
+    obs: str, image: encodepool.Frame, crops: list[dict[str, Any]] | None = None,
+) -> tuple[str, dict[str, Any], str | None]:
     url: str = str(cfg("api_url", ""))
     u: urllib.parse.ParseResult = urllib.parse.urlparse(url)
     host: str = u.hostname or "127.0.0.1"
     port: int = u.port or 80
     path: str = u.path or "/v1/chat/completions"
-    body: bytes = json.dumps({
+    images: list[encodepool.Frame] = [image, *(c["frame"] for c in crops or ())]
+    body: bytes = encodepool.splice_json({
         "model": str(cfg("model", "")),
         "temperature": float(cfg("temperature", 0.7)),
         "top_p": float(cfg("top_p", 0.9)),
         "max_tokens": int(cfg("max_tokens", 1000)),
         "messages": [
-            {"role": "system", "content": str(cfg("system_prompt", ""))},
+            {"role": "system", "content": str(cfg("system_prompt", "")) + (
+                FOVEA_PROMPT.format(k=int(cfg("fovea_crops", 0))) if int(cfg("fovea_crops", 0)) > 0 else "")},
             {"role": "user", "content": [
                 {"type": "text", "text": obs or "(no prior observation)"},
-                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{ann_b64}"}},
+                _png_part(),
+                *(p for i, c in enumerate(crops or (), 2) for p in (
+                    {"type": "text", "text": f"Image {i}: zoom of {c['label'] or 'region'} at {c['bbox_2d']} of image 1."},
+                    _png_part(),
+                )),
             ]},
         ],
-    }).encode("utf-8")
-    log.info("vlm POST %s:%d%s obs=%d ann=%d", host, port, path, len(obs), len(ann_b64))
+    }, [f.b64_bytes for f in images])
+    log.debug("vlm POST %s:%d%s obs=%d body=%d images=%d", host, port, path, len(obs), len(body), len(images))
     try:
-        conn: http.client.HTTPConnection = http.client.HTTPConnection(host, port)
+        conn: http.client.HTTPConnection = http.client.HTTPConnection(host, port, timeout=WATCH.limit("calling_vlm"))
         conn.request("POST", path, body=body, headers={
             "Content-Type": "application/json",
             "Accept": "application/json",
@@ -643,6 +966,149 @@ def call_vlm(obs: str, ann_b64: str) -> tuple[str, dict[str, Any], str | None]:
         return "", {}, str(e)
 
 
+def fit_budget(text: str) -> tuple[str, dict[str, Any]]:
+    limit: int = int(cfg("obs_token_budget", 0))
+    keep: tuple[str, ...] = tuple(str(k).lower() for k in cfg("budget_keep_sections", ["goal", "lesson"]))
+    out, steps = budget.compact(text, limit, BUDGET, int(cfg("budget_list_cap", 8)), keep)
+    return out, {
+        "limit": limit, "chars_in": len(text), "chars_out": len(out),
+        "est_tokens": BUDGET.tokens(len(out)), "steps": steps,
+    }
+
+
+def run_pipeline(raw: str) -> tuple[pipeline.PipelineResult, dict[str, Any]]:
+    if PIPE is None:
+        t0: float = time.perf_counter()
+        r: pipeline.PipelineResult = pipeline.process(raw)
+        return r, {"version": "inproc", "fallback": None, "ms": round((time.perf_counter() - t0) * 1000, 3)}
+    PIPE.timeout = float(cfg("pipeline_timeout", 2.0))
+    return PIPE.process(raw)
+
+
+async def _within(stage: str, aw: Awaitable[Any], cancel: bool = False) -> bool:
+    fut: asyncio.Future[Any] = asyncio.ensure_future(aw)
+    done, _ = await asyncio.wait({fut}, timeout=WATCH.limit(stage))
+    if not done and cancel:
+        fut.cancel()
+    return bool(done)
+
+
+async def _fallback(turn: int, action: str) -> None:
+    ev: dict[str, Any] = WATCH.fallback(action)
+    log.warning("deadline %s t=%d after %.1fs: %s", ev["phase"], turn, ev["elapsed_s"], action)
+    await asyncio.get_running_loop().run_in_executor(ARCHIVE_IO, _save_record, turn, "watchdog", ev)
+
+
+async def _pause(delay: float) -> bool:
+    waits: list[asyncio.Future[Any]] = [asyncio.ensure_future(STOP.wait()), asyncio.ensure_future(S.next_event.wait())]
+    done, pending = await asyncio.wait(waits, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+    for f in pending:
+        f.cancel()
+    return not done
+
+
+def _retry_delay(attempt: int) -> float:
+    return breaker.backoff(attempt, float(cfg("retry_base_s", 1.0)), float(cfg("retry_cap_s", 30.0)))
+
+
+async def _requeue(turn: int, observation: str, why: str) -> None:
+    log.warning("turn %d %s; next turn keeps the observation", turn, why)
+    async with S.lock:
+        S.next_vlm = json.dumps({"observation": observation, "regions": [], "actions": []}, ensure_ascii=False)
+        S.next_event.set()
+
+
+async def _capture_turn(turn: int) -> tuple[encodepool.Frame, Geometry]:
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    tries: int = max(0, int(cfg("capture_retries", 3))) + 1
+    for attempt in range(1, tries + 1):
+        set_phase("capturing")
+        cap_fut: asyncio.Future[tuple[encodepool.Frame, Geometry]] = loop.run_in_executor(None, capture)
+        if await _within("capturing", cap_fut):
+            out: tuple[encodepool.Frame, Geometry] = cap_fut.result()
+            if out[0]:
+                return out
+        else:
+            await _fallback(turn, "treat as capture failure")
+        delay: float = _retry_delay(attempt) if attempt < tries else 0.0
+        log.error("capture failed t=%d attempt %d/%d", turn, attempt, tries)
+        await loop.run_in_executor(ARCHIVE_IO, _save_record, turn, "error", {
+            "phase": "error", "error": "capture failed", "attempt": attempt, "retry_in_s": round(delay, 3) or None,
+        })
+        if not delay or not await _pause(delay):
+            break
+    return encodepool.Frame(), geometry()
+
+
+async def _vlm_turn(turn: int, vlm_obs: str, image: encodepool.Frame, crops: list[dict[str, Any]]) -> tuple[str, str]:
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    retries: int = int(cfg("vlm_max_retries", 6))
+    attempt: int = 0
+    while True:
+        if not BREAKER.allow():
+            wait: float = BREAKER.wait_s()
+            log.warning("vlm circuit open t=%d, probing in %.1fs", turn, wait)
+            set_phase("vlm_circuit_open", f"circuit open, probing in {wait:.0f}s")
+            if not await _pause(wait):
+                return "", "interrupted"
+            continue
+        attempt += 1
+        set_phase("calling_vlm")
+        t_vlm: float = time.perf_counter()
+        est_prompt: int = BUDGET.prompt(len(vlm_obs))
+        vlm_fut: asyncio.Future[tuple[str, dict[str, Any], str | None]] = loop.run_in_executor(
+            None, call_vlm, vlm_obs, image, crops,
+        )
+        if await _within("calling_vlm", vlm_fut):
+            txt, usage, err = vlm_fut.result()
+        else:
+            await _fallback(turn, "abandon request")
+            txt, usage, err = "", {}, "deadline exceeded"
+        if not err and not txt.strip():
+            err = "empty response"
+        vlm_ms: float = round((time.perf_counter() - t_vlm) * 1000, 3)
+        if isinstance(usage.get("prompt_tokens"), int):
+            BUDGET.observe(len(vlm_obs), usage["prompt_tokens"])
+        S.usage.update({k: v for k, v in usage.items() if k.endswith("_tokens") and isinstance(v, int)})
+        if err:
+            BREAKER.failure()
+        else:
+            BREAKER.success()
+        final: bool = not err or 0 < retries < attempt
+        delay: float = 0.0 if final else _retry_delay(attempt)
+        await loop.run_in_executor(ARCHIVE_IO, _save_record, turn, "vlm", {
+            "ms": vlm_ms, "usage": usage, "est_prompt_tokens": est_prompt, "estimator": BUDGET.as_dict(),
+            "error": err or None, "phase": "vlm_error" if err else "ok", "attempt": attempt,
+            "retry_in_s": round(delay, 3) or None, "breaker": BREAKER.as_dict(), "images": 1 + len(crops),
+            **(WATCH.turn_done() if final else {}),
+        })
+        if not err:
+            return txt, "ok"
+        log.error("vlm err t=%d attempt %d: %s", turn, attempt, err)
+        if final:
+            return "", "failed"
+        set_phase("vlm_retry", f"{err}; retry {attempt} in {delay:.1f}s")
+        if not await _pause(delay):
+            return "", "interrupted"
+
+
+async def watchdog_loop() -> None:
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    iv: float = max(0.05, float(cfg("watchdog_interval_s", 1.0)))
+    while not STOP.is_set():
+        t0: float = time.monotonic()
+        await asyncio.sleep(iv)
+        lag: float = time.monotonic() - t0 - iv
+        evs: list[dict[str, Any]] = [WATCH.stall(lag)] if lag > iv else []
+        ev: dict[str, Any] | None = WATCH.check()
+        if ev is not None:
+            evs.append(ev)
+        for ev in evs:
+            log.warning("watchdog %s phase=%s t=%d elapsed=%.1fs deadline=%s",
+                        ev["event"], ev["phase"], ev["turn"], ev["elapsed_s"], ev["deadline_s"])
+            await loop.run_in_executor(ARCHIVE_IO, _save_record, ev["turn"], "watchdog", ev)
+
+
 async def engine_loop(rd: Path) -> None:
     S.run_dir = rd
     bt: bool = bool(cfg("boot_enabled", True))
@@ -656,11 +1122,15 @@ async def engine_loop(rd: Path) -> None:
         set_phase("waiting_inject")
 
     loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
-    raw_bgra_buf: bytes = b""
-    raw_w: int = 0
-    raw_h: int = 0
+    prev: encodepool.Frame = encodepool.Frame()
+    raw_geo: Geometry | None = None
 
     while not STOP.is_set():
+        if (MAX_TURNS and S.turn >= MAX_TURNS) or (SIM is not None and SIM.done):
+            log.info("run finished at turn %d%s", S.turn, " (goal reached)" if SIM is not None and SIM.done else "")
+            set_phase("stopped", "finished")
+            STOP.set()
+            break
         try:
             await asyncio.wait_for(S.next_event.wait(), timeout=0.5)
         except asyncio.TimeoutError:
@@ -677,15 +1147,37 @@ async def engine_loop(rd: Path) -> None:
         async with S.lock:
             S.turn += 1
             turn: int = S.turn
+        if SIM is not None:
+            SIM.turn = turn
         log.info("=== TURN %d ===", turn)
         set_phase("running")
 
-        result: pipeline.PipelineResult = pipeline.process(vlm_raw)
-        log.info("pipeline ghosts=%d actions=%d heat=%d next=%d",
-                 len(result.ghosts), len(result.actions), len(result.heat), len(result.next_turn))
-
-        if raw_bgra_buf and result.ghosts:
-            _build_ghosts(result.ghosts, raw_bgra_buf, raw_w, raw_h, turn)
+        pipe_info: dict[str, Any]
+        result: pipeline.PipelineResult
+        t_pipe: float = time.perf_counter()
+        pipe_fut: asyncio.Future[tuple[pipeline.PipelineResult, dict[str, Any]]] = loop.run_in_executor(
+            None, run_pipeline, vlm_raw)
+        if PIPE is not None or await _within("running", pipe_fut):
+            result, pipe_info = await pipe_fut
+        else:
+            await _fallback(turn, "forward raw text")
+            result = pipeline_host._fallback(vlm_raw)
+            pipe_info = {"version": "inproc", "fallback": "raw: deadline",
+                         "ms": round((time.perf_counter() - t_pipe) * 1000, 3)}
+        result = pipeline.remap_images(result, S.fovea_boxes)
+        log.info("pipeline %s %.1fms ghosts=%d actions=%d heat=%d next=%d fallback=%s",
+                 pipe_info["version"], pipe_info["ms"], len(result.ghosts), len(result.actions),
+                 len(result.heat), len(result.next_turn), pipe_info["fallback"])
+        if result.repair:
+            log.warning("pipeline repair t=%d: %s", turn, ",".join(result.repair))
+        vlm_obs, budget_info = fit_budget(result.next_turn)
+        if budget_info["steps"]:
+            log.info("budget t=%d %d->%d chars est=%d tok: %s", turn, budget_info["chars_in"],
+                     budget_info["chars_out"], budget_info["est_tokens"], ",".join(budget_info["steps"]))
+
+        ghost_task: asyncio.Task[dict[str, int]] | None = None
+        if prev and raw_geo is not None and result.ghosts:
+            ghost_task = asyncio.create_task(_build_ghosts(result.ghosts, prev.bgra, raw_geo, turn))
 
         async with S.lock:
             S.vlm_json = vlm_raw
@@ -695,64 +1187,101 @@ async def engine_loop(rd: Path) -> None:
             S.heat_data = result.heat
             S.raw_display = result.raw_display
             S.msg_id += 1
-            S.ghosts_overlay = _ghosts_for_overlay(turn)
 
         set_phase("executing")
-        await loop.run_in_executor(None, execute, result.actions)
-
-        set_phase("capturing")
-        raw_b64, w, h, raw_bgra = await loop.run_in_executor(None, capture)
-        if not raw_b64:
-            log.error("capture failed")
+        abort: threading.Event = threading.Event()
+        exec_fut: asyncio.Future[dict[str, Any]] = loop.run_in_executor(None, execute, result.actions, abort)
+        if not await _within("executing", exec_fut):
+            abort.set()
+            await _fallback(turn, "abort input replay")
+            await asyncio.wait({exec_fut}, timeout=2.0)
+        exec_stats: dict[str, Any] = exec_fut.result() if exec_fut.done() else {"aborted": True, "stuck": True}
+
+        frame, geo = await _capture_turn(turn)
+        ghost_stats: dict[str, int] = await ghost_task if ghost_task is not None else {}
+        if ghost_stats:
+            log.info("ghosts t=%d %s", turn, " ".join(f"{k}={v}" for k, v in ghost_stats.items()))
+        async with S.lock:
+            S.ghosts_overlay = _ghosts_for_overlay(turn)
+            S.ghosts_seq += 1
+        if not frame:
             set_phase("error", "capture failed")
-            safe: str = json.dumps({"observation": "Capture failed. Retrying.", "regions": [], "actions": []})
-            async with S.lock:
-                S.next_vlm = safe
-                S.next_event.set()
+            if not STOP.is_set() and not S.next_event.is_set():
+                await _requeue(turn, result.next_turn, "capture failed")
             continue
 
-        raw_bgra_buf, raw_w, raw_h = raw_bgra, w, h
+        prev, raw_geo = frame, geo
+        if FRAMES is not None:
+            await loop.run_in_executor(ARCHIVE_IO, _ring_put, turn, frame)
         async with S.lock:
-            S.raw_b64 = raw_b64
+            S.raw = frame
             S.raw_seq += 1
             ghosts_snapshot: list[dict[str, Any]] = list(S.ghosts_overlay)
             actions_snapshot: list[dict[str, Any]] = list(S.actions_data)
 
         await loop.run_in_executor(
-            None, _save_artifact, rd, turn, "raw", raw_b64,
+            ARCHIVE_IO, _save_artifact, turn, "raw", frame,
             {"observation": result.next_turn, "ghosts": result.ghosts,
-             "actions": actions_snapshot, "ghosts_visible": _ghosts_summary(ghosts_snapshot)},
+             "actions": actions_snapshot, "ghosts_visible": _ghosts_summary(ghosts_snapshot),
+             "exec": exec_stats, "pipeline": pipe_info, "vlm_raw": vlm_raw, "repair": result.repair,
+             "ghost_stats": ghost_stats, "budget": budget_info,
+             "frame": {"digest": frame.digest, "reused": frame.reused}},
         )
 
+        if STUCK is not None:
+            response, hint = await loop.run_in_executor(ARCHIVE_IO, check_stuck, turn, result, frame)
+            if response == "hint" and hint:
+                vlm_obs = f"{vlm_obs}\n\n{hint}" if vlm_obs else hint
+            elif response == "pause":
+                STUCK.reset()
+                set_phase("waiting_inject", "stuck loop: paused, inject to resume")
+                continue
+            elif response == "stop":
+                set_phase("stopped", "stuck loop")
+                STOP.set()
+                break
+
         async with S.lock:
             S.pending_seq = turn
             S.annotated_seq = -1
-            S.annotated_b64 = ""
+            S.annotated = S.annotated_delta = encodepool.Frame()
             S.annotated_event.clear()
 
-        set_phase("waiting_annotated")
-        await S.annotated_event.wait()
+        annotated: bool = False
+        if not HEADLESS:
+            set_phase("waiting_annotated")
+            annotated = await _within("waiting_annotated", S.annotated_event.wait(), cancel=True)
+            if not annotated:
+                await _fallback(turn, "send unannotated frame")
 
         async with S.lock:
-            ann_b64: str = S.annotated_b64
+            image: encodepool.Frame = S.annotated if annotated else S.raw
+            delta: encodepool.Frame | None = S.annotated_delta if annotated and S.annotated_delta else None
+
+        crops: list[dict[str, Any]] = []
+        if FOVEA_SRC is not None:
+            crops = await loop.run_in_executor(None, _fovea_crops, _fovea_regions(result), geo)
+        S.fovea_boxes = [c["bbox_2d"] for c in crops]
 
         await loop.run_in_executor(
-            None, _save_artifact, rd, turn, "ann", ann_b64,
+            ARCHIVE_IO, _save_artifact, turn, "ann", image,
             {"ghosts_rendered": _ghosts_summary(ghosts_snapshot),
              "actions_rendered": actions_snapshot,
-             "ghost_count": len(ghosts_snapshot)},
+             "ghost_count": len(ghosts_snapshot), "annotated": annotated,
+             "fovea": [{k: v for k, v in c.items() if k != "frame"} for c in crops],
+             "pixels": geo.out_w * geo.out_h + sum(c["w"] * c["h"] for c in crops)},
+            delta,
         )
 
-        set_phase("calling_vlm")
-        txt, usage, err = await loop.run_in_executor(None, call_vlm, result.next_turn, ann_b64)
+        txt, status = await _vlm_turn(turn, vlm_obs, image, crops)
+        if MEM is not None:
+            await _memory_turn(turn)
 
-        if err:
-            log.error("vlm err t=%d: %s", turn, err)
-            set_phase("vlm_error", err)
-            safe = json.dumps({"observation": f"VLM error: {err}. Retrying.", "regions": [], "actions": []})
-            async with S.lock:
-                S.next_vlm = safe
-                S.next_event.set()
+        if status == "interrupted":
+            continue
+        if status == "failed":
+            set_phase("vlm_error", f"gave up after {int(cfg('vlm_max_retries', 6)) + 1} attempts")
+            await _requeue(turn, result.next_turn, "VLM failed")
             continue
 
         log.info("vlm ok t=%d len=%d", turn, len(txt))
@@ -762,6 +1291,10 @@ async def engine_loop(rd: Path) -> None:
         set_phase("running")
 
 
+def _json_bytes(obj: Any) -> bytes:
+    return obj if isinstance(obj, bytes) else json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
 class Server:
     def __init__(self, host: str, port: int) -> None:
         self._h: str = host
@@ -770,6 +1303,8 @@ class Server:
 
     async def start(self) -> None:
         self._srv = await asyncio.start_server(self._conn, self._h, self._p)
+        self._p = self._srv.sockets[0].getsockname()[1]
+        _CFG["port"] = self._p
         log.info("http://%s:%d", self._h, self._p)
 
     async def stop(self) -> None:
@@ -797,7 +1332,7 @@ class Server:
         if len(parts) < 2:
             return
         method: str = parts[0]
-        path: str = parts[1].split("?", 1)[0]
+        path, _, query = parts[1].partition("?")
         hd: dict[str, str] = {}
         while True:
             hl: bytes = await r.readline()
@@ -813,15 +1348,16 @@ class Server:
             body = await r.readexactly(cl)
         match method:
             case "GET":
-                await self._get(path, w)
+                await self._get(path, hd, w, dict(urllib.parse.parse_qsl(query)))
             case "POST":
-                await self._post(path, body, w)
+                await self._post(path, hd, body, w)
             case "OPTIONS":
                 await self._json(w, {})
             case _:
                 await self._err(w, 405)
 
-    async def _get(self, path: str, w: asyncio.StreamWriter) -> None:
+    async def _get(self, path: str, hd: dict[str, str], w: asyncio.StreamWriter, q: dict[str, str]) -> None:
+        rep: dict[str, Any]
         match path:
             case "/" | "/index.html":
                 await self._raw(w, 200, "text/html; charset=utf-8", PANEL_HTML.read_bytes())
@@ -832,31 +1368,75 @@ class Server:
                     "ui": cfg("ui", {}),
                     "capture_width": int(cfg("capture_width", 512)),
                     "capture_height": int(cfg("capture_height", 288)),
+                    "archive_format": str(cfg("archive_format", "pack")),
                 })
             case "/config_full":
                 await self._json(w, _CFG)
             case "/pipeline_source":
                 await self._json(w, {"source": PIPELINE_PY.read_text("utf-8")})
             case "/state":
-                async with S.lock:
-                    await self._json(w, {
-                        "phase": S.phase, "error": S.error, "turn": S.turn, "msg_id": S.msg_id,
-                        "pending_seq": S.pending_seq, "annotated_seq": S.annotated_seq, "raw_seq": S.raw_seq,
-                        "actions": S.actions_data, "heat": S.heat_data,
-                        "observation": S.observation,
-                        "raw_display": S.raw_display,
-                        "ghost_count": len(S.ghosts_overlay),
-                    })
+                if hd.get("x-franz-role", "") == "compositor":
+                    LEASE.claim(hd.get("x-franz-client", ""))
+                await self._cast(w, "state", lambda: (
+                    S.phase, S.error, S.turn, S.msg_id, S.pending_seq, S.annotated_seq, S.raw_seq, S.ghosts_seq,
+                    LEASE.current(),
+                ), lambda v: {
+                    "version": v, "phase": S.phase, "error": S.error, "turn": S.turn, "msg_id": S.msg_id,
+                    "pending_seq": S.pending_seq, "annotated_seq": S.annotated_seq, "raw_seq": S.raw_seq,
+                    "actions": S.actions_data, "heat": S.heat_data,
+                    "observation": S.observation,
+                    "raw_display": S.raw_display,
+                    "ghost_count": len(S.ghosts_overlay),
+                    "compositor": LEASE.current(),
+                })
             case "/frame":
-                async with S.lock:
-                    await self._json(w, {"seq": S.raw_seq, "raw_b64": S.raw_b64})
+                await self._cast(w, "frame", lambda: S.raw_seq, lambda v: encodepool.splice_json(
+                    {"seq": S.raw_seq, "raw_b64": encodepool.BLOB}, [S.raw.b64_bytes],
+                ))
             case "/ghosts":
-                async with S.lock:
-                    await self._json(w, {"turn": S.turn, "ghosts": S.ghosts_overlay})
+                await self._cast(w, "ghosts", lambda: (S.turn, S.ghosts_seq), lambda v: {
+                    "turn": S.turn, "ghosts": S.ghosts_overlay,
+                })
+            case "/frames":
+                await self._json(w, {
+                    "ring": FRAMES.stats() if FRAMES is not None else None,
+                    "frames": [e.as_dict() for e in FRAMES] if FRAMES is not None else [],
+                })
+            case p if p.startswith("/frames/") and p[8:].isdigit():
+                fr: dict[str, Any] | None = await asyncio.get_running_loop().run_in_executor(
+                    None, _ring_frame, int(p[8:]),
+                )
+                if fr is None:
+                    await self._err(w, 404)
+                else:
+                    await self._json(w, fr)
+            case "/watchdog":
+                await self._json(w, {**WATCH.as_dict(), "vlm_breaker": BREAKER.as_dict()})
+            case "/fanout":
+                await self._json(w, {"lease": LEASE.as_dict(), **{k: c.as_dict() for k, c in CAST.items()}})
+            case "/debug/profile":
+                if "turns" in q:
+                    rep = start_profile(int(q["turns"]) if q["turns"].isdigit() else 1)
+                    if q.get("wait") and PROF is not None and "error" not in rep:
+                        while PROF.running and not STOP.is_set():
+                            await asyncio.sleep(0.1)
+                        rep = profile_status()
+                else:
+                    rep = profile_status()
+                await self._json(w, rep, 409 if "error" in rep else 200)
+            case "/debug/profile/stop":
+                if PROF is not None and PROF.running:
+                    await asyncio.get_running_loop().run_in_executor(None, PROF.stop)
+                await self._json(w, profile_status())
+            case "/debug/memory" | "/debug/memory/stop":
+                rep = await asyncio.get_running_loop().run_in_executor(
+                    None, debug_memory, path.endswith("/stop"),
+                )
+                await self._json(w, rep)
             case _:
                 await self._err(w, 404)
 
-    async def _post(self, path: str, body: bytes, w: asyncio.StreamWriter) -> None:
+    async def _post(self, path: str, hd: dict[str, str], body: bytes, w: asyncio.StreamWriter) -> None:
         match path:
             case "/annotated":
                 try:
@@ -866,6 +1446,11 @@ class Server:
                     return
                 seq: Any = obj.get("seq")
                 img: Any = obj.get("image_b64", "")
+                delta: Any = obj.get("delta_b64", "")
+                client: str = hd.get("x-franz-client", "")
+                if not LEASE.claim(client) and LEASE.current():
+                    await self._json(w, {"ok": False, "err": "not compositor", "compositor": LEASE.current()}, 403)
+                    return
                 async with S.lock:
                     exp: int = S.pending_seq
                 if seq != exp:
@@ -875,10 +1460,20 @@ class Server:
                     await self._json(w, {"ok": False, "err": "img short"}, 400)
                     return
                 async with S.lock:
-                    S.annotated_b64 = img
+                    S.annotated = encodepool.Frame.from_b64(img)
+                    S.annotated_delta = encodepool.Frame.from_b64(delta if isinstance(delta, str) else "")
                     S.annotated_seq = seq
                     S.annotated_event.set()
                 await self._json(w, {"ok": True, "seq": seq})
+            case "/lease":
+                try:
+                    obj = json.loads(body.decode("utf-8"))
+                except Exception:
+                    await self._json(w, {"ok": False, "err": "bad json"}, 400)
+                    return
+                who: str = str(obj.get("client", ""))
+                ok: bool = LEASE.release(who) if obj.get("release") else LEASE.claim(who)
+                await self._json(w, {"ok": ok, **LEASE.as_dict()})
             case "/inject":
                 try:
                     obj = json.loads(body.decode("utf-8"))
@@ -900,8 +1495,7 @@ class Server:
                     await self._json(w, {"ok": False, "err": "bad json"}, 400)
                     return
                 CONFIG_PATH.write_text(json.dumps(obj, indent=2, ensure_ascii=False), "utf-8")
-                global _CFG
-                _CFG = obj
+                _set_config(obj)
                 log.info("config saved")
                 await self._json(w, {"ok": True})
             case "/save_pipeline":
@@ -913,13 +1507,30 @@ class Server:
                 source: str = obj.get("source", "")
                 PIPELINE_PY.write_text(source, "utf-8")
                 log.info("pipeline.py saved")
-                await self._json(w, {"ok": True})
+                if PIPE is None:
+                    await self._json(w, {"ok": True, "live": False})
+                    return
+                info: dict[str, Any] = await asyncio.get_running_loop().run_in_executor(None, PIPE.reload, source)
+                log.info("pipeline reload %s ok=%s %.1fms err=%s",
+                         info["version"], info["ok"], info["reload_ms"], info["err"])
+                await self._json(w, {"ok": True, "live": info["ok"], "version": info["version"],
+                                     "reload_ms": info["reload_ms"], "err": info["err"]})
             case _:
                 await self._err(w, 404)
 
-    async def _raw(self, w: asyncio.StreamWriter, code: int, ct: str, data: bytes) -> None:
+    async def _cast(
+        self, w: asyncio.StreamWriter, name: str, key: Callable[[], Hashable], body: Callable[[int], Any],
+    ) -> None:
+        async with S.lock:
+            data: bytes = CAST[name].get(key(), lambda v: self._response(200, "application/json", _json_bytes(body(v))))
+        w.write(data)
+        await w.drain()
+
+    @staticmethod
+    def _response(code: int, ct: str, data: bytes) -> bytes:
         status_map: dict[int, str] = {
-            200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+            200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+            409: "Conflict",
         }
         st: str = status_map.get(code, "OK")
         headers: str = (
@@ -929,10 +1540,13 @@ class Server:
             f"Cache-Control: no-cache\r\n"
             f"Access-Control-Allow-Origin: *\r\n"
             f"Access-Control-Allow-Methods: GET,POST,OPTIONS\r\n"
-            f"Access-Control-Allow-Headers: Content-Type\r\n"
+            f"Access-Control-Allow-Headers: Content-Type, X-Franz-Client, X-Franz-Role\r\n"
             f"Connection: close\r\n\r\n"
         )
-        w.write(headers.encode() + data)
+        return headers.encode() + data
+
+    async def _raw(self, w: asyncio.StreamWriter, code: int, ct: str, data: bytes) -> None:
+        w.write(self._response(code, ct, data))
         await w.drain()
 
     async def _json(self, w: asyncio.StreamWriter, obj: Any, code: int = 200) -> None:
@@ -942,30 +1556,155 @@ class Server:
         await self._json(w, {"error": code}, code)
 
 
+def _start_sim(rd: Path) -> None:
+    global SIM, MOCK
+    scenario: str = str(cfg("sim_scenario", ""))
+    SIM = simenv.SimDesktop(simenv.load_scenario(HERE / scenario if scenario else None), rd / "sim_events.jsonl")
+    if cfg("sim_mock_vlm", True):
+        MOCK = simenv.MockVLM(
+            SIM, lambda x, y: geometry().s2n(x, y), int(cfg("sim_seed", 0)), float(cfg("sim_vlm_latency_s", 0.0)),
+            float(cfg("sim_vlm_miss", 0.0)), float(cfg("sim_vlm_fail", 0.0)),
+        )
+        _CFG["api_url"] = MOCK.serve()
+    log.info("headless scenario=%s %dx%d vlm=%s", SIM.scenario, SIM.w, SIM.h, cfg("api_url", ""))
+
+
+def _run_summary(rd: Path, wall: float) -> dict[str, Any]:
+    w: dict[str, Any] = WATCH.as_dict()
+    out: dict[str, Any] = {
+        "run_dir": str(rd), "turns": S.turn, "wall_s": round(wall, 3),
+        "turns_per_s": round(S.turn / wall, 3) if wall > 0 else 0.0,
+        "turn_mean_ms": w["turn_mean_ms"], "worst_turn_ms": w["worst_turn_ms"],
+        "stage_mean_ms": w["stage_mean_ms"], "stage_max_ms": w["stage_max_ms"],
+        "breaker": BREAKER.as_dict(), "watchdog": w["counts"], "tokens": dict(S.usage),
+        "port": int(cfg("port", 0)),
+    }
+    if SIM is not None:
+        out["sim"] = SIM.summary()
+    if MOCK is not None:
+        out["mock_vlm"] = MOCK.as_dict()
+    (rd / "sim_summary.json").write_text(json.dumps(out, indent=2), "utf-8")
+    return out
+
+
 async def async_main() -> None:
-    global S, STOP
+    global S, STOP, INPUT, PIPE, ARCHIVE, BUDGET, ENCODER, ARCHIVE_IO, MEM, STUCK, LEASE, FRAMES, WATCH, BREAKER
     S, STOP = State(), asyncio.Event()
+    WATCH = stagewatch.StageWatch(dict(cfg("stage_deadlines_s", {})))
+    BREAKER = breaker.CircuitBreaker(int(cfg("breaker_threshold", 4)), float(cfg("breaker_cooldown_s", 30.0)))
+    LEASE = fanout.Lease(float(cfg("compositor_lease_s", 5.0)))
+    BUDGET = budget.Estimator(float(cfg("budget_chars_per_token", 4.0)))
     rd: Path = make_run_dir()
-    setup_logging(rd)
+    logs: logqueue.LogQueue = setup_logging(rd)
+    if HEADLESS:
+        _start_sim(rd)
+    ARCHIVE = _make_archive(rd)
+    ARCHIVE_IO = ThreadPoolExecutor(1, thread_name_prefix="archive")
+    if str(cfg("stuck_response", "hint")) != "off":
+        STUCK = stuckloop.StuckDetector(
+            int(cfg("stuck_window", 6)), int(cfg("stuck_repeats", 4)),
+            horizon=int(cfg("stuck_horizon", 20)),
+        )
+    if float(cfg("memory_budget_mb", 0)) > 0 or int(cfg("memory_snapshot_every", 0)) > 0:
+        MEM = memwatch.MemoryWatch(
+            rd, float(cfg("memory_budget_mb", 0)), int(cfg("memory_snapshot_every", 0)),
+            int(cfg("memory_trace_frames", 1)),
+        )
+    ENCODER = encodepool.EncodePool(
+        str(cfg("encode_backend", "thread")), int(cfg("encode_workers", 2)),
+        int(cfg("encode_max_pending", 8)), int(cfg("png_level", 6)),
+    )
+    INPUT = _make_input_backend(rd)
+    if int(cfg("frame_ring_slots", 0)) > 0:
+        geo: Geometry = geometry()
+        FRAMES = framering.FrameRing(
+            rd / "frames.ring", int(cfg("frame_ring_slots", 0)),
+            max(geo.out_w * geo.out_h * 4, int(float(cfg("frame_ring_slot_mb", 0)) * memwatch.MB)),
+        )
+    if cfg("pipeline_worker", True):
+        PIPE = pipeline_host.PipelineHost(PIPELINE_PY, float(cfg("pipeline_timeout", 2.0)))
     log.info("Franz start rd=%s", rd)
     srv: Server = Server(str(cfg("host", "127.0.0.1")), int(cfg("port", 1234)))
-    await srv.start()
-    webbrowser.open(f"http://{cfg('host', '127.0.0.1')}:{cfg('port', 1234)}")
-    task: asyncio.Task[None] = asyncio.create_task(engine_loop(rd))
+    tasks: list[asyncio.Task[None]] = []
+    t_run: float = time.perf_counter()
     try:
+        await srv.start()
+        if not HEADLESS:
+            webbrowser.open(f"http://{cfg('host', '127.0.0.1')}:{cfg('port', 1234)}")
+        t_run = time.perf_counter()
+        if PROFILE_TURNS:
+            start_profile(PROFILE_TURNS)
+        tasks = [asyncio.create_task(engine_loop(rd)), asyncio.create_task(watchdog_loop())]
         await STOP.wait()
     except KeyboardInterrupt:
-        STOP.set()
-    task.cancel()
-    try:
-        await task
-    except asyncio.CancelledError:
         pass
-    await srv.stop()
-    log.info("Franz stopped")
+    finally:
+        STOP.set()
+        for t in tasks:
+            t.cancel()
+            try:
+                await t
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                log.exception("%s failed", t.get_coro().__name__)
+        wall: float = time.perf_counter() - t_run
+        try:
+            if PROF is not None and PROF.running:
+                PROF.stop()
+            await srv.stop()
+            INPUT.close()
+            if MOCK is not None:
+                MOCK.close()
+            if PIPE is not None:
+                PIPE.close()
+            ENCODER.close()
+            ARCHIVE_IO.shutdown(wait=True)
+        finally:
+            try:
+                ARCHIVE.close()
+                if FRAMES is not None:
+                    FRAMES.close()
+                if HEADLESS:
+                    print(json.dumps(_run_summary(rd, wall)), flush=True)
+                log.info("Franz stopped (log queue %s)", logs.as_dict())
+            finally:
+                logs.stop()
+
+
+def _cli_config(obj: dict[str, Any], a: argparse.Namespace) -> dict[str, Any]:
+    if a.headless:
+        obj.update(HEADLESS_CFG)
+        if not str(obj.get("boot_vlm_output", "")).strip():
+            obj["boot_vlm_output"] = json.dumps({"observation": "First turn.", "regions": [], "actions": []})
+    if a.config:
+        obj.update(json.loads(a.config.read_text("utf-8")))
+    if a.port is not None:
+        obj["port"] = a.port
+    if a.runs_dir:
+        obj["runs_dir"] = a.runs_dir
+    return obj
 
 
 def main() -> None:
+    global HEADLESS, MAX_TURNS, PROFILE_TURNS
+    ap: argparse.ArgumentParser = argparse.ArgumentParser(description="Franz vision-action agent")
+    ap.add_argument("--headless", action="store_true", help="run against the simulated desktop (simenv.py), no panel")
+    ap.add_argument("--config", type=Path, help="JSON merged over config.json")
+    ap.add_argument("--port", type=int, help="panel server port")
+    ap.add_argument("--runs-dir", help="directory for run_NNNN folders")
+    ap.add_argument("--max-turns", type=int, default=0, help="stop after this many turns")
+    ap.add_argument("--profile-turns", type=int, default=0, help="sample-profile the first N turns")
+    a: argparse.Namespace = ap.parse_args()
+    HEADLESS, MAX_TURNS, PROFILE_TURNS = a.headless, max(0, a.max_turns), max(0, a.profile_turns)
+    if HEADLESS:
+        _cli_config(_CFG, a)
+        asyncio.run(async_main())
+        return
+    if subprocess.run([sys.executable, str(HERE / "region_selector.py")], cwd=str(HERE)).returncode != 0:
+        print("Region selector failed, exiting.")
+        sys.exit(1)
+    _set_config(_cli_config(json.loads(CONFIG_PATH.read_text("utf-8")), a))
     time.sleep(5)
     asyncio.run(async_main())
 
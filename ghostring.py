@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Final, Iterator
+
+NORM: Final[int] = 1000
+
+Box = tuple[int, int, int, int]
+
+
+@dataclass
+class Ghost:
+    bbox_2d: list[int]
+    turn: int
+    image_b64: str
+    label: str = ""
+    first_turn: int = 0
+    hits: int = 1
+    gid: int = -1
+
+
+def _box(b: list[int] | Box) -> Box:
+    x1, y1, x2, y2 = b
+    return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+
+def iou(a: list[int] | Box, b: list[int] | Box) -> float:
+    ax1, ay1, ax2, ay2 = _box(a)
+    bx1, by1, bx2, by2 = _box(b)
+    iw: int = min(ax2, bx2) - max(ax1, bx1)
+    ih: int = min(ay2, by2) - max(ay1, by1)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter: int = iw * ih
+    union: int = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def same_label(a: str, b: str) -> bool:
+    a, b = a.strip().lower(), b.strip().lower()
+    return not a or not b or a == b
+
+
+def nms(regions: list[dict[str, Any]], thresh: float) -> list[dict[str, Any]]:
+    kept: list[dict[str, Any]] = []
+    for r in regions:
+        if all(iou(r["bbox_2d"], k["bbox_2d"]) < thresh for k in kept):
+            kept.append(r)
+    return kept
+
+
+class GridIndex:
+    def __init__(self, cell: int = 125) -> None:
+        self.cell: int = max(1, cell)
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        self._boxes: dict[int, Box] = {}
+
+    def _keys(self, b: Box) -> Iterator[tuple[int, int]]:
+        c: int = self.cell
+        for cx in range(max(0, b[0]) // c, min(NORM, b[2]) // c + 1):
+            for cy in range(max(0, b[1]) // c, min(NORM, b[3]) // c + 1):
+                yield cx, cy
+
+    def insert(self, key: int, bbox: list[int] | Box) -> None:
+        b: Box = _box(bbox)
+        self._boxes[key] = b
+        for k in self._keys(b):
+            self._cells.setdefault(k, set()).add(key)
+
+    def remove(self, key: int) -> None:
+        b: Box | None = self._boxes.pop(key, None)
+        if b is None:
+            return
+        for k in self._keys(b):
+            s: set[int] | None = self._cells.get(k)
+            if s is not None:
+                s.discard(key)
+                if not s:
+                    del self._cells[k]
+
+    def candidates(self, bbox: list[int] | Box) -> set[int]:
+        out: set[int] = set()
+        for k in self._keys(_box(bbox)):
+            out |= self._cells.get(k, set())
+        return out
+
+
+class GhostRing:
+    def __init__(self, cell: int = 125) -> None:
+        self._ghosts: dict[int, Ghost] = {}
+        self._grid: GridIndex = GridIndex(cell)
+        self._next: int = 0
+
+    def __len__(self) -> int:
+        return len(self._ghosts)
+
+    def __iter__(self) -> Iterator[Ghost]:
+        return iter(list(self._ghosts.values()))
+
+    def match(self, bbox: list[int], label: str, thresh: float) -> int | None:
+        best: int | None = None
+        best_iou: float = thresh
+        for key in self._grid.candidates(bbox):
+            g: Ghost = self._ghosts[key]
+            v: float = iou(bbox, g.bbox_2d)
+            if v >= best_iou and same_label(label, g.label):
+                best, best_iou = key, v
+        return best
+
+    def touch(self, key: int, turn: int) -> Ghost:
+        g: Ghost = self._ghosts.pop(key)
+        g.turn = turn
+        g.hits += 1
+        self._ghosts[key] = g
+        return g
+
+    def add(self, g: Ghost) -> int:
+        key: int = self._next
+        self._next += 1
+        g.gid = key
+        self._ghosts[key] = g
+        self._grid.insert(key, g.bbox_2d)
+        return key
+
+    def evict(self, max_n: int) -> int:
+        n: int = 0
+        while len(self._ghosts) > max_n:
+            key: int = next(iter(self._ghosts))
+            del self._ghosts[key]
+            self._grid.remove(key)
+            n += 1
+        return n
+
+    def clear(self) -> None:
+        self._ghosts.clear()
+        self._grid = GridIndex(self._grid.cell)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Final
+
+HERE: Final[Path] = Path(__file__).resolve().parent
+FAKE_ANN: Final[str] = base64.b64encode(os.urandom(3000)).decode("ascii")
+
+
+def serve(port: int, turn_s: float, uncached: bool) -> None:
+    sys.path.insert(0, str(HERE))
+    import bench
+    import encodepool
+    import fanout
+    import franz
+
+    class _Uncached(fanout.Broadcast):
+        def get(self, key: Any, build: Any) -> bytes:
+            if key != self._key:
+                self.version += 1
+                self._key = key
+            self.builds += 1
+            return build(self.version)
+
+    if uncached:
+        franz.CAST = {k: _Uncached() for k in franz.CAST}
+    big: dict[str, Any] = json.loads(bench.LARGE)
+
+    async def engine() -> None:
+        S: franz.State = franz.S
+        turn: int = 0
+        while True:
+            turn += 1
+            async with S.lock:
+                S.turn = turn
+                S.observation = big["observation"]
+                S.actions_data = S.heat_data = big["actions"][: 10 + turn % 20]
+                S.raw_display = {"observation": S.observation, "regions": big["regions"][:20], "actions": S.actions_data}
+                S.msg_id += 1
+                S.raw = encodepool.Frame.from_b64(base64.b64encode(os.urandom(300_000)))
+                S.raw_seq += 1
+                S.ghosts_overlay = [{"bbox_2d": [i * 40, 0, i * 40 + 30, 30], "turn": turn, "age": 0,
+                                     "image_b64": "A" * 3000, "label": f"g{i}", "hits": 1, "id": i} for i in range(8)]
+                S.ghosts_seq += 1
+                S.pending_seq = turn
+                S.annotated_seq = -1
+                S.annotated_event.clear()
+            franz.S.phase = "waiting_annotated"
+            try:
+                await asyncio.wait_for(S.annotated_event.wait(), turn_s)
+            except asyncio.TimeoutError:
+                pass
+            franz.S.phase = "calling_vlm"
+            await asyncio.sleep(turn_s / 2)
+
+    async def main() -> None:
+        franz.S = franz.State()
+        srv: franz.Server = franz.Server("127.0.0.1", port)
+        await srv.start()
+        task: asyncio.Task[None] = asyncio.create_task(engine())
+        done: asyncio.Event = asyncio.Event()
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        threading.Thread(target=lambda: (sys.stdin.read(), loop.call_soon_threadsafe(done.set)), daemon=True).start()
+        print("READY", flush=True)
+        cpu0: float = time.process_time()
+        await done.wait()
+        cpu: float = time.process_time() - cpu0
+        task.cancel()
+        await srv.stop()
+        print(json.dumps({"cpu_s": cpu, "lease": franz.LEASE.as_dict(),
+                          **{k: c.as_dict() for k, c in franz.CAST.items()}}), flush=True)
+
+    asyncio.run(main())
+
+
+async def _request(port: int, method: str, path: str, headers: dict[str, str], body: bytes = b"") -> tuple[int, bytes]:
+    r, w = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        head: str = f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Length: {len(body)}\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        w.write(head.encode() + b"\r\n" + body)
+        await w.drain()
+        data: bytes = await r.read()
+    finally:
+        w.close()
+    status: int = int(data[9:12]) if data[:5] == b"HTTP/" else 0
+    return status, data[data.find(b"\r\n\r\n") + 4:]
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.lat: list[float] = []
+        self.codes: dict[int, int] = {}
+        self.errors: int = 0
+        self.frames: int = 0
+        self.posted: int = 0
+
+
+async def client(port: int, cid: str, compositor: bool, interval: float, until: float, st: Stats) -> None:
+    hdr: dict[str, str] = {"X-Franz-Client": cid}
+    if compositor:
+        hdr["X-Franz-Role"] = "compositor"
+    last_ver: int = -1
+    last_seq: int = -1
+    while time.monotonic() < until:
+        t0: float = time.perf_counter()
+        try:
+            code, body = await _request(port, "GET", "/state", hdr)
+            st.lat.append((time.perf_counter() - t0) * 1000)
+            st.codes[code] = st.codes.get(code, 0) + 1
+            s: dict[str, Any] = json.loads(body)
+            if s["version"] != last_ver:
+                last_ver = s["version"]
+                mine: bool = s["compositor"] == cid
+                seq: int = s["pending_seq"] if mine else s["annotated_seq"]
+                ready: bool = s["phase"] == "waiting_annotated" if mine else seq > 0
+                if ready and seq != last_seq:
+                    last_seq = seq
+                    await asyncio.gather(_request(port, "GET", "/frame", hdr), _request(port, "GET", "/ghosts", hdr))
+                    st.frames += 1
+                    if mine:
+                        body_b: bytes = json.dumps({"seq": seq, "image_b64": FAKE_ANN}).encode()
+                        code, _ = await _request(port, "POST", "/annotated", hdr, body_b)
+                        st.codes[code] = st.codes.get(code, 0) + 1
+                        st.posted += 1
+        except (OSError, ValueError, KeyError):
+            st.errors += 1
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - t0)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+def level(viewers: int, seconds: float, interval: float, turn_s: float, uncached: bool) -> dict[str, Any]:
+    port: int = _free_port()
+    cmd: list[str] = [sys.executable, __file__, "--serve", str(port), "--turn", str(turn_s)]
+    proc: subprocess.Popen[str] = subprocess.Popen(
+        cmd + (["--uncached"] if uncached else []), stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+    )
+    assert proc.stdin is not None and proc.stdout is not None
+    if proc.stdout.readline().strip() != "READY":
+        proc.kill()
+        raise RuntimeError("server did not start")
+    st: Stats = Stats()
+
+    async def run() -> None:
+        until: float = time.monotonic() + seconds
+        await asyncio.gather(
+            client(port, "compositor", True, interval, until, st),
+            *(client(port, f"viewer{i}", False, interval, until, st) for i in range(viewers)),
+        )
+
+    asyncio.run(run())
+    proc.stdin.close()
+    srv: dict[str, Any] = json.loads(proc.stdout.readline())
+    proc.wait(10)
+    lat: list[float] = sorted(st.lat)
+    reqs: int = sum(st.codes.values()) + st.frames * 2
+    return {
+        "viewers": viewers, "uncached": uncached, "requests": reqs, "req_s": round(reqs / seconds, 1),
+        "state_p50_ms": round(statistics.median(lat), 2) if lat else None,
+        "state_p99_ms": round(lat[int(len(lat) * 0.99)], 2) if lat else None,
+        "server_cpu_pct": round(srv["cpu_s"] / seconds * 100, 1),
+        "server_cpu_us_per_req": round(srv["cpu_s"] / max(1, reqs) * 1e6, 1),
+        "state_builds": srv["state"]["builds"], "frame_builds": srv["frame"]["builds"],
+        "frames_seen": st.frames, "posted": st.posted, "codes": st.codes, "errors": st.errors,
+        "lease_grants": srv["lease"]["grants"],
+    }
+
+
+def main() -> None:
+    ap: argparse.ArgumentParser = argparse.ArgumentParser(description="Franz panel fan-out load test")
+    ap.add_argument("--viewers", default="1,10,50", help="comma-separated viewer counts")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--interval", type=float, default=0.4, help="poll interval per client (panel uses 0.4)")
+    ap.add_argument("--turn", type=float, default=1.0, help="synthetic engine turn length")
+    ap.add_argument("--uncached", action="store_true", help="also run with per-request serialization")
+    ap.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    a: argparse.Namespace = ap.parse_args()
+    if a.serve:
+        serve(a.serve, a.turn, a.uncached)
+        return
+    for n in (int(v) for v in a.viewers.split(",")):
+        for uncached in (False, True) if a.uncached else (False,):
+            print(json.dumps(level(n, a.seconds, a.interval, a.turn, uncached)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Final
+
+FMT: Final[str] = "[%(name)s][%(asctime)s.%(msecs)03d][%(levelname)s] %(message)s"
+DATEFMT: Final[str] = "%H:%M:%S"
+MB: Final[int] = 1024 * 1024
+
+
+class ContextFilter(logging.Filter):
+    def __init__(self, context: Callable[[], tuple[int, str]]) -> None:
+        super().__init__()
+        self.context: Callable[[], tuple[int, str]] = context
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        try:
+            record.turn, record.stage = self.context()
+        except Exception:
+            record.turn, record.stage = 0, ""
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, per_s: float, burst: int, below: int = logging.INFO) -> None:
+        super().__init__()
+        self.per_s: float = per_s
+        self.burst: float = float(max(1, burst))
+        self.below: int = below
+        self._buckets: dict[tuple[str, Any], list[float]] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self.suppressed: int = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.per_s <= 0 or record.levelno >= self.below:
+            return True
+        key: tuple[str, Any] = (record.name, record.msg)
+        now: float = time.monotonic()
+        with self._lock:
+            b: list[float] | None = self._buckets.get(key)
+            if b is None:
+                b = self._buckets[key] = [self.burst, now, 0.0]
+            b[0] = min(self.burst, b[0] + (now - b[1]) * self.per_s)
+            b[1] = now
+            if b[0] < 1.0:
+                b[2] += 1
+                self.suppressed += 1
+                return False
+            b[0] -= 1.0
+            dropped: int = int(b[2])
+            b[2] = 0.0
+        if dropped:
+            record.suppressed = dropped
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, q: queue.Queue[Any], block_s: float = 0.5) -> None:
+        super().__init__(q)
+        self.block_s: float = block_s
+        self.dropped: int = 0
+        self.spilled: int = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if record.levelno < logging.WARNING:
+                self.queue.put_nowait(record)
+            else:
+                self.queue.put(record, timeout=self.block_s)
+        except queue.Full:
+            if record.levelno < logging.WARNING:
+                self.dropped += 1
+                return
+            self.spilled += 1
+            try:
+                sys.stderr.write(TextFormatter(FMT, datefmt=DATEFMT).format(record) + "\n")
+            except Exception:
+                self.handleError(record)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        s: str = super().format(record)
+        n: int = getattr(record, "suppressed", 0)
+        return f"{s} (+{n} similar suppressed)" if n else s
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        d: dict[str, Any] = {
+            "ts": round(record.created, 6), "level": record.levelname, "logger": record.name,
+            "turn": getattr(record, "turn", 0), "stage": getattr(record, "stage", ""),
+            "thread": record.threadName, "msg": record.getMessage(),
+        }
+        fields: Any = getattr(record, "fields", None)
+        if isinstance(fields, dict):
+            d.update(fields)
+        if getattr(record, "suppressed", 0):
+            d["suppressed"] = record.suppressed
+        if record.exc_info:
+            d["exc"] = self.formatException(record.exc_info)
+        return json.dumps(d, ensure_ascii=False, default=str)
+
+
+class LogQueue:
+    def __init__(self, listener: logging.handlers.QueueListener, handler: DroppingQueueHandler,
+                 limiter: RateLimitFilter, q: queue.Queue[Any]) -> None:
+        self.listener: logging.handlers.QueueListener = listener
+        self.handler: DroppingQueueHandler = handler
+        self.limiter: RateLimitFilter = limiter
+        self.queue: queue.Queue[Any] = q
+        self.stopped: bool = False
+
+    def stop(self) -> None:
+        if self.stopped:
+            return
+        self.stopped = True
+        atexit.unregister(self.stop)
+        self.listener.stop()
+        for h in self.listener.handlers:
+            h.close()
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"queued": self.queue.qsize(), "dropped": self.handler.dropped, "spilled": self.handler.spilled,
+                "suppressed": self.limiter.suppressed}
+
+
+def _rotating(path: Path, max_mb: float, backups: int) -> logging.Handler:
+    if max_mb > 0:
+        return logging.handlers.RotatingFileHandler(path, maxBytes=int(max_mb * MB), backupCount=max(1, backups),
+                                                    encoding="utf-8", delay=True)
+    return logging.FileHandler(path, encoding="utf-8", delay=True)
+
+
+def start(
+    level: int, run_dir: Path | None, context: Callable[[], tuple[int, str]], *, text_file: bool = True,
+    jsonl: bool = False, max_mb: float = 0.0, backups: int = 3, rate_per_s: float = 0.0, burst: int = 20,
+    queue_size: int = 10000,
+) -> LogQueue:
+    text: TextFormatter = TextFormatter(FMT, datefmt=DATEFMT)
+    handlers: list[logging.Handler] = [logging.StreamHandler()]
+    if run_dir is not None and text_file:
+        handlers.append(_rotating(run_dir / "main.log", max_mb, backups))
+    for h in handlers:
+        h.setFormatter(text)
+    if run_dir is not None and jsonl:
+        jh: logging.Handler = _rotating(run_dir / "main.jsonl", max_mb, backups)
+        jh.setFormatter(JsonFormatter())
+        handlers.append(jh)
+    q: queue.Queue[Any] = queue.Queue(max(1, queue_size))
+    qh: DroppingQueueHandler = DroppingQueueHandler(q)
+    limiter: RateLimitFilter = RateLimitFilter(rate_per_s, burst)
+    qh.addFilter(limiter)
+    qh.addFilter(ContextFilter(context))
+    root: logging.Logger = logging.getLogger()
+    root.setLevel(level)
+    root.handlers.clear()
+    root.addHandler(qh)
+    listener: logging.handlers.QueueListener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+    listener.start()
+    lq: LogQueue = LogQueue(listener, qh, limiter, q)
+    atexit.register(lq.stop)
+    return lq
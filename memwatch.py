@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import ctypes
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Final
+
+MB: Final[int] = 1024 * 1024
+
+
+class _PMC(ctypes.Structure):
+    _fields_ = [
+        ("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong),
+        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t),
+    ]
+
+
+def rss_bytes() -> int:
+    if sys.platform == "win32":
+        pmc: _PMC = _PMC()
+        pmc.cb = ctypes.sizeof(_PMC)
+        k32: Any = ctypes.WinDLL("kernel32")
+        k32.GetCurrentProcess.restype = ctypes.c_void_p
+        psapi: Any = ctypes.WinDLL("psapi")
+        psapi.GetProcessMemoryInfo.argtypes = [ctypes.c_void_p, ctypes.POINTER(_PMC), ctypes.c_ulong]
+        if psapi.GetProcessMemoryInfo(k32.GetCurrentProcess(), ctypes.byref(pmc), pmc.cb):
+            return int(pmc.WorkingSetSize)
+        return 0
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * (1 if sys.platform == "darwin" else 1024)
+
+
+_NOISE: Final[tuple[tracemalloc.Filter, ...]] = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class MemoryWatch:
+    def __init__(self, rd: Path, budget_mb: float = 0.0, snapshot_every: int = 0, frames: int = 1, top: int = 25) -> None:
+        self.rd: Path = rd
+        self.budget: int = int(budget_mb * MB)
+        self.snapshot_every: int = snapshot_every
+        self.frames: int = max(1, frames)
+        self.top: int = top
+        self.peak: int = 0
+        self.degraded: int = 0
+        self._prev: tracemalloc.Snapshot | None = None
+        self._prev_turn: int = 0
+
+    def sample(self, turn: int, holders: dict[str, int]) -> dict[str, Any]:
+        rss: int = rss_bytes()
+        self.peak = max(self.peak, rss)
+        over: bool = self.budget > 0 and rss > self.budget
+        out: dict[str, Any] = {
+            "turn": turn, "rss_mb": round(rss / MB, 1), "peak_mb": round(self.peak / MB, 1),
+            "budget_mb": round(self.budget / MB, 1), "over_budget": over,
+            "holders_mb": {k: round(v / MB, 3) for k, v in sorted(holders.items(), key=lambda kv: -kv[1])},
+            "tracing": tracemalloc.is_tracing(),
+        }
+        if over:
+            self.degraded += 1
+        if self.snapshot_every > 0 and turn % self.snapshot_every == 0:
+            out["snapshot"] = self.snapshot(turn)
+        return out
+
+    def relieved(self, rss: int | None = None) -> bool:
+        return self.budget > 0 and (rss if rss is not None else rss_bytes()) < self.budget * 0.8
+
+    def snapshot(self, turn: int) -> dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._prev, self._prev_turn = None, turn
+            return {"started": True, "frames": self.frames}
+        t0: float = time.perf_counter()
+        gc.collect()
+        snap: tracemalloc.Snapshot = tracemalloc.take_snapshot().filter_traces(_NOISE)
+        stats: list[tracemalloc.Statistic] = snap.statistics("lineno")
+        lines: list[str] = [f"# turn {turn} traced {sum(s.size for s in stats) / MB:.2f} MB", "", "## top"]
+        lines += [str(s) for s in stats[:self.top]]
+        diff: list[tracemalloc.StatisticDiff] = []
+        if self._prev is not None:
+            diff = snap.compare_to(self._prev, "lineno")
+            lines += ["", f"## diff vs turn {self._prev_turn}"]
+            lines += [str(d) for d in diff[:self.top]]
+        path: Path = self.rd / f"memory_turn_{turn:04d}.txt"
+        path.write_text("\n".join(lines) + "\n", "utf-8")
+        self._prev, self._prev_turn = snap, turn
+        return {
+            "file": path.name, "traced_mb": round(sum(s.size for s in stats) / MB, 3),
+            "growth_mb": round(sum(d.size_diff for d in diff) / MB, 3),
+            "top_growth": [
+                {"where": str(d.traceback), "kb": round(d.size_diff / 1024, 1), "count": d.count_diff}
+                for d in diff[:5]
+            ],
+            "ms": round((time.perf_counter() - t0) * 1000, 1),
+        }
+
+    def stop(self) -> None:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._prev = None
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
 import json
+import re
 import sys
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from typing import Any
 
+_DECODER: json.JSONDecoder = json.JSONDecoder(strict=False)
+_FENCE: re.Pattern[str] = re.compile(r"```[a-zA-Z]*\s*(.*?)(?:```|$)", re.S)
+_LITERALS: dict[str, str] = {"True": "true", "False": "false", "None": "null"}
+_CLOSE: dict[str, str] = {"{": "}", "[": "]"}
+
 
 @dataclass
 class PipelineResult:
@@ -13,6 +19,8 @@ class PipelineResult:
     heat: list[dict[str, Any]] = field(default_factory=list)
     next_turn: str = ""
     raw_display: dict[str, Any] = field(default_factory=dict)
+    repair: list[str] = field(default_factory=list)
+    zoom: list[dict[str, Any]] = field(default_factory=list)
 
 
 def _clamp(v: Any) -> int:
@@ -23,6 +31,13 @@ def _clamp(v: Any) -> int:
     return max(0, min(1000, n))
 
 
+def _image(item: dict[str, Any], out: dict[str, Any]) -> dict[str, Any]:
+    n: Any = item.get("image")
+    if isinstance(n, (int, float)) and not isinstance(n, bool) and int(n) > 1:
+        out["image"] = int(n)
+    return out
+
+
 def _parse_regions(raw: list[Any]) -> list[dict[str, Any]]:
     out: list[dict[str, Any]] = []
     for r in raw:
@@ -31,10 +46,10 @@ def _parse_regions(raw: list[Any]) -> list[dict[str, Any]]:
         coords: Any = r.get("bbox_2d")
         if not isinstance(coords, list) or len(coords) != 4:
             continue
-        out.append({
+        out.append(_image(r, {
             "bbox_2d": [_clamp(coords[0]), _clamp(coords[1]), _clamp(coords[2]), _clamp(coords[3])],
             "label": str(r.get("label", "")),
-        })
+        }))
     return out
 
 
@@ -49,11 +64,11 @@ def _parse_actions(raw: list[Any]) -> list[dict[str, Any]]:
         action_type: str = str(a.get("type", "")).strip().lower()
         if not action_type:
             continue
-        out.append({
+        out.append(_image(a, {
             "type": action_type,
             "bbox_2d": [_clamp(coords[0]), _clamp(coords[1]), _clamp(coords[2]), _clamp(coords[3])],
             "params": str(a.get("params", "")),
-        })
+        }))
     return out
 
 
@@ -72,6 +87,152 @@ def _build_heat(actions: list[dict[str, Any]]) -> list[dict[str, Any]]:
     return heat
 
 
+def _normalize(s: str) -> tuple[str, list[str]]:
+    out: list[str] = []
+    fixes: set[str] = set()
+    i: int = 0
+    n: int = len(s)
+    while i < n:
+        c: str = s[i]
+        if c == '"':
+            j: int = i + 1
+            while j < n and s[j] != '"':
+                j += 2 if s[j] == "\\" else 1
+            out.append(s[i:j + 1])
+            i = j + 1
+        elif c == "'":
+            j = i + 1
+            buf: list[str] = ['"']
+            while j < n and s[j] != "'":
+                if s[j] == "\\" and j + 1 < n:
+                    buf.append(s[j + 1] if s[j + 1] == "'" else s[j:j + 2])
+                    j += 2
+                    continue
+                buf.append('\\"' if s[j] == '"' else s[j])
+                j += 1
+            buf.append('"' if j < n else "")
+            out.append("".join(buf))
+            fixes.add("single_quotes")
+            i = j + 1
+        elif c == ",":
+            j = i + 1
+            while j < n and s[j] in " \t\r\n":
+                j += 1
+            if j < n and s[j] in "}]":
+                fixes.add("trailing_comma")
+            else:
+                out.append(c)
+            i += 1
+        elif c.isalpha() and (i == 0 or not s[i - 1].isalnum()):
+            j = i
+            while j < n and s[j].isalnum():
+                j += 1
+            word: str = s[i:j]
+            if word in _LITERALS:
+                word = _LITERALS[word]
+                fixes.add("python_literals")
+            out.append(word)
+            i = j
+        else:
+            out.append(c)
+            i += 1
+    return "".join(out), sorted(fixes)
+
+
+def _close_truncated(s: str) -> tuple[Any, str] | None:
+    stack: list[str] = []
+    cuts: list[tuple[int, str]] = []
+    in_str: bool = False
+    str_is_value: bool = False
+    last_sig: str = ""
+    i: int = 0
+    n: int = len(s)
+    while i < n:
+        c: str = s[i]
+        if in_str:
+            if c == "\\":
+                i += 2
+                continue
+            if c == '"':
+                in_str = False
+                last_sig = '"'
+        elif c == '"':
+            in_str = True
+            str_is_value = last_sig in (":", "[") or (last_sig == "," and bool(stack) and stack[-1] == "[")
+        elif c in "{[":
+            stack.append(c)
+            last_sig = c
+        elif c in "}]":
+            if stack:
+                stack.pop()
+            last_sig = c
+            if not stack:
+                return None
+            if stack[-1] == "[" or len(stack) == 1:
+                cuts.append((i + 1, "".join(stack)))
+        elif c == ",":
+            if stack and (stack[-1] == "[" or len(stack) == 1):
+                cuts.append((i, "".join(stack)))
+            last_sig = c
+        elif not c.isspace():
+            last_sig = c
+        i += 1
+    if not stack:
+        return None
+    candidates: list[tuple[str, str]] = []
+    if in_str and str_is_value and len(stack) == 1:
+        candidates.append((s + '"' + "".join(_CLOSE[b] for b in reversed(stack)), "closed_string"))
+    for pos, st in reversed(cuts):
+        body: str = s[:pos].rstrip().rstrip(",")
+        candidates.append((body + "".join(_CLOSE[b] for b in reversed(st)), "cut_incomplete"))
+    candidates.append(("{}", "cut_incomplete"))
+    for text, how in candidates:
+        try:
+            return _DECODER.decode(text), how
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def repair_json(raw: str) -> tuple[Any, list[str]]:
+    diag: list[str] = []
+    s: str = raw
+    m: re.Match[str] | None = _FENCE.search(s)
+    if m and "{" in m.group(1):
+        s = m.group(1)
+        diag.append("code_fence")
+    start: int = s.find("{")
+    if start < 0:
+        return None, diag + ["no_object"]
+    if start > 0 and s[:start].strip():
+        diag.append("leading_text")
+    try:
+        obj, end = _DECODER.raw_decode(s, start)
+        if s[end:].strip():
+            diag.append("trailing_text")
+        return obj, diag
+    except json.JSONDecodeError:
+        pass
+    norm, fixes = _normalize(s[start:])
+    diag.extend(fixes)
+    try:
+        obj, end = _DECODER.raw_decode(norm)
+        if norm[end:].strip():
+            diag.append("trailing_text")
+        return obj, diag
+    except json.JSONDecodeError:
+        pass
+    closed: tuple[Any, str] | None = _close_truncated(norm)
+    if closed is None:
+        return None, diag + ["failed"]
+    diag.extend(["truncated", closed[1]])
+    return closed[0], diag
+
+
+def _as_list(v: Any) -> list[Any]:
+    return v if isinstance(v, list) else []
+
+
 def _build_display(obs: str, regions: list[dict[str, Any]], actions: list[dict[str, Any]]) -> dict[str, Any]:
     return {
         "observation": obs,
@@ -85,17 +246,20 @@ def process(raw: str) -> PipelineResult:
     if not raw:
         return PipelineResult(next_turn="(no prior observation)")
 
+    repair: list[str] = []
     try:
         obj: Any = json.loads(raw)
     except json.JSONDecodeError:
-        return PipelineResult(next_turn=raw, raw_display={"observation": raw, "regions": [], "actions": []})
+        obj, repair = repair_json(raw)
 
     if not isinstance(obj, dict):
-        return PipelineResult(next_turn=raw, raw_display={"observation": raw, "regions": [], "actions": []})
+        return PipelineResult(next_turn=raw, raw_display={"observation": raw, "regions": [], "actions": []},
+                              repair=repair or ["not_object"])
 
     obs: str = str(obj.get("observation", ""))
-    regions: list[dict[str, Any]] = _parse_regions(obj.get("regions", []))
-    actions: list[dict[str, Any]] = _parse_actions(obj.get("actions", []))
+    regions: list[dict[str, Any]] = _parse_regions(_as_list(obj.get("regions")))
+    actions: list[dict[str, Any]] = _parse_actions(_as_list(obj.get("actions")))
+    zoom: list[dict[str, Any]] = _parse_regions(_as_list(obj.get("zoom")))
     heat: list[dict[str, Any]] = _build_heat(actions)
     display: dict[str, Any] = _build_display(obs, regions, actions)
 
@@ -105,17 +269,49 @@ def process(raw: str) -> PipelineResult:
         heat=heat,
         next_turn=obs,
         raw_display=display,
+        repair=repair,
+        zoom=zoom,
     )
 
 
-def to_json(result: PipelineResult) -> str:
-    return json.dumps({
+def _to_global(b: list[int], box: list[int]) -> list[int]:
+    w, h = box[2] - box[0], box[3] - box[1]
+    return [box[0] + b[0] * w // 1000, box[1] + b[1] * h // 1000, box[0] + b[2] * w // 1000, box[1] + b[3] * h // 1000]
+
+
+def remap_images(result: PipelineResult, boxes: list[list[int]]) -> PipelineResult:
+    def fix(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        out: list[dict[str, Any]] = []
+        for it in items:
+            it = dict(it)
+            n: int = it.pop("image", 0)
+            if 2 <= n <= len(boxes) + 1:
+                it["bbox_2d"] = _to_global(it["bbox_2d"], boxes[n - 2])
+            out.append(it)
+        return out
+
+    if not any("image" in it for it in (*result.ghosts, *result.actions, *result.zoom)):
+        return result
+    actions: list[dict[str, Any]] = fix(result.actions)
+    regions: list[dict[str, Any]] = fix(result.ghosts)
+    return replace(result, ghosts=regions, actions=actions, zoom=fix(result.zoom), heat=_build_heat(actions),
+                   raw_display=_build_display(result.next_turn, regions, actions))
+
+
+def to_dict(result: PipelineResult) -> dict[str, Any]:
+    return {
         "ghosts": result.ghosts,
         "actions": result.actions,
         "heat": result.heat,
         "next_turn": result.next_turn,
         "raw_display": result.raw_display,
-    }, indent=2, ensure_ascii=False)
+        "repair": result.repair,
+        "zoom": result.zoom,
+    }
+
+
+def to_json(result: PipelineResult) -> str:
+    return json.dumps(to_dict(result), indent=2, ensure_ascii=False)
 
 
 if __name__ == "__main__":
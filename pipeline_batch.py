@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+import pipeline
+import runpack
+
+
+def _failed(repair: list[str]) -> bool:
+    return "failed" in repair or "no_object" in repair or "not_object" in repair
+
+
+Item = tuple[str, int, str]
+
+
+def _warn_missing(source: str, missing: int) -> None:
+    if missing:
+        print(f"warning: {source}: {missing} turn record(s) without vlm_raw skipped "
+              f"(recorded before raw VLM output was archived)", file=sys.stderr)
+
+
+def iter_corpus(paths: list[str]) -> Iterator[Item]:
+    runs: set[Path] = set()
+    missing: int
+    for p in map(Path, paths):
+        if str(p) == "-":
+            missing = 0
+            for i, line in enumerate(sys.stdin):
+                rec: Any = json.loads(line) if line.strip() else None
+                raw: Any = rec.get("vlm_raw") if isinstance(rec, dict) else rec
+                if isinstance(raw, str):
+                    yield "-", int(rec.get("turn", i)) if isinstance(rec, dict) else i, raw
+                elif isinstance(rec, dict):
+                    missing += 1
+            _warn_missing("stdin", missing)
+        elif p.is_dir():
+            runs.update(f.parent for pat in ("turns.jsonl", "run.pack") for f in p.rglob(pat))
+        else:
+            runs.add(p.parent)
+    for rd in sorted(runs):
+        missing = 0
+        for rec in runpack.iter_records(rd):
+            if isinstance(rec, dict) and isinstance(rec.get("vlm_raw"), str):
+                yield rd.name, int(rec.get("turn", 0)), rec["vlm_raw"]
+            elif isinstance(rec, dict) and rec.get("stage") == "raw":
+                missing += 1
+        _warn_missing(str(rd), missing)
+
+
+def _corpus_raws(paths: list[str]) -> list[str]:
+    return [raw for _, _, raw in iter_corpus(paths)]
+
+
+def corpus_report(raws: list[str]) -> dict[str, Any]:
+    strict: int = 0
+    recovered: int = 0
+    failed: int = 0
+    kinds: dict[str, int] = {}
+    t0: float = time.perf_counter()
+    for raw in raws:
+        r: pipeline.PipelineResult = pipeline.process(raw)
+        if not r.repair:
+            strict += 1
+            continue
+        for k in r.repair:
+            kinds[k] = kinds.get(k, 0) + 1
+        if _failed(r.repair):
+            failed += 1
+        else:
+            recovered += 1
+    dt: float = time.perf_counter() - t0
+    kb: float = sum(len(r.encode("utf-8")) for r in raws) / 1024
+    broken: int = recovered + failed
+    return {
+        "turns": len(raws),
+        "strict_ok": strict,
+        "recovered": recovered,
+        "failed": failed,
+        "recovered_rate": round(recovered / broken, 4) if broken else 1.0,
+        "repairs": dict(sorted(kinds.items())),
+        "us_per_kb": round(dt * 1e6 / kb, 2) if kb else 0.0,
+    }
+
+
+_IMPLS: list[Callable[[str], Any]] = [pipeline.process]
+
+
+def load_impl(path: str) -> Callable[[str], Any]:
+    src: Path = Path(path).resolve()
+    name: str = "pipeline_" + hashlib.sha1(src.read_bytes()).hexdigest()[:12]
+    if name not in sys.modules:
+        spec: Any = importlib.util.spec_from_file_location(name, src)
+        mod: Any = importlib.util.module_from_spec(spec)
+        sys.modules[name] = mod
+        spec.loader.exec_module(mod)
+    return sys.modules[name].process
+
+
+def _init_impls(paths: tuple[str | None, ...]) -> None:
+    global _IMPLS
+    _IMPLS = [load_impl(p) if p else pipeline.process for p in paths]
+
+
+def _run_chunk(chunk: list[Item]) -> list[tuple[str, int, int, list[dict[str, Any]]]]:
+    return [(run, turn, len(raw.encode("utf-8")), [pipeline.to_dict(fn(raw)) for fn in _IMPLS]) for run, turn, raw in chunk]
+
+
+def _chunks(items: Iterable[Item], size: int) -> Iterator[list[Item]]:
+    buf: list[Item] = []
+    for it in items:
+        buf.append(it)
+        if len(buf) >= size:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+
+def run_batch(
+    items: Iterable[Item], impls: tuple[str | None, ...] = (None,), workers: int = 0, chunk: int = 200,
+) -> Iterator[tuple[str, int, int, list[dict[str, Any]]]]:
+    if workers <= 0:
+        _init_impls(impls)
+        for c in _chunks(items, chunk):
+            yield from _run_chunk(c)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_impls, initargs=(impls,)) as ex:
+        pending: deque[Future[list[tuple[str, int, int, list[dict[str, Any]]]]]] = deque()
+        for c in _chunks(items, chunk):
+            pending.append(ex.submit(_run_chunk, c))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+class BatchStats:
+    def __init__(self) -> None:
+        self.turns: int = 0
+        self.failed: int = 0
+        self.repaired: int = 0
+        self.actions: int = 0
+        self.types: dict[str, int] = {}
+        self.repairs: dict[str, int] = {}
+        self.bytes: int = 0
+
+    def add(self, d: dict[str, Any], size: int) -> None:
+        self.turns += 1
+        self.bytes += size
+        rep: list[str] = d["repair"]
+        self.failed += _failed(rep)
+        self.repaired += bool(rep) and not _failed(rep)
+        for k in rep:
+            self.repairs[k] = self.repairs.get(k, 0) + 1
+        self.actions += len(d["actions"])
+        for a in d["actions"]:
+            t: str = str(a.get("type", ""))
+            self.types[t] = self.types.get(t, 0) + 1
+
+    def as_dict(self) -> dict[str, Any]:
+        n: int = max(1, self.turns)
+        return {
+            "turns": self.turns, "failed": self.failed, "parse_failure_rate": round(self.failed / n, 4),
+            "repaired": self.repaired, "actions_per_turn": round(self.actions / n, 3),
+            "action_types": dict(sorted(self.types.items(), key=lambda kv: -kv[1])),
+            "repairs": dict(sorted(self.repairs.items())),
+        }
+
+
+def _line(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def batch_main(paths: list[str], out: Any, workers: int, chunk: int) -> dict[str, Any]:
+    st: BatchStats = BatchStats()
+    t0: float = time.perf_counter()
+    for run, turn, size, (d,) in run_batch(iter_corpus(paths), (None,), workers, chunk):
+        st.add(d, size)
+        out.write(_line({"run": run, "turn": turn, **d}) + "\n")
+    dt: float = time.perf_counter() - t0
+    return {**st.as_dict(), "seconds": round(dt, 3), "turns_per_s": round(st.turns / dt, 1) if dt else 0.0,
+            "mb_per_s": round(st.bytes / 1048576 / dt, 2) if dt else 0.0, "workers": workers}
+
+
+def diff_main(base: str | None, other: str, paths: list[str], out: Any, workers: int, chunk: int) -> dict[str, Any]:
+    a: BatchStats = BatchStats()
+    b: BatchStats = BatchStats()
+    changed: int = 0
+    fields: dict[str, int] = {}
+    t0: float = time.perf_counter()
+    for run, turn, size, (da, db) in run_batch(iter_corpus(paths), (base, other), workers, chunk):
+        a.add(da, size)
+        b.add(db, size)
+        diff: list[str] = [k for k in da if da[k] != db.get(k)]
+        if not diff:
+            continue
+        changed += 1
+        for k in diff:
+            fields[k] = fields.get(k, 0) + 1
+        out.write(_line({"run": run, "turn": turn, "fields": diff,
+                         "a": {k: da[k] for k in diff}, "b": {k: db.get(k) for k in diff}}) + "\n")
+    dt: float = time.perf_counter() - t0
+    return {
+        "turns": a.turns, "changed": changed, "identical": a.turns - changed, "fields": fields,
+        "a": {"source": base or pipeline.__file__, **a.as_dict()}, "b": {"source": other, **b.as_dict()},
+        "seconds": round(dt, 3), "turns_per_s": round(a.turns / dt, 1) if dt else 0.0, "workers": workers,
+    }
+
+
+def main() -> None:
+    ap: argparse.ArgumentParser = argparse.ArgumentParser(description="Run pipeline.process over recorded VLM output")
+    ap.add_argument("inputs", nargs="*", help="runs/, run dirs, turns.jsonl, run.pack, or - for JSONL on stdin")
+    mode: Any = ap.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--corpus", action="store_true", help="repair statistics over recorded runs")
+    mode.add_argument("--jsonl", action="store_true", help="stream compact JSONL results plus aggregate stats")
+    mode.add_argument("--diff", metavar="OTHER.py", help="compare against another pipeline version")
+    ap.add_argument("--base", metavar="BASE.py", help="base version for --diff (default: pipeline.py)")
+    ap.add_argument("-o", "--out", help="write JSONL here instead of stdout")
+    ap.add_argument("--stats", help="write aggregate stats JSON here instead of stderr")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="process pool size, 0 = inline")
+    ap.add_argument("--chunk", type=int, default=200, help="turns per worker task")
+    a: argparse.Namespace = ap.parse_args()
+    if a.corpus:
+        print(json.dumps(corpus_report(_corpus_raws(a.inputs or ["runs"])), indent=2))
+        return
+    out: Any = open(a.out, "w", encoding="utf-8") if a.out else sys.stdout
+    try:
+        if a.diff:
+            stats: dict[str, Any] = diff_main(a.base, a.diff, a.inputs or ["runs"], out, a.workers, a.chunk)
+        else:
+            stats = batch_main(a.inputs or ["runs"], out, a.workers, a.chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    text: str = json.dumps(stats, indent=2)
+    if a.stats:
+        Path(a.stats).write_text(text + "\n", "utf-8")
+    else:
+        print(text, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import logging
+import queue
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import types
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Final
+
+if TYPE_CHECKING:
+    import pipeline
+
+HERE: Final[Path] = Path(__file__).resolve().parent
+CACHE_MAX: Final[int] = 4
+
+log: Final[logging.Logger] = logging.getLogger("franz.pipeline_host")
+
+
+def _result_cls() -> type[pipeline.PipelineResult]:
+    import pipeline
+    return pipeline.PipelineResult
+
+
+def _fallback(raw: str) -> pipeline.PipelineResult:
+    raw = raw.strip()
+    return _result_cls()(next_turn=raw, raw_display={"observation": raw, "regions": [], "actions": []})
+
+
+def _to_result(d: dict[str, Any]) -> pipeline.PipelineResult:
+    cls: type[pipeline.PipelineResult] = _result_cls()
+    names: set[str] = {f.name for f in dataclasses.fields(cls)}
+    return cls(**{k: v for k, v in d.items() if k in names})
+
+
+class PipelineHost:
+    def __init__(self, path: Path, timeout: float = 2.0) -> None:
+        self.path: Path = path
+        self.timeout: float = timeout
+        self.digest: str = ""
+        self.last_good: str = ""
+        self.bad: set[str] = set()
+        self._sources: dict[str, str] = {}
+        self._loaded: set[str] = set()
+        self._stat: tuple[int, int] = (0, 0)
+        self._lock: threading.Lock = threading.Lock()
+        self._proc: subprocess.Popen[bytes] | None = None
+        self._out: queue.Queue[dict[str, Any] | None] = queue.Queue()
+        self._spawn()
+
+    def _spawn(self) -> None:
+        t0: float = time.perf_counter()
+        self._proc = subprocess.Popen(
+            [sys.executable, str(HERE / "pipeline_host.py"), "--worker"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=str(HERE),
+        )
+        self._out = queue.Queue()
+        self._loaded = set()
+        threading.Thread(target=self._reader, args=(self._proc, self._out), daemon=True).start()
+        log.info("pipeline worker pid=%d spawned in %.1fms", self._proc.pid, (time.perf_counter() - t0) * 1000)
+
+    @staticmethod
+    def _reader(proc: subprocess.Popen[bytes], out: queue.Queue[dict[str, Any] | None]) -> None:
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            try:
+                out.put(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        out.put(None)
+
+    def _kill(self) -> None:
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.wait()
+        self._spawn()
+
+    def _call(self, msg: dict[str, Any], timeout: float) -> dict[str, Any]:
+        assert self._proc is not None and self._proc.stdin is not None
+        try:
+            self._proc.stdin.write(json.dumps(msg, ensure_ascii=False).encode("utf-8") + b"\n")
+            self._proc.stdin.flush()
+            reply: dict[str, Any] | None = self._out.get(timeout=timeout)
+        except queue.Empty:
+            self._kill()
+            return {"ok": False, "err": f"timeout {timeout:.1f}s"}
+        except OSError as e:
+            self._kill()
+            return {"ok": False, "err": f"worker io: {e}"}
+        if reply is None:
+            self._kill()
+            return {"ok": False, "err": "worker crashed"}
+        return reply
+
+    def _ensure(self, digest: str, timeout: float) -> dict[str, Any]:
+        if digest in self._loaded:
+            return {"ok": True}
+        reply: dict[str, Any] = self._call({"op": "load", "digest": digest, "source": self._sources[digest]}, timeout)
+        if reply.get("ok"):
+            self._loaded.add(digest)
+        return reply
+
+    def _refresh(self) -> None:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return
+        key: tuple[int, int] = (st.st_mtime_ns, st.st_size)
+        if key == self._stat:
+            return
+        self._stat = key
+        self._adopt(self.path.read_text("utf-8"))
+
+    def _adopt(self, source: str) -> str:
+        digest: str = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        if digest != self.digest:
+            self._sources[digest] = source
+            self.digest = digest
+            self.bad.discard(digest)
+            stale: list[str] = [d for d in self._sources if d not in (digest, self.last_good)]
+            for d in stale[:max(0, len(stale) - CACHE_MAX)]:
+                del self._sources[d]
+            log.info("pipeline version %s", digest[:12])
+        return digest
+
+    def reload(self, source: str) -> dict[str, Any]:
+        with self._lock:
+            t0: float = time.perf_counter()
+            digest: str = self._adopt(source)
+            try:
+                st = self.path.stat()
+                self._stat = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                self._stat = (0, 0)
+            reply: dict[str, Any] = self._ensure(digest, self.timeout)
+            if not reply.get("ok"):
+                self.bad.add(digest)
+            return {
+                "ok": bool(reply.get("ok")), "version": digest[:12], "err": reply.get("err"),
+                "reload_ms": round((time.perf_counter() - t0) * 1000, 3),
+            }
+
+    def _run(self, digest: str, raw: str, timeout: float) -> dict[str, Any]:
+        reply: dict[str, Any] = self._ensure(digest, timeout)
+        if not reply.get("ok"):
+            return reply
+        reply = self._call({"op": "process", "digest": digest, "raw": raw}, timeout)
+        if reply.get("missing"):
+            self._loaded.discard(digest)
+            reply = self._ensure(digest, timeout)
+            if reply.get("ok"):
+                reply = self._call({"op": "process", "digest": digest, "raw": raw}, timeout)
+        return reply
+
+    def process(self, raw: str) -> tuple[pipeline.PipelineResult, dict[str, Any]]:
+        with self._lock:
+            t0: float = time.perf_counter()
+            self._refresh()
+            info: dict[str, Any] = {"version": self.digest[:12], "fallback": None}
+            reply: dict[str, Any] = {"ok": False, "err": "known bad"}
+            if self.digest and self.digest not in self.bad:
+                reply = self._run(self.digest, raw, self.timeout)
+                if reply.get("ok"):
+                    self.last_good = self.digest
+                elif self.digest != self.last_good:
+                    self.bad.add(self.digest)
+                    log.error("pipeline %s failed: %s", self.digest[:12], reply.get("err"))
+            if not reply.get("ok") and self.last_good and self.last_good != self.digest:
+                info["fallback"] = f"last_good {self.last_good[:12]}: {reply.get('err')}"
+                info["version"] = self.last_good[:12]
+                reply = self._run(self.last_good, raw, self.timeout)
+            if reply.get("ok"):
+                result: pipeline.PipelineResult = _to_result(reply["result"])
+            else:
+                info["fallback"] = f"raw: {reply.get('err')}"
+                result = _fallback(raw)
+            info["ms"] = round((time.perf_counter() - t0) * 1000, 3)
+            return result, info
+
+    def close(self) -> None:
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+
+
+def _worker() -> None:
+    out: Any = sys.stdout.buffer
+    sys.stdout = sys.stderr
+    modules: dict[str, dict[str, Any]] = {}
+    for line in sys.stdin.buffer:
+        msg: dict[str, Any] = json.loads(line)
+        reply: dict[str, Any]
+        try:
+            match msg["op"]:
+                case "load":
+                    mod: types.ModuleType = types.ModuleType(f"pipeline_{msg['digest'][:12]}")
+                    mod.__file__ = str(HERE / "pipeline.py")
+                    sys.modules[mod.__name__] = mod
+                    try:
+                        exec(compile(msg["source"], "pipeline.py", "exec"), mod.__dict__)
+                        if not callable(mod.__dict__.get("process")):
+                            raise TypeError("pipeline has no process()")
+                    except BaseException:
+                        del sys.modules[mod.__name__]
+                        raise
+                    modules[msg["digest"]] = mod.__dict__
+                    while len(modules) > CACHE_MAX:
+                        del sys.modules[modules.pop(next(iter(modules)))["__name__"]]
+                    reply = {"ok": True}
+                case "process" if msg["digest"] not in modules:
+                    reply = {"ok": False, "missing": True, "err": "version not loaded"}
+                case "process":
+                    ns = modules[msg["digest"]]
+                    r: Any = ns["process"](msg["raw"])
+                    reply = {"ok": True, "result": dataclasses.asdict(r) if dataclasses.is_dataclass(r) else dict(vars(r))}
+                case _:
+                    reply = {"ok": False, "err": f"bad op {msg['op']}"}
+        except Exception as e:
+            reply = {"ok": False, "err": f"{type(e).__name__}: {e}", "trace": traceback.format_exc(limit=4)}
+        out.write(json.dumps(reply, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+        out.flush()
+
+
+if __name__ == "__main__" and sys.argv[1:] == ["--worker"]:
+    _worker()
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Final, Iterator
+
+import runpack
+
+INDEX_NAME: Final[str] = "index.sqlite"
+
+SCHEMA: Final[str] = """
+CREATE TABLE IF NOT EXISTS sources(
+    run TEXT PRIMARY KEY, kind TEXT NOT NULL, offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns(
+    id INTEGER PRIMARY KEY, run TEXT NOT NULL, turn INTEGER NOT NULL, stage TEXT NOT NULL,
+    error TEXT, observation TEXT, n_actions INTEGER NOT NULL DEFAULT 0,
+    exec_ms REAL, pipeline_ms REAL, vlm_ms REAL, prompt_tokens INTEGER,
+    fallback TEXT, repair TEXT
+);
+CREATE INDEX IF NOT EXISTS turns_run ON turns(run, turn);
+CREATE INDEX IF NOT EXISTS turns_stage ON turns(stage);
+CREATE INDEX IF NOT EXISTS turns_error ON turns(error) WHERE error IS NOT NULL;
+CREATE TABLE IF NOT EXISTS actions(
+    turn_id INTEGER NOT NULL, type TEXT NOT NULL,
+    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER, cx INTEGER, cy INTEGER
+);
+CREATE INDEX IF NOT EXISTS actions_type ON actions(type, cx, cy);
+CREATE INDEX IF NOT EXISTS actions_turn ON actions(turn_id);
+"""
+
+FTS: Final[str] = "CREATE VIRTUAL TABLE IF NOT EXISTS obs USING fts5(observation, content='turns', content_rowid='id')"
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    db: sqlite3.Connection = sqlite3.connect(str(path))
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    try:
+        db.execute(FTS)
+    except sqlite3.OperationalError:
+        pass
+    return db
+
+
+def _has_fts(db: sqlite3.Connection) -> bool:
+    return db.execute("SELECT 1 FROM sqlite_master WHERE name='obs'").fetchone() is not None
+
+
+def _source(rd: Path) -> tuple[str, Path] | None:
+    pack: Path = rd / runpack.PACK_NAME
+    if pack.exists():
+        return "pack", pack
+    turns: Path = rd / runpack.TURNS_NAME
+    if turns.exists():
+        return "jsonl", turns
+    return None
+
+
+def _tail_jsonl(path: Path, start: int) -> Iterator[tuple[int, dict[str, Any]]]:
+    with path.open("rb") as f:
+        f.seek(start)
+        pos: int = start
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            pos += len(line)
+            try:
+                obj: Any = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(obj, dict):
+                yield pos, obj
+
+
+def _purge(db: sqlite3.Connection, run: str) -> None:
+    if _has_fts(db):
+        db.execute(
+            "INSERT INTO obs(obs, rowid, observation) SELECT 'delete', id, observation FROM turns "
+            "WHERE run=? AND observation IS NOT NULL", (run,),
+        )
+    db.execute("DELETE FROM actions WHERE turn_id IN (SELECT id FROM turns WHERE run=?)", (run,))
+    db.execute("DELETE FROM turns WHERE run=?", (run,))
+
+
+def _num(v: Any) -> float | None:
+    return float(v) if isinstance(v, (int, float)) else None
+
+
+def _insert(db: sqlite3.Connection, run: str, rec: dict[str, Any], fts: bool) -> None:
+    ex: Any = rec.get("exec") if isinstance(rec.get("exec"), dict) else {}
+    pi: Any = rec.get("pipeline") if isinstance(rec.get("pipeline"), dict) else {}
+    usage: Any = rec.get("usage") if isinstance(rec.get("usage"), dict) else {}
+    actions: list[Any] = [a for a in rec.get("actions") or [] if isinstance(a, dict)]
+    obs: Any = rec.get("observation")
+    err: Any = rec.get("error")
+    cur: sqlite3.Cursor = db.execute(
+        "INSERT INTO turns(run, turn, stage, error, observation, n_actions, exec_ms, pipeline_ms, vlm_ms, "
+        "prompt_tokens, fallback, repair) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+        (
+            run, int(rec.get("turn", 0)), str(rec.get("stage", "")),
+            str(err) if err else None, obs if isinstance(obs, str) and obs else None, len(actions),
+            _num(ex.get("actual_ms")), _num(pi.get("ms")), _num(rec.get("ms")),
+            usage.get("prompt_tokens") if isinstance(usage.get("prompt_tokens"), int) else None,
+            str(pi["fallback"]) if pi.get("fallback") else None,
+            ",".join(map(str, rec["repair"])) if isinstance(rec.get("repair"), list) and rec["repair"] else None,
+        ),
+    )
+    tid: int = int(cur.lastrowid or 0)
+    rows: list[tuple[Any, ...]] = []
+    for a in actions:
+        b: Any = a.get("bbox_2d")
+        if isinstance(b, list) and len(b) == 4 and all(isinstance(v, int) for v in b):
+            rows.append((tid, str(a.get("type", "")), *b, (b[0] + b[2]) // 2, (b[1] + b[3]) // 2))
+        else:
+            rows.append((tid, str(a.get("type", "")), None, None, None, None, None, None))
+    db.executemany("INSERT INTO actions VALUES (?,?,?,?,?,?,?,?)", rows)
+    if fts and isinstance(obs, str) and obs:
+        db.execute("INSERT INTO obs(rowid, observation) VALUES (?,?)", (tid, obs))
+
+
+def update(base: Path, db: sqlite3.Connection | None = None) -> dict[str, Any]:
+    t0: float = time.perf_counter()
+    own: bool = db is None
+    db = db or connect(base / INDEX_NAME)
+    fts: bool = _has_fts(db)
+    stats: dict[str, Any] = {"runs": 0, "updated": 0, "reindexed": 0, "records": 0, "bytes": 0}
+    for rd in sorted(d for d in base.iterdir() if d.is_dir() and d.name.startswith("run_")):
+        src: tuple[str, Path] | None = _source(rd)
+        if src is None:
+            continue
+        stats["runs"] += 1
+        kind, path = src
+        size: int = path.stat().st_size
+        row: sqlite3.Row | None = db.execute("SELECT kind, offset FROM sources WHERE run=?", (rd.name,)).fetchone()
+        start: int = 0
+        with db:
+            if row is not None and row["kind"] == kind and row["offset"] <= size:
+                start = int(row["offset"])
+            elif row is not None:
+                _purge(db, rd.name)
+                stats["reindexed"] += 1
+            if start == size:
+                continue
+            end: int = start
+            n: int = 0
+            records: Iterator[tuple[int, dict[str, Any]]] = (
+                runpack.tail_records(path, start) if kind == "pack" else _tail_jsonl(path, start)
+            )
+            for end, rec in records:
+                _insert(db, rd.name, rec, fts)
+                n += 1
+            db.execute(
+                "INSERT INTO sources(run, kind, offset) VALUES (?,?,?) "
+                "ON CONFLICT(run) DO UPDATE SET kind=excluded.kind, offset=excluded.offset",
+                (rd.name, kind, end),
+            )
+        if n:
+            stats["updated"] += 1
+            stats["records"] += n
+            stats["bytes"] += end - start
+    if stats["records"]:
+        db.execute("ANALYZE")
+    if own:
+        db.close()
+    stats["ms"] = round((time.perf_counter() - t0) * 1000, 3)
+    return stats
+
+
+def fts_terms(text: str) -> str:
+    return " ".join('"' + t.replace('"', '""') + '"' for t in text.split())
+
+
+def query(
+    db: sqlite3.Connection, text: str | None = None, action: str | None = None,
+    inside: tuple[int, int, int, int] | None = None, error: str | None = None,
+    run: str | None = None, stage: str | None = None, limit: int = 50, runs: bool = False,
+    raw_fts: bool = False,
+) -> list[dict[str, Any]]:
+    where: list[str] = []
+    args: list[Any] = []
+    if text and text.strip():
+        if _has_fts(db):
+            where.append("t.id IN (SELECT rowid FROM obs WHERE obs MATCH ?)")
+            args.append(text if raw_fts else fts_terms(text))
+        else:
+            where.append("t.observation LIKE '%' || ? || '%'")
+            args.append(text)
+    if action or inside:
+        sub: list[str] = []
+        if action:
+            sub.append("a.type = ?")
+            args.append(action)
+        if inside:
+            sub.append("a.cx BETWEEN ? AND ? AND a.cy BETWEEN ? AND ?")
+            args.extend((inside[0], inside[2], inside[1], inside[3]))
+        where.append(f"t.id IN (SELECT a.turn_id FROM actions a WHERE {' AND '.join(sub)})")
+    if error is not None:
+        where.append("t.error IS NOT NULL" + (" AND t.error LIKE '%' || ? || '%'" if error else ""))
+        if error:
+            args.append(error)
+    if run:
+        where.append("t.run = ?")
+        args.append(run)
+    if stage:
+        where.append("t.stage = ?")
+        args.append(stage)
+    cond: str = " WHERE " + " AND ".join(where) if where else ""
+    if runs:
+        sql: str = f"SELECT t.run, COUNT(*) AS hits, MIN(t.turn) AS first_turn FROM turns t{cond} GROUP BY t.run ORDER BY t.run LIMIT ?"
+    else:
+        sql = (
+            "SELECT t.run, t.turn, t.stage, t.error, t.observation, t.n_actions, t.exec_ms, t.pipeline_ms, "
+            f"t.vlm_ms, t.prompt_tokens, t.fallback, t.repair FROM turns t{cond} ORDER BY t.run, t.turn LIMIT ?"
+        )
+    args.append(limit)
+    return [{k: r[k] for k in r.keys() if r[k] is not None} for r in db.execute(sql, args)]
+
+
+def _bbox(s: str) -> tuple[int, int, int, int]:
+    v: list[int] = [int(x) for x in s.split(",")]
+    if len(v) != 4:
+        raise argparse.ArgumentTypeError("expected x1,y1,x2,y2")
+    return v[0], v[1], v[2], v[3]
+
+
+def main() -> None:
+    ap: argparse.ArgumentParser = argparse.ArgumentParser(description="Cross-run turn index")
+    sp: Any = ap.add_subparsers(dest="cmd", required=True)
+    up: argparse.ArgumentParser = sp.add_parser("update", help="index new bytes of every run")
+    up.add_argument("runs_dir", nargs="?", default="runs")
+    q: argparse.ArgumentParser = sp.add_parser("query", help="query indexed turns")
+    q.add_argument("runs_dir", nargs="?", default="runs")
+    q.add_argument("--text", help="observation contains every word (each word matched literally)")
+    q.add_argument("--fts", action="store_true", help="pass --text through as raw FTS5 query syntax")
+    q.add_argument("--action", help="action type, e.g. click")
+    q.add_argument("--inside", type=_bbox, help="action centre inside x1,y1,x2,y2 (0-1000)")
+    q.add_argument("--error", nargs="?", const="", help="records with an error (optionally matching text)")
+    q.add_argument("--run")
+    q.add_argument("--stage")
+    q.add_argument("--limit", type=int, default=50)
+    q.add_argument("--runs", action="store_true", help="group hits by run")
+    q.add_argument("--no-update", action="store_true", help="skip the incremental update")
+    sq: argparse.ArgumentParser = sp.add_parser("sql", help="run a raw SELECT against the index")
+    sq.add_argument("runs_dir")
+    sq.add_argument("sql")
+    a: argparse.Namespace = ap.parse_args()
+    base: Path = Path(a.runs_dir)
+    if not base.is_dir():
+        print(f"no runs directory: {base}", file=sys.stderr)
+        sys.exit(1)
+    db: sqlite3.Connection = connect(base / INDEX_NAME)
+    match a.cmd:
+        case "update":
+            print(json.dumps(update(base, db)))
+        case "query":
+            if not a.no_update:
+                update(base, db)
+            t0: float = time.perf_counter()
+            rows: list[dict[str, Any]] = query(
+                db, a.text, a.action, a.inside, a.error, a.run, a.stage, a.limit, a.runs, a.fts,
+            )
+            ms: float = (time.perf_counter() - t0) * 1000
+            for r in rows:
+                print(json.dumps(r, ensure_ascii=False))
+            print(json.dumps({"rows": len(rows), "ms": round(ms, 3)}), file=sys.stderr)
+        case "sql":
+            for r in db.execute(a.sql):
+                print(json.dumps(dict(r), ensure_ascii=False))
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Any, BinaryIO, Final, Iterator
+
+MAGIC: Final[bytes] = b"FRZPACK1"
+INDEX_MAGIC: Final[bytes] = b"FRZINDX1"
+PACK_NAME: Final[str] = "run.pack"
+TURNS_NAME: Final[str] = "turns.jsonl"
+REC: Final[struct.Struct] = struct.Struct("<IBI")
+ENTRY: Final[struct.Struct] = struct.Struct("<IBQI")
+TABLE: Final[struct.Struct] = struct.Struct("<I")
+FOOTER: Final[struct.Struct] = struct.Struct("<QIII8s")
+RAW: Final[int] = 1
+ANN: Final[int] = 2
+ANN_DELTA: Final[int] = 3
+RECORD: Final[int] = 4
+INDEX: Final[int] = 0xFF
+PNG_KINDS: Final[dict[str, int]] = {"raw": RAW, "ann": ANN}
+PNG_SIG: Final[bytes] = b"\x89PNG\r\n\x1a\n"
+
+Entry = tuple[int, int, int, int]
+
+
+def _jline(obj: dict[str, Any]) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+class FilesWriter:
+    def __init__(self, rd: Path) -> None:
+        self.rd: Path = rd
+        self._f = (rd / TURNS_NAME).open("a", encoding="utf-8")
+
+    def png(self, turn: int, suffix: str, data: bytes, delta: bytes | None = None) -> str:
+        nm: str = f"turn_{turn:04d}_{suffix}.png"
+        if data:
+            (self.rd / nm).write_bytes(data)
+        return nm
+
+    def record(self, obj: dict[str, Any]) -> None:
+        self._f.write(_jline(obj))
+        self._f.write("\n")
+        self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class PackWriter:
+    def __init__(self, path: Path, index_every: int = 0, index_s: float = 0.0) -> None:
+        self.path: Path = path
+        self.entries: list[Entry] = []
+        self.index_every: int = max(0, index_every)
+        self.index_s: float = max(0.0, index_s)
+        self._records: int = 0
+        self._indexed_at: float = time.monotonic()
+        self._indexed: bool = False
+        self._body: bytearray = bytearray()
+        self._counts: list[int] = []
+        self._first: int = 0
+        exists: bool = self.path.exists() and self.path.stat().st_size >= len(MAGIC)
+        self._f: BinaryIO = self.path.open("r+b" if exists else "w+b")
+        if exists:
+            r: PackReader = PackReader(self.path)
+            self.entries = list(r.all_entries())
+            end: int = r.data_end
+            r.close()
+            self._f.truncate(end)
+            self._f.seek(end)
+        else:
+            self._f.write(MAGIC)
+        self._end: int = self._f.tell()
+        self._stale: bool = bool(self.entries)
+
+    def _append(self, kind: int, turn: int, payload: bytes) -> None:
+        if self._indexed:
+            self._f.truncate(self._end)
+            self._f.seek(self._end)
+            self._indexed = False
+        self._f.write(REC.pack(len(payload), kind, turn))
+        self._f.write(payload)
+        e: Entry = (turn, kind, self._end + REC.size, len(payload))
+        self.entries.append(e)
+        self._end = self._f.tell()
+        if not self._stale:
+            if self._counts and turn < self._first + len(self._counts) - 1:
+                self._stale = True
+            else:
+                self._add(e)
+
+    def _add(self, e: Entry) -> None:
+        if not self._counts:
+            self._first = e[0]
+        i: int = e[0] - self._first
+        if i >= len(self._counts):
+            self._counts.extend([0] * (i + 1 - len(self._counts)))
+        self._counts[i] += 1
+        self._body += ENTRY.pack(*e)
+
+    def png(self, turn: int, suffix: str, data: bytes, delta: bytes | None = None) -> str:
+        if delta:
+            self._append(ANN_DELTA, turn, delta)
+        elif data:
+            self._append(PNG_KINDS[suffix], turn, data)
+        return f"turn_{turn:04d}_{suffix}.png"
+
+    def record(self, obj: dict[str, Any]) -> None:
+        self._append(RECORD, int(obj.get("turn", 0)), _jline(obj).encode("utf-8"))
+        self._records += 1
+        if (self.index_every and self._records % self.index_every == 0) or (
+            self.index_s and time.monotonic() - self._indexed_at >= self.index_s
+        ):
+            self._write_index()
+        self._f.flush()
+
+    def _write_index(self) -> None:
+        if self._stale:
+            self._body, self._counts, self._stale = bytearray(), [], False
+            for e in sorted(self.entries, key=lambda e: (e[0], e[2])):
+                self._add(e)
+        starts: list[int] = [0, *itertools.accumulate(self._counts)]
+        body: bytes = self._body + struct.pack(f"<{len(starts)}I", *starts) if self._counts else TABLE.pack(0)
+        self._f.seek(self._end)
+        self._f.write(REC.pack(len(body), INDEX, 0))
+        self._f.write(body)
+        self._f.write(FOOTER.pack(self._end, len(self.entries), self._first, len(self._counts), INDEX_MAGIC))
+        self._f.truncate()
+        self._indexed = True
+        self._indexed_at = time.monotonic()
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        if not self._indexed:
+            self._write_index()
+        self._f.close()
+
+
+class PackReader:
+    def __init__(self, path: Path) -> None:
+        self.path: Path = path
+        self._f: BinaryIO = path.open("rb")
+        if self._f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a run pack")
+        size: int = path.stat().st_size
+        self.entries: list[Entry] = []
+        self.first: int = 0
+        self.n_turns: int = 0
+        self._idx: int = 0
+        self._n: int = 0
+        self.indexed: bool = False
+        self.data_end: int = size
+        if size >= len(MAGIC) + FOOTER.size:
+            self._f.seek(size - FOOTER.size)
+            idx_off, n, first, n_turns, magic = FOOTER.unpack(self._f.read(FOOTER.size))
+            if magic == INDEX_MAGIC:
+                self.indexed = True
+                self.data_end = idx_off
+                self.first, self.n_turns = first, n_turns
+                self._idx = idx_off + REC.size
+                self._n = n
+        if not self.indexed:
+            self._scan(size)
+
+    def _scan(self, size: int) -> None:
+        pos: int = len(MAGIC)
+        self._f.seek(pos)
+        while pos + REC.size <= size:
+            ln, kind, turn = REC.unpack(self._f.read(REC.size))
+            if kind == INDEX or pos + REC.size + ln > size:
+                break
+            self.entries.append((turn, kind, pos + REC.size, ln))
+            pos += REC.size + ln
+            self._f.seek(pos)
+        self.data_end = pos
+
+    def all_entries(self) -> list[Entry]:
+        if self.indexed and not self.entries:
+            self._f.seek(self._idx)
+            raw: bytes = self._f.read(self._n * ENTRY.size)
+            self.entries = [ENTRY.unpack_from(raw, i * ENTRY.size) for i in range(self._n)]
+            self.entries.sort(key=lambda e: e[2])
+        return self.entries
+
+    def turn_entries(self, turn: int) -> list[Entry]:
+        if not self.indexed:
+            return [e for e in self.entries if e[0] == turn]
+        i: int = turn - self.first
+        if not 0 <= i < self.n_turns:
+            return []
+        self._f.seek(self._idx + self._n * ENTRY.size + i * TABLE.size)
+        a, b = struct.unpack("<II", self._f.read(2 * TABLE.size))
+        self._f.seek(self._idx + a * ENTRY.size)
+        raw: bytes = self._f.read((b - a) * ENTRY.size)
+        return [ENTRY.unpack_from(raw, k * ENTRY.size) for k in range(b - a)]
+
+    def read(self, e: Entry) -> bytes:
+        self._f.seek(e[2])
+        return self._f.read(e[3])
+
+    def get(self, turn: int, kind: int) -> bytes | None:
+        for e in self.turn_entries(turn):
+            if e[1] == kind:
+                return self.read(e)
+        return None
+
+    def turn_records(self, turn: int) -> list[dict[str, Any]]:
+        return [json.loads(self.read(e)) for e in self.turn_entries(turn) if e[1] == RECORD]
+
+    def ann_png(self, turn: int) -> bytes | None:
+        full: bytes | None = self.get(turn, ANN)
+        if full is not None:
+            return full
+        delta: bytes | None = self.get(turn, ANN_DELTA)
+        raw: bytes | None = self.get(turn, RAW)
+        if delta is None or raw is None:
+            return None
+        return apply_delta(raw, delta)
+
+    def records(self) -> Iterator[dict[str, Any]]:
+        for e in self.all_entries():
+            if e[1] == RECORD:
+                yield json.loads(self.read(e))
+
+    def turns(self) -> list[int]:
+        if self.indexed:
+            return [self.first + i for i in range(self.n_turns) if self.turn_entries(self.first + i)]
+        return sorted({e[0] for e in self.entries})
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def iter_records(rd: Path) -> Iterator[dict[str, Any]]:
+    pack: Path = rd / PACK_NAME
+    if pack.exists():
+        r: PackReader = PackReader(pack)
+        try:
+            yield from r.records()
+        finally:
+            r.close()
+        return
+    yield from _jsonl(rd / TURNS_NAME)
+
+
+def tail_records(path: Path, start: int = 0) -> Iterator[tuple[int, dict[str, Any]]]:
+    with path.open("rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a run pack")
+        size: int = os.fstat(f.fileno()).st_size
+        pos: int = max(start, len(MAGIC))
+        f.seek(pos)
+        while pos + REC.size <= size:
+            ln, kind, _ = REC.unpack(f.read(REC.size))
+            if kind == INDEX or pos + REC.size + ln > size:
+                break
+            pos += REC.size + ln
+            if kind == RECORD:
+                yield pos, json.loads(f.read(ln))
+            else:
+                f.seek(pos)
+
+
+def _jsonl(path: Path) -> Iterator[dict[str, Any]]:
+    if not path.exists():
+        return
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def _paeth(a: int, b: int, c: int) -> int:
+    p: int = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def png_decode(data: bytes) -> tuple[int, int, bytearray]:
+    if not data.startswith(PNG_SIG):
+        raise ValueError("not a png")
+    pos: int = len(PNG_SIG)
+    idat: list[bytes] = []
+    w = h = ctype = 0
+    while pos < len(data):
+        ln: int = struct.unpack_from(">I", data, pos)[0]
+        tag: bytes = data[pos + 4:pos + 8]
+        body: bytes = data[pos + 8:pos + 8 + ln]
+        if tag == b"IHDR":
+            w, h, depth, ctype, _, _, interlace = struct.unpack(">IIBBBBB", body)
+            if depth != 8 or ctype not in (2, 6) or interlace:
+                raise ValueError(f"unsupported png depth={depth} color={ctype} interlace={interlace}")
+        elif tag == b"IDAT":
+            idat.append(body)
+        elif tag == b"IEND":
+            break
+        pos += 12 + ln
+    bpp: int = 4 if ctype == 6 else 3
+    stride: int = w * bpp
+    raw: bytes = zlib.decompress(b"".join(idat))
+    out: bytearray = bytearray(h * stride)
+    prev: bytearray = bytearray(stride)
+    for y in range(h):
+        ft: int = raw[y * (stride + 1)]
+        line: bytearray = bytearray(raw[y * (stride + 1) + 1:(y + 1) * (stride + 1)])
+        if ft == 1:
+            for i in range(bpp, stride):
+                line[i] = (line[i] + line[i - bpp]) & 0xFF
+        elif ft == 2:
+            line = bytearray((a + b) & 0xFF for a, b in zip(line, prev))
+        elif ft == 3:
+            for i in range(stride):
+                line[i] = (line[i] + ((line[i - bpp] if i >= bpp else 0) + prev[i]) // 2) & 0xFF
+        elif ft == 4:
+            for i in range(stride):
+                a: int = line[i - bpp] if i >= bpp else 0
+                c: int = prev[i - bpp] if i >= bpp else 0
+                line[i] = (line[i] + _paeth(a, prev[i], c)) & 0xFF
+        out[y * stride:(y + 1) * stride] = line
+        prev = line
+    if bpp == 3:
+        rgba: bytearray = bytearray(w * h * 4)
+        rgba[0::4], rgba[1::4], rgba[2::4] = out[0::3], out[1::3], out[2::3]
+        rgba[3::4] = b"\xff" * (w * h)
+        return w, h, rgba
+    return w, h, out
+
+
+def png_encode(rgba: bytes | bytearray, w: int, h: int) -> bytes:
+    stride: int = w * 4
+    rows: bytearray = bytearray()
+    for y in range(h):
+        rows.append(0)
+        rows += rgba[y * stride:(y + 1) * stride]
+
+    def ck(t: bytes, b: bytes) -> bytes:
+        c: bytes = t + b
+        return struct.pack(">I", len(b)) + c + struct.pack(">I", zlib.crc32(c) & 0xFFFFFFFF)
+
+    return (
+        PNG_SIG
+        + ck(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 6, 0, 0, 0))
+        + ck(b"IDAT", zlib.compress(bytes(rows), 6))
+        + ck(b"IEND", b"")
+    )
+
+
+def make_delta(raw_png: bytes, ann_png: bytes) -> bytes | None:
+    w, h, base = png_decode(raw_png)
+    w2, h2, ann = png_decode(ann_png)
+    if (w, h) != (w2, h2):
+        return None
+    stride: int = w * 4
+    rows_a: memoryview = memoryview(base)
+    rows_b: memoryview = memoryview(ann)
+    a: memoryview = rows_a.cast("I")
+    b: memoryview = rows_b.cast("I")
+    delta: bytearray = bytearray(len(ann))
+    d: memoryview = memoryview(delta).cast("I")
+    for y in range(h):
+        if rows_a[y * stride:(y + 1) * stride] == rows_b[y * stride:(y + 1) * stride]:
+            continue
+        for i in range(y * w, (y + 1) * w):
+            if a[i] != b[i]:
+                d[i] = b[i] | 0xFF000000
+    return png_encode(delta, w, h)
+
+
+def apply_delta(raw_png: bytes, delta_png: bytes) -> bytes:
+    w, h, base = png_decode(raw_png)
+    _, _, delta = png_decode(delta_png)
+    stride: int = w * 4
+    blank: bytes = bytes(stride)
+    rows: memoryview = memoryview(delta)
+    b: memoryview = memoryview(base).cast("I")
+    d: memoryview = rows.cast("I")
+    for y in range(h):
+        if rows[y * stride:(y + 1) * stride] == blank:
+            continue
+        for i in range(y * w, (y + 1) * w):
+            if d[i] >> 24:
+                b[i] = d[i]
+    return png_encode(base, w, h)
+
+
+def export(rd: Path, out: Path) -> int:
+    r: PackReader = PackReader(rd / PACK_NAME)
+    out.mkdir(parents=True, exist_ok=True)
+    n: int = 0
+    try:
+        with (out / TURNS_NAME).open("w", encoding="utf-8") as f:
+            for rec in r.records():
+                f.write(_jline(rec))
+                f.write("\n")
+        for turn in r.turns():
+            raw: bytes | None = r.get(turn, RAW)
+            if raw is not None:
+                (out / f"turn_{turn:04d}_raw.png").write_bytes(raw)
+            ann: bytes | None = r.ann_png(turn)
+            if ann is not None:
+                (out / f"turn_{turn:04d}_ann.png").write_bytes(ann)
+            n += 1
+    finally:
+        r.close()
+    return n
+
+
+def compact(rd: Path, delta: bool = True, delete: bool = False) -> dict[str, Any]:
+    turns: Path = rd / TURNS_NAME
+    if (rd / PACK_NAME).exists() or not turns.exists():
+        return {"run": rd.name, "skipped": True}
+    before: int = sum(p.stat().st_size for p in rd.iterdir() if p.is_file() and p.suffix in (".png", ".jsonl"))
+    tmp: Path = rd / (PACK_NAME + ".tmp")
+    tmp.unlink(missing_ok=True)
+    w: PackWriter = PackWriter(tmp)
+    used: list[Path] = [turns]
+    deltas: int = 0
+    for rec in _jsonl(turns):
+        turn: int = int(rec.get("turn", 0))
+        stage: str = str(rec.get("stage", ""))
+        png: Path = rd / str(rec.get(f"{stage}_png", ""))
+        if stage in PNG_KINDS and png.is_file():
+            data: bytes = png.read_bytes()
+            d: bytes | None = None
+            raw_png: Path = rd / f"turn_{turn:04d}_raw.png"
+            if stage == "ann" and delta and raw_png.is_file():
+                try:
+                    d = make_delta(raw_png.read_bytes(), data)
+                except (ValueError, zlib.error):
+                    d = None
+                deltas += d is not None
+            w.png(turn, stage, data, d)
+            used.append(png)
+        w.record(rec)
+    w.close()
+    tmp.replace(rd / PACK_NAME)
+    if delete:
+        for p in used:
+            p.unlink()
+    return {
+        "run": rd.name, "files_bytes": before, "pack_bytes": (rd / PACK_NAME).stat().st_size,
+        "files_packed": len(used), "ann_deltas": deltas, "deleted": delete,
+    }
+
+
+if __name__ == "__main__":
+    match sys.argv[1:2]:
+        case ["export"]:
+            print(export(Path(sys.argv[2]), Path(sys.argv[3])), "turns exported")
+        case ["compact"]:
+            flags: set[str] = {a for a in sys.argv[2:] if a.startswith("--")}
+            for p in (Path(a) for a in sys.argv[2:] if not a.startswith("--")):
+                dirs: list[Path] = sorted(d for d in p.iterdir() if d.is_dir()) if not (p / TURNS_NAME).exists() else [p]
+                for d in dirs:
+                    print(json.dumps(compact(d, "--no-delta" not in flags, "--delete" in flags)))
+        case _:
+            print("usage: runpack.py export RUN_DIR OUT_DIR | compact RUN_DIR|RUNS_DIR [--no-delta] [--delete]")
+            sys.exit(2)
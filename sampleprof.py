@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from typing import Any, Callable, Final
+
+Func = tuple[str, int, str]
+
+IDLE: Final[frozenset[tuple[str, str]]] = frozenset({
+    ("selectors.py", "select"), ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("thread.py", "_worker"), ("queue.py", "get"), ("socketserver.py", "serve_forever"),
+    ("connection.py", "_recv"), ("connection.py", "_poll"), ("handlers.py", "dequeue"),
+    ("socket.py", "readinto"), ("socket.py", "accept"), ("ssl.py", "read"), ("pipeline_host.py", "_reader"),
+})
+PLUMBING: Final[frozenset[str]] = frozenset({
+    "threading.py", "thread.py", "socketserver.py", "base_events.py", "events.py", "runners.py", "server.py",
+})
+
+
+def _func(f: FrameType) -> Func:
+    c: Any = f.f_code
+    return c.co_filename, c.co_firstlineno, c.co_name
+
+
+def _label(fn: Func) -> str:
+    return f"{fn[2]} ({os.path.basename(fn[0])}:{fn[1]})"
+
+
+class SampleProfiler:
+    def __init__(self, interval: float = 0.005, idle: bool = False, max_depth: int = 128) -> None:
+        self.interval: float = max(0.0005, interval)
+        self.idle: bool = idle
+        self.max_depth: int = max_depth
+        self.stacks: Counter[tuple[str, tuple[Func, ...]]] = Counter()
+        self.samples: int = 0
+        self.idle_samples: int = 0
+        self.ticks: int = 0
+        self.cpu_s: float = 0.0
+        self.started: float = 0.0
+        self.wall_s: float = 0.0
+        self.stop_when: Callable[[], bool] | None = None
+        self.on_done: Callable[[SampleProfiler], None] | None = None
+        self._stop: threading.Event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._names: dict[int, str] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, stop_when: Callable[[], bool] | None = None,
+              on_done: Callable[[SampleProfiler], None] | None = None) -> None:
+        self.stop_when, self.on_done = stop_when, on_done
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampleprof", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        self._stop.set()
+        if wait and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self) -> None:
+        me: int = threading.get_ident()
+        cpu0: float = time.thread_time()
+        nxt: float = time.perf_counter()
+        while not self._stop.is_set():
+            self._sample(me)
+            if self.stop_when is not None and self.stop_when():
+                break
+            nxt += self.interval
+            delay: float = nxt - time.perf_counter()
+            if delay < 0:
+                nxt = time.perf_counter()
+            elif self._stop.wait(delay):
+                break
+        self.cpu_s = time.thread_time() - cpu0
+        self.wall_s = time.perf_counter() - self.started
+        if self.on_done is not None:
+            self.on_done(self)
+
+    def _sample(self, me: int) -> None:
+        self.ticks += 1
+        for ident, f in sys._current_frames().items():
+            if ident == me:
+                continue
+            leaf: Func = _func(f)
+            if not self.idle and (os.path.basename(leaf[0]), leaf[2]) in IDLE:
+                self.idle_samples += 1
+                continue
+            stack: list[Func] = []
+            fr: FrameType | None = f
+            while fr is not None and len(stack) < self.max_depth:
+                stack.append(_func(fr))
+                fr = fr.f_back
+            stack.reverse()
+            if ident not in self._names:
+                self._names = {t.ident: t.name for t in threading.enumerate() if t.ident is not None}
+            self.stacks[(self._names.get(ident, str(ident)), tuple(stack))] += 1
+            self.samples += 1
+
+    def stats(self) -> dict[Func, tuple[int, int, float, float, dict[Func, tuple[int, int, float, float]]]]:
+        dt: float = self.interval
+        own: Counter[Func] = Counter()
+        cum: Counter[Func] = Counter()
+        edges: Counter[tuple[Func, Func]] = Counter()
+        edge_own: Counter[tuple[Func, Func]] = Counter()
+        for (_, stack), n in self.stacks.items():
+            own[stack[-1]] += n
+            for fn in set(stack):
+                cum[fn] += n
+            for pair in set(zip(stack, stack[1:])):
+                edges[pair] += n
+            if len(stack) > 1:
+                edge_own[(stack[-2], stack[-1])] += n
+        callers: dict[Func, dict[Func, tuple[int, int, float, float]]] = {}
+        for (a, b), n in edges.items():
+            callers.setdefault(b, {})[a] = (n, n, edge_own[(a, b)] * dt, n * dt)
+        return {fn: (n, n, own[fn] * dt, n * dt, callers.get(fn, {})) for fn, n in cum.items()}
+
+    def collapsed(self) -> list[str]:
+        return [f"{thread};{';'.join(_label(fn) for fn in stack)} {n}"
+                for (thread, stack), n in sorted(self.stacks.items(), key=lambda kv: -kv[1])]
+
+    def top(self, n: int = 15) -> dict[str, Any]:
+        st: dict[Func, tuple[int, int, float, float, Any]] = self.stats()
+        total: int = max(1, self.samples)
+        threads: Counter[str] = Counter()
+        for (thread, _), k in self.stacks.items():
+            threads[thread] += k
+
+        def rows(idx: int) -> list[dict[str, Any]]:
+            keep: list[tuple[Func, Any]] = [kv for kv in st.items() if idx == 2 or os.path.basename(kv[0][0]) not in PLUMBING]
+            ordered: list[tuple[Func, Any]] = sorted(keep, key=lambda kv: -kv[1][idx])[:n]
+            return [{"func": _label(fn), "self_pct": round(v[2] / self.interval / total * 100, 1),
+                     "cum_pct": round(v[3] / self.interval / total * 100, 1)} for fn, v in ordered]
+
+        return {
+            "samples": self.samples, "idle_samples": self.idle_samples, "ticks": self.ticks,
+            "interval_ms": round(self.interval * 1000, 3), "wall_s": round(self.wall_s, 3),
+            "overhead_pct": round(self.cpu_s / self.wall_s * 100, 2) if self.wall_s else 0.0,
+            "threads": {k: round(v / total * 100, 1) for k, v in threads.most_common()},
+            "top_self": rows(2), "top_cum": rows(3),
+        }
+
+    def write(self, stem: Path) -> dict[str, str]:
+        ps: Path = stem.with_suffix(".pstats")
+        with ps.open("wb") as f:
+            marshal.dump(self.stats(), f)
+        fl: Path = stem.with_suffix(".collapsed")
+        fl.write_text("\n".join(self.collapsed()) + "\n", "utf-8")
+        return {"pstats": ps.name, "collapsed": fl.name}
@@ -0,0 +1,397 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Final
+
+import timeline
+
+VK_BACK: Final[int] = 0x08
+COLORS: Final[dict[str, tuple[int, int, int]]] = {
+    "button": (70, 130, 200), "field": (235, 235, 235), "focus": (255, 230, 140),
+    "drag": (90, 180, 90), "target": (150, 80, 80), "ink": (40, 40, 40),
+}
+
+DEFAULT_SCENARIO: Final[dict[str, Any]] = {
+    "name": "login_delete_file",
+    "size": [800, 600],
+    "start": "login",
+    "states": {
+        "login": {"bg": [48, 48, 56], "widgets": [
+            {"id": "user", "kind": "field", "box": [250, 180, 550, 220], "expect": "admin"},
+            {"id": "password", "kind": "field", "box": [250, 250, 550, 290], "expect": "hunter2"},
+            {"id": "sign_in", "kind": "button", "box": [330, 330, 470, 370], "goto": "desktop",
+             "requires": ["user", "password"]},
+        ]},
+        "desktop": {"bg": [30, 60, 90], "widgets": [
+            {"id": "report", "kind": "drag", "box": [100, 100, 180, 180], "target": "trash", "goto": "confirm"},
+            {"id": "trash", "kind": "target", "box": [620, 420, 720, 520]},
+        ]},
+        "confirm": {"bg": [60, 40, 40], "widgets": [
+            {"id": "cancel", "kind": "button", "box": [250, 300, 370, 340], "goto": "desktop", "decoy": True},
+            {"id": "delete", "kind": "button", "box": [430, 300, 550, 340], "goto": "done"},
+        ]},
+        "done": {"bg": [20, 90, 40], "final": True, "widgets": []},
+    },
+}
+
+
+@dataclass
+class Widget:
+    id: str
+    kind: str
+    box: tuple[int, int, int, int]
+    goto: str = ""
+    expect: str = ""
+    target: str = ""
+    requires: list[str] = field(default_factory=list)
+    decoy: bool = False
+
+    def hit(self, x: int, y: int) -> bool:
+        return self.box[0] <= x < self.box[2] and self.box[1] <= y < self.box[3]
+
+
+@dataclass
+class Screen:
+    name: str
+    bg: tuple[int, int, int]
+    widgets: list[Widget]
+    final: bool = False
+
+
+def load_scenario(path: Path | None) -> dict[str, Any]:
+    return json.loads(path.read_text("utf-8")) if path is not None else DEFAULT_SCENARIO
+
+
+class SimDesktop:
+    name: str = "sim"
+
+    def __init__(self, scenario: dict[str, Any], log_path: Path | None = None) -> None:
+        self.scenario: str = str(scenario.get("name", "scenario"))
+        self.w, self.h = (int(v) for v in scenario.get("size", [800, 600]))
+        self.screens: dict[str, Screen] = {
+            k: Screen(k, tuple(s.get("bg", [0, 0, 0])), [Widget(**{**d, "box": tuple(d["box"])}) for d in s.get("widgets", [])],
+                      bool(s.get("final", False)))
+            for k, s in scenario["states"].items()
+        }
+        self.state: str = str(scenario.get("start", next(iter(self.screens))))
+        self.values: dict[str, str] = {}
+        self.focus: str = ""
+        self.cursor: tuple[int, int] = (0, 0)
+        self.pressed: tuple[int, int] | None = None
+        self.shift: bool = False
+        self.ctrl: bool = False
+        self.clip: str = ""
+        self.turn: int = 0
+        self.done_turn: int = 0
+        self.counts: Counter[str] = Counter()
+        self.path: Path | None = log_path
+        self._pending: list[str] = []
+        self._lock: threading.Lock = threading.Lock()
+        self._t0: float = time.perf_counter()
+
+    @property
+    def screen(self) -> Screen:
+        return self.screens[self.state]
+
+    @property
+    def done(self) -> bool:
+        return self.screen.final
+
+    def widget_at(self, x: int, y: int) -> Widget | None:
+        for wd in reversed(self.screen.widgets):
+            if wd.hit(x, y):
+                return wd
+        return None
+
+    def _widget(self, wid: str) -> Widget | None:
+        return next((wd for wd in self.screen.widgets if wd.id == wid), None)
+
+    def _outcome(self, event: str, **extra: Any) -> None:
+        self.counts[event] += 1
+        rec: dict[str, Any] = {"t": round(time.perf_counter() - self._t0, 4), "turn": self.turn,
+                               "state": self.state, "event": event, **extra}
+        if self.path is not None:
+            self._pending.append(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+
+    def _go(self, state: str, via: str) -> None:
+        prev: str = self.state
+        self.state, self.focus = state, ""
+        for wd in self.screen.widgets:
+            self.values.pop(wd.id, None)
+        self._outcome("transition", widget=via, frm=prev)
+        if self.done and not self.done_turn:
+            self.done_turn = self.turn
+            self._outcome("goal")
+
+    def _click(self, x: int, y: int) -> None:
+        wd: Widget | None = self.widget_at(x, y)
+        if wd is None:
+            self._outcome("miss", x=x, y=y)
+            return
+        if wd.kind == "field":
+            self.focus = wd.id
+            self._outcome("focus", widget=wd.id)
+        elif wd.kind == "button" and wd.goto:
+            missing: list[str] = [r for r in wd.requires if self.values.get(r, "") != self._expect(r)]
+            if missing:
+                self._outcome("rejected", widget=wd.id, missing=missing)
+            else:
+                self._outcome("press", widget=wd.id, **({"decoy": True} if wd.decoy else {}))
+                self._go(wd.goto, wd.id)
+        else:
+            self._outcome("click", widget=wd.id)
+
+    def _drop(self, src: Widget, x: int, y: int) -> None:
+        dst: Widget | None = self.widget_at(x, y)
+        if dst is not None and dst.id == src.target:
+            self._outcome("drop", widget=src.id, target=dst.id)
+            if src.goto:
+                self._go(src.goto, src.id)
+        else:
+            self._outcome("drop_miss", widget=src.id, target=dst.id if dst is not None else None, x=x, y=y)
+
+    def _expect(self, wid: str) -> str:
+        wd: Widget | None = self._widget(wid)
+        return wd.expect if wd is not None else ""
+
+    def _type(self, text: str) -> None:
+        if not self.focus:
+            self._outcome("type_lost", chars=len(text))
+            return
+        self.values[self.focus] = self.values.get(self.focus, "") + text
+        self._outcome("type", widget=self.focus, chars=len(text))
+
+    def _key(self, vk: int) -> None:
+        if vk == timeline.VK_SHIFT:
+            self.shift = True
+        elif vk == timeline.VK_CONTROL:
+            self.ctrl = True
+        elif self.ctrl:
+            if vk == timeline.VK_V:
+                self._type(self.clip)
+        elif vk == VK_BACK:
+            if self.focus and self.values.get(self.focus):
+                self.values[self.focus] = self.values[self.focus][:-1]
+        elif vk == timeline.VK_RETURN:
+            self._outcome("key", vk=vk)
+        elif 0x30 <= vk <= 0x5A or vk == 0x20:
+            self._type(chr(vk) if self.shift else chr(vk).lower())
+
+    def send(self, ev: timeline.InputEvent) -> None:
+        with self._lock:
+            match ev.kind:
+                case "move":
+                    self.cursor = (ev.x, ev.y)
+                case "down":
+                    self.pressed = self.cursor if not ev.code else None
+                case "up":
+                    if ev.code:
+                        self._outcome("right_click", x=self.cursor[0], y=self.cursor[1])
+                        return
+                    start: tuple[int, int] = self.pressed or self.cursor
+                    self.pressed = None
+                    src: Widget | None = self.widget_at(*start)
+                    if src is not None and src.kind == "drag" and not src.hit(*self.cursor):
+                        self._drop(src, *self.cursor)
+                    else:
+                        self._click(*self.cursor)
+                case "wheel":
+                    self._outcome("scroll", delta=ev.code)
+                case "key_down":
+                    self._key(ev.code)
+                case "key_up":
+                    if ev.code == timeline.VK_SHIFT:
+                        self.shift = False
+                    elif ev.code == timeline.VK_CONTROL:
+                        self.ctrl = False
+                case "text":
+                    self._type(ev.text)
+                case "clipboard":
+                    self.clip = ev.text.replace("\r\n", "\n")
+
+    def flush(self) -> None:
+        if self.path is None or not self._pending:
+            return
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write("\n".join(self._pending))
+            f.write("\n")
+        self._pending.clear()
+
+    def close(self) -> None:
+        self.flush()
+
+    def _fill(self, buf: bytearray, box: tuple[int, int, int, int], rgb: tuple[int, ...]) -> None:
+        x1, y1 = max(0, box[0]), max(0, box[1])
+        x2, y2 = min(self.w, box[2]), min(self.h, box[3])
+        if x2 <= x1 or y2 <= y1:
+            return
+        row: bytes = bytes((rgb[2], rgb[1], rgb[0], 255)) * (x2 - x1)
+        stride: int = self.w * 4
+        for y in range(y1, y2):
+            o: int = y * stride + x1 * 4
+            buf[o:o + len(row)] = row
+
+    def render(self) -> bytes:
+        with self._lock:
+            sc: Screen = self.screen
+            buf: bytearray = bytearray(bytes((sc.bg[2], sc.bg[1], sc.bg[0], 255)) * (self.w * self.h))
+            for wd in sc.widgets:
+                focused: bool = wd.kind == "field" and wd.id == self.focus
+                self._fill(buf, wd.box, COLORS["focus" if focused else wd.kind])
+                if wd.kind == "field" and self.values.get(wd.id):
+                    x1, y1, x2, y2 = wd.box
+                    n: int = len(self.values[wd.id])
+                    fill: int = min(x2 - x1 - 8, n * (x2 - x1 - 8) // max(1, len(wd.expect) or n))
+                    self._fill(buf, (x1 + 4, y1 + 4, x1 + 4 + fill, y2 - 4), COLORS["ink"])
+            return bytes(buf)
+
+    def plan(self) -> list[dict[str, Any]]:
+        with self._lock:
+            sc: Screen = self.screen
+            for wd in sc.widgets:
+                if wd.kind != "field" or not wd.expect or self.values.get(wd.id, "") == wd.expect:
+                    continue
+                have: str = self.values.get(wd.id, "")
+                return [{"type": "click", "box": wd.box, "widget": wd.id},
+                        *({"type": "key", "box": wd.box, "params": "backspace"} for _ in have),
+                        {"type": "type", "box": wd.box, "params": wd.expect}]
+            for wd in sc.widgets:
+                if wd.kind == "drag" and wd.target:
+                    dst: Widget | None = self._widget(wd.target)
+                    if dst is not None:
+                        return [{"type": "drag_start", "box": wd.box, "widget": wd.id},
+                                {"type": "drag_end", "box": dst.box, "widget": dst.id}]
+                if wd.kind == "button" and wd.goto and not wd.decoy:
+                    return [{"type": "click", "box": wd.box, "widget": wd.id}]
+            return []
+
+    def empty_box(self, size: int = 16) -> tuple[int, int, int, int]:
+        for x, y in ((4, 4), (self.w - size - 4, 4), (4, self.h - size - 4), (self.w - size - 4, self.h - size - 4)):
+            if all(self.widget_at(px, py) is None for px in (x, x + size) for py in (y, y + size)):
+                return x, y, x + size, y + size
+        return 0, 0, 1, 1
+
+    def summary(self) -> dict[str, Any]:
+        return {"scenario": self.scenario, "state": self.state, "success": self.done,
+                "goal_turn": self.done_turn or None, "events": dict(self.counts)}
+
+
+class MockVLM:
+    def __init__(self, sim: SimDesktop, to_norm: Callable[[int, int], tuple[int, int]] | None = None,
+                 seed: int = 0, latency: float = 0.0, miss: float = 0.0, fail: float = 0.0) -> None:
+        self.sim: SimDesktop = sim
+        self.to_norm: Callable[[int, int], tuple[int, int]] = to_norm or (
+            lambda x, y: (x * 1000 // max(1, sim.w - 1), y * 1000 // max(1, sim.h - 1)))
+        self.rng: random.Random = random.Random(seed)
+        self.latency: float = latency
+        self.miss: float = miss
+        self.fail: float = fail
+        self.calls: int = 0
+        self.failed: int = 0
+        self.missed: int = 0
+        self.images: int = 0
+        self.truncated: int = 0
+        self._srv: ThreadingHTTPServer | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def _bbox(self, box: tuple[int, int, int, int]) -> list[int]:
+        return [*self.to_norm(box[0], box[1]), *self.to_norm(box[2] - 1, box[3] - 1)]
+
+    def respond(self, body: dict[str, Any]) -> tuple[int, dict[str, Any]]:
+        with self._lock:
+            self.calls += 1
+            for m in body.get("messages", []):
+                if isinstance(m.get("content"), list):
+                    self.images += sum(1 for p in m["content"] if p.get("type") == "image_url")
+            if self.latency > 0:
+                time.sleep(self.latency)
+            if self.rng.random() < self.fail:
+                self.failed += 1
+                return 500, {"error": "mock failure"}
+            steps: list[dict[str, Any]] = self.sim.plan()
+            off: bool = bool(steps) and self.rng.random() < self.miss
+            self.missed += off
+            actions: list[dict[str, Any]] = []
+            for st in steps:
+                a: dict[str, Any] = {"type": st["type"], "bbox_2d": self._bbox(self.sim.empty_box() if off else st["box"])}
+                if "params" in st:
+                    a["params"] = st["params"]
+                actions.append(a)
+            target: str = next((st["widget"] for st in steps if "widget" in st), "")
+            obs: str = (f"Goal: reach the final screen of '{self.sim.scenario}'. Call {self.calls}: the screen shows "
+                        f"'{self.sim.state}'. " + (f"Next I operate '{target}'." if target else "Nothing left to do."))
+            regions: list[dict[str, Any]] = [{"bbox_2d": self._bbox(wd.box), "label": wd.id} for wd in self.sim.screen.widgets]
+            content: str = json.dumps({"observation": obs, "regions": regions, "actions": actions})
+            limit: int = int(body.get("max_tokens") or 0) * 4
+            finish: str = "length" if 0 < limit < len(content) else "stop"
+            content = content[:limit] if finish == "length" else content
+            self.truncated += finish == "length"
+            prompt: str = json.dumps(body.get("messages", ""))
+            return 200, {"choices": [{"message": {"role": "assistant", "content": content}, "finish_reason": finish}],
+                         "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}}
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        mock: MockVLM = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                n: int = int(self.headers.get("Content-Length", 0))
+                try:
+                    body: dict[str, Any] = json.loads(self.rfile.read(n) or b"{}")
+                except ValueError:
+                    body = {}
+                code, obj = mock.respond(body)
+                data: bytes = json.dumps(obj).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, fmt: str, *args: Any) -> None:
+                pass
+
+        self._srv = ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target=self._srv.serve_forever, name="mock-vlm", daemon=True).start()
+        return f"http://{host}:{self._srv.server_address[1]}/v1/chat/completions"
+
+    def close(self) -> None:
+        if self._srv is not None:
+            self._srv.shutdown()
+            self._srv.server_close()
+            self._srv = None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"calls": self.calls, "failed": self.failed, "missed": self.missed, "images": self.images,
+                "truncated": self.truncated, "latency_s": self.latency, "miss": self.miss, "fail": self.fail}
+
+
+def main() -> None:
+    ap: argparse.ArgumentParser = argparse.ArgumentParser(description="Render or serve a Franz simulated desktop")
+    ap.add_argument("--scenario", type=Path, help="scenario JSON (default: built-in login/delete-file task)")
+    ap.add_argument("--png", nargs=2, metavar=("STATE", "OUT"), help="write the rendering of STATE as PNG")
+    ap.add_argument("--dump", action="store_true", help="print the built-in scenario as JSON")
+    a: argparse.Namespace = ap.parse_args()
+    if a.dump:
+        print(json.dumps(DEFAULT_SCENARIO, indent=2))
+        return
+    sim: SimDesktop = SimDesktop(load_scenario(a.scenario))
+    if a.png:
+        import encodepool
+        sim.state = a.png[0]
+        Path(a.png[1]).write_bytes(encodepool.png_bgra(sim.render(), sim.w, sim.h))
+        return
+    print(json.dumps({"scenario": sim.scenario, "size": [sim.w, sim.h], "start": sim.state,
+                      "states": {k: [wd.id for wd in s.widgets] for k, s in sim.screens.items()}}))
+
+
+if __name__ == "__main__":
+    main()
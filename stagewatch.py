@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import time
+from collections import Counter, deque
+from typing import Any
+
+
+class StageWatch:
+    def __init__(self, deadlines: dict[str, float], keep: int = 50) -> None:
+        self.deadlines: dict[str, float] = {k: float(v) for k, v in deadlines.items() if float(v) > 0}
+        self.stage: str = "idle"
+        self.turn: int = 0
+        self.since: float = time.monotonic()
+        self.fired: bool = False
+        self.stages_ms: dict[str, float] = {}
+        self.turn_start: float = self.since
+        self.counts: Counter[str] = Counter()
+        self.events: deque[dict[str, Any]] = deque(maxlen=keep)
+        self.worst_turn_ms: float = 0.0
+        self.turns_done: int = 0
+        self.total_turn_ms: float = 0.0
+        self.stage_total_ms: Counter[str] = Counter()
+        self.stage_max_ms: dict[str, float] = {}
+
+    def limit(self, stage: str) -> float | None:
+        return self.deadlines.get(stage)
+
+    def enter(self, stage: str, turn: int) -> None:
+        now: float = time.monotonic()
+        if turn != self.turn:
+            self.turn, self.stages_ms, self.turn_start = turn, {}, now
+        else:
+            self.stages_ms[self.stage] = round(self.stages_ms.get(self.stage, 0.0) + (now - self.since) * 1000, 1)
+        self.stage, self.since, self.fired = stage, now, False
+
+    def elapsed(self, now: float | None = None) -> float:
+        return (time.monotonic() if now is None else now) - self.since
+
+    def _event(self, kind: str, **extra: Any) -> dict[str, Any]:
+        ev: dict[str, Any] = {
+            "event": kind, "phase": self.stage, "turn": self.turn, "elapsed_s": round(self.elapsed(), 3),
+            "deadline_s": self.limit(self.stage), **extra,
+        }
+        self.counts[f"{kind}:{self.stage}"] += 1
+        self.events.append(ev)
+        return ev
+
+    def check(self) -> dict[str, Any] | None:
+        d: float | None = self.limit(self.stage)
+        if self.fired or d is None or self.elapsed() <= d:
+            return None
+        self.fired = True
+        return self._event("overdue")
+
+    def fallback(self, action: str) -> dict[str, Any]:
+        self.fired = True
+        return self._event("fallback", action=action)
+
+    def stall(self, lag_s: float) -> dict[str, Any]:
+        return self._event("loop_stall", lag_s=round(lag_s, 3))
+
+    def turn_done(self) -> dict[str, Any]:
+        now: float = time.monotonic()
+        self.stages_ms[self.stage] = round(self.stages_ms.get(self.stage, 0.0) + (now - self.since) * 1000, 1)
+        self.since = now
+        total: float = round((now - self.turn_start) * 1000, 1)
+        self.worst_turn_ms = max(self.worst_turn_ms, total)
+        self.turns_done += 1
+        self.total_turn_ms += total
+        for k, v in self.stages_ms.items():
+            self.stage_total_ms[k] += v
+            self.stage_max_ms[k] = max(self.stage_max_ms.get(k, 0.0), v)
+        return {"stages_ms": dict(self.stages_ms), "turn_ms": total}
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "stage": self.stage, "turn": self.turn, "elapsed_s": round(self.elapsed(), 3),
+            "deadline_s": self.limit(self.stage), "deadlines_s": self.deadlines,
+            "bound_s": round(sum(self.deadlines.values()), 3), "worst_turn_ms": self.worst_turn_ms,
+            "turns_done": self.turns_done, "turn_mean_ms": round(self.total_turn_ms / max(1, self.turns_done), 1),
+            "stage_mean_ms": {k: round(v / self.turns_done, 1) for k, v in self.stage_total_ms.items()},
+            "stage_max_ms": dict(self.stage_max_ms),
+            "counts": dict(self.counts), "events": list(self.events),
+        }
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import re
+import time
+import zlib
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, Final
+
+_WORD: Final[re.Pattern[str]] = re.compile(r"\w+")
+MASK64: Final[int] = (1 << 64) - 1
+MAX_WORDS: Final[int] = 256
+
+
+def frame_hash(bgra: bytes, w: int, h: int) -> int:
+    if not bgra or w < 9 or h < 8:
+        return 0
+    mv: memoryview = memoryview(bgra)
+    bits: int = 0
+    for gy in range(8):
+        row: int = (gy * (h - 1) // 7) * w * 4
+        prev: int = -1
+        for gx in range(9):
+            o: int = row + (gx * (w - 1) // 8) * 4
+            v: int = mv[o] + 2 * mv[o + 1] + mv[o + 2]
+            if prev >= 0:
+                bits = (bits << 1) | (1 if v > prev else 0)
+            prev = v
+    return bits
+
+
+def text_hash(text: str) -> int:
+    acc: list[int] = [0] * 64
+    words: list[str] = _WORD.findall(text.lower())[-MAX_WORDS:]
+    for a, b in zip(words, words[1:] or [""]):
+        h: int = zlib.crc32(f"{a} {b}".encode("utf-8")) | (zlib.crc32(f"{b} {a}!".encode("utf-8")) << 32)
+        for i in range(64):
+            acc[i] += 1 if h >> i & 1 else -1
+    return sum(1 << i for i in range(64) if acc[i] > 0)
+
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & MASK64).bit_count()
+
+
+def action_key(actions: list[dict[str, Any]], grid: int = 25) -> str:
+    parts: list[str] = []
+    for a in actions:
+        b: Any = a.get("bbox_2d") or [0, 0, 0, 0]
+        cx: int = (int(b[0]) + int(b[2])) // 2 // grid
+        cy: int = (int(b[1]) + int(b[3])) // 2 // grid
+        parts.append(f"{a.get('type', '')}@{cx},{cy}:{a.get('params', '')}")
+    return "|".join(parts)
+
+
+@dataclass
+class Detection:
+    turn: int
+    repeats: int
+    action: str
+    frame_static: int
+    obs_similar: int
+    window_s: float
+    info: dict[str, Any] = field(default_factory=dict)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "turn": self.turn, "repeats": self.repeats, "action": self.action,
+            "frame_static": self.frame_static, "obs_similar": self.obs_similar,
+            "window_s": round(self.window_s, 2), **self.info,
+        }
+
+
+class StuckDetector:
+    def __init__(
+        self, window: int = 6, repeats: int = 4, frame_bits: int = 3, text_bits: int = 8, horizon: int = 20,
+    ) -> None:
+        self.window: int = max(2, window)
+        self.repeats: int = max(2, min(repeats, self.window))
+        self.frame_bits: int = frame_bits
+        self.text_bits: int = text_bits
+        self.horizon: int = horizon
+        self._keys: deque[str] = deque()
+        self._counts: Counter[str] = Counter()
+        self._times: deque[float] = deque()
+        self._frame: int | None = None
+        self._text: int | None = None
+        self.frame_static: int = 0
+        self.obs_similar: int = 0
+        self.active: Detection | None = None
+        self.recovered: Detection | None = None
+        self.detections: int = 0
+
+    def update(self, turn: int, actions: list[dict[str, Any]], frame: int, obs: str) -> Detection | None:
+        now: float = time.monotonic()
+        key: str = action_key(actions)
+        self._keys.append(key)
+        self._counts[key] += 1
+        self._times.append(now)
+        if len(self._keys) > self.window:
+            old: str = self._keys.popleft()
+            self._counts[old] -= 1
+            if not self._counts[old]:
+                del self._counts[old]
+            self._times.popleft()
+        same_frame: bool = self._frame is not None and hamming(frame, self._frame) <= self.frame_bits
+        self.frame_static = self.frame_static + 1 if same_frame else 0
+        self._frame = frame
+        th: int = text_hash(obs)
+        same_text: bool = self._text is not None and hamming(th, self._text) <= self.text_bits
+        self.obs_similar = self.obs_similar + 1 if same_text else 0
+        self._text = th
+        self.recovered = None
+        n: int = self._counts[key]
+        stuck: bool = bool(key) and n >= self.repeats and max(self.frame_static, self.obs_similar) >= self.repeats - 1
+        if not stuck:
+            if self.active is not None:
+                self.active.info["recovered_after"] = turn - self.active.turn
+                self.recovered, self.active = self.active, None
+            return None
+        if self.active is not None:
+            return None
+        self.detections += 1
+        per_turn: float = (self._times[-1] - self._times[0]) / max(1, len(self._times) - 1)
+        self.active = Detection(turn, n, key, self.frame_static, self.obs_similar, self._times[-1] - self._times[0])
+        self.active.info["turn_s"] = round(per_turn, 2)
+        return self.active
+
+    def savings(self, det: Detection, spent_turns: int) -> dict[str, Any]:
+        saved: int = max(0, self.horizon - spent_turns)
+        return {"saved_turns_est": saved, "saved_s_est": round(saved * float(det.info.get("turn_s", 0.0)), 1),
+                "horizon": self.horizon}
+
+    def reset(self) -> None:
+        self._keys.clear()
+        self._counts.clear()
+        self._times.clear()
+        self._frame = self._text = None
+        self.frame_static = self.obs_similar = 0
+        self.active = self.recovered = None
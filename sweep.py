@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Final
+
+HERE: Final[Path] = Path(__file__).resolve().parent
+FRANZ: Final[Path] = HERE / "franz.py"
+COLUMNS: Final[tuple[str, ...]] = (
+    "success_rate", "goal_turn", "turns", "wall_s", "turn_mean_ms", "vlm_ms", "capture_ms", "prompt_tokens",
+)
+
+
+def _value(s: str) -> Any:
+    try:
+        return json.loads(s)
+    except ValueError:
+        return s
+
+
+def parse_param(spec: str) -> tuple[str, Any]:
+    key, sep, rhs = spec.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"expected key=v1,v2 or key=lo..hi, got {spec!r}")
+    lo, dots, hi = rhs.partition("..")
+    if dots:
+        return key, {"min": _value(lo), "max": _value(hi)}
+    return key, [_value(v) for v in rhs.split(",")]
+
+
+def _sample(space: Any, rng: random.Random) -> Any:
+    if isinstance(space, list):
+        return rng.choice(space)
+    lo, hi = space["min"], space["max"]
+    if isinstance(lo, int) and isinstance(hi, int):
+        return rng.randint(lo, hi)
+    return round(rng.uniform(float(lo), float(hi)), 4)
+
+
+def points(params: dict[str, Any], samples: int, seed: int) -> list[dict[str, Any]]:
+    if samples <= 0:
+        ranged: list[str] = [k for k, v in params.items() if not isinstance(v, list)]
+        if ranged:
+            raise ValueError(f"ranges need random search (--random N): {', '.join(ranged)}")
+        keys: list[str] = list(params)
+        return [dict(zip(keys, combo)) for combo in itertools.product(*(params[k] for k in keys))]
+    rng: random.Random = random.Random(seed)
+    seen: set[str] = set()
+    out: list[dict[str, Any]] = []
+    for _ in range(samples * 20):
+        p: dict[str, Any] = {k: _sample(v, rng) for k, v in params.items()}
+        key: str = json.dumps(p, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            out.append(p)
+        if len(out) == samples:
+            break
+    return out
+
+
+def _overlay(base: dict[str, Any], params: dict[str, Any]) -> dict[str, Any]:
+    cfg: dict[str, Any] = json.loads(json.dumps(base))
+    for key, v in params.items():
+        *path, leaf = key.split(".")
+        d: dict[str, Any] = cfg
+        for part in path:
+            d = d.setdefault(part, {})
+        d[leaf] = v
+    return cfg
+
+
+def run_trial(idx: int, out: Path, cfg: dict[str, Any], max_turns: int, timeout: float) -> dict[str, Any]:
+    td: Path = out / f"trial_{idx:03d}"
+    td.mkdir(parents=True)
+    (td / "config.json").write_text(json.dumps(cfg, indent=2), "utf-8")
+    cmd: list[str] = [
+        sys.executable, str(FRANZ), "--headless", "--port", "0", "--config", str(td / "config.json"),
+        "--runs-dir", str(td), "--max-turns", str(max_turns),
+    ]
+    env: dict[str, str] = dict(os.environ, PYTHONHASHSEED="0")
+    t0: float = time.perf_counter()
+    with (td / "stderr.log").open("w", encoding="utf-8") as err:
+        try:
+            proc: subprocess.CompletedProcess[str] = subprocess.run(
+                cmd, cwd=str(HERE), stdout=subprocess.PIPE, stderr=err, text=True, timeout=timeout, env=env,
+            )
+        except subprocess.TimeoutExpired:
+            return {"error": f"timeout after {timeout:g}s", "elapsed_s": round(time.perf_counter() - t0, 3)}
+    lines: list[str] = [ln for ln in proc.stdout.splitlines() if ln.startswith("{")]
+    if proc.returncode or not lines:
+        return {"error": f"exit {proc.returncode}, see {td / 'stderr.log'}",
+                "elapsed_s": round(time.perf_counter() - t0, 3)}
+    summary: dict[str, Any] = json.loads(lines[-1])
+    summary["elapsed_s"] = round(time.perf_counter() - t0, 3)
+    return summary
+
+
+def metrics(s: dict[str, Any]) -> dict[str, Any]:
+    if "error" in s:
+        return {"error": s["error"]}
+    sim: dict[str, Any] = s.get("sim") or {}
+    stage: dict[str, Any] = s.get("stage_mean_ms") or {}
+    tokens: dict[str, Any] = s.get("tokens") or {}
+    return {
+        "success": bool(sim.get("success")), "goal_turn": sim.get("goal_turn"), "turns": s["turns"],
+        "wall_s": s["wall_s"], "turn_mean_ms": s["turn_mean_ms"], "worst_turn_ms": s["worst_turn_ms"],
+        "vlm_ms": stage.get("calling_vlm"), "capture_ms": stage.get("capturing"), "stage_mean_ms": stage,
+        "prompt_tokens": tokens.get("prompt_tokens", 0), "completion_tokens": tokens.get("completion_tokens", 0),
+        "vlm_failed": (s.get("mock_vlm") or {}).get("failed", 0),
+        "vlm_truncated": (s.get("mock_vlm") or {}).get("truncated", 0), "breaker_opens": s["breaker"]["opens"],
+        "watchdog": s.get("watchdog") or {}, "run_dir": s["run_dir"],
+    }
+
+
+def _mean(vals: list[Any]) -> float | None:
+    nums: list[float] = [float(v) for v in vals if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    return round(statistics.fmean(nums), 3) if nums else None
+
+
+def aggregate(params: dict[str, Any], runs: list[dict[str, Any]]) -> dict[str, Any]:
+    ok: list[dict[str, Any]] = [r for r in runs if "error" not in r]
+    row: dict[str, Any] = {"params": params, "runs": len(runs), "errors": len(runs) - len(ok),
+                           "success_rate": round(sum(r["success"] for r in ok) / len(runs), 3)}
+    for k in ("goal_turn", "turns", "wall_s", "turn_mean_ms", "worst_turn_ms", "vlm_ms", "capture_ms",
+              "prompt_tokens", "completion_tokens", "vlm_failed", "vlm_truncated", "breaker_opens"):
+        row[k] = _mean([r[k] for r in ok])
+    return row
+
+
+def _rank(row: dict[str, Any]) -> tuple[float, float, float]:
+    inf: float = float("inf")
+    return -row["success_rate"], row["goal_turn"] or inf, row["turn_mean_ms"] or inf
+
+
+def _next_dir(base: Path) -> Path:
+    base.mkdir(parents=True, exist_ok=True)
+    n: int = sum(1 for d in base.iterdir() if d.name.startswith("sweep_"))
+    while True:
+        n += 1
+        d: Path = base / f"sweep_{n:04d}"
+        try:
+            d.mkdir()
+            return d
+        except FileExistsError:
+            continue
+
+
+def _table(rows: list[dict[str, Any]], keys: list[str]) -> str:
+    head: list[str] = ["#", *keys, *COLUMNS]
+    body: list[list[str]] = [
+        [str(i + 1), *(str(r["params"].get(k)) for k in keys), *("-" if r[c] is None else str(r[c]) for c in COLUMNS)]
+        for i, r in enumerate(rows)
+    ]
+    widths: list[int] = [max(len(x) for x in col) for col in zip(head, *body)]
+    return "\n".join("  ".join(x.rjust(w) for x, w in zip(line, widths)) for line in (head, *body))
+
+
+def main() -> None:
+    ap: argparse.ArgumentParser = argparse.ArgumentParser(description="Parallel headless config sweep")
+    ap.add_argument("--param", "-p", action="append", type=parse_param, default=[],
+                    help="key=v1,v2 (grid or choice) or key=lo..hi (random only); dotted keys reach nested dicts")
+    ap.add_argument("--spec", type=Path, help='JSON {"params": {key: [..] | {"min", "max"}}, "base": {..}}')
+    ap.add_argument("--base", type=Path, help="JSON merged under every trial (e.g. sim_scenario, sim_vlm_miss)")
+    ap.add_argument("--random", type=int, default=0, metavar="N", help="random search with N points instead of a grid")
+    ap.add_argument("--seed", type=int, default=0, help="random search seed")
+    ap.add_argument("--repeats", type=int, default=1, help="runs per point, each with a different sim_seed")
+    ap.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1, help="parallel engine processes")
+    ap.add_argument("--max-turns", type=int, default=30)
+    ap.add_argument("--timeout", type=float, default=300.0, help="seconds before a trial is killed")
+    ap.add_argument("--out", type=Path, default=HERE / "sweeps", help="directory for sweep_NNNN folders")
+    a: argparse.Namespace = ap.parse_args()
+    spec: dict[str, Any] = json.loads(a.spec.read_text("utf-8")) if a.spec else {}
+    params: dict[str, Any] = {**spec.get("params", {}), **dict(a.param)}
+    base: dict[str, Any] = {**spec.get("base", {}), **(json.loads(a.base.read_text("utf-8")) if a.base else {})}
+    if not params:
+        ap.error("no parameters: use --param or --spec")
+    try:
+        grid: list[dict[str, Any]] = points(params, a.random, a.seed)
+    except ValueError as e:
+        ap.error(str(e))
+    out: Path = _next_dir(a.out)
+    seed0: int = int(base.get("sim_seed", 0))
+    trials: list[tuple[int, dict[str, Any]]] = [(i, {**p}) for i, p in enumerate(grid) for _ in range(a.repeats)]
+    jobs: int = max(1, min(a.jobs, len(trials)))
+    print(f"{len(grid)} points x {a.repeats} repeats = {len(trials)} trials, {jobs} parallel -> {out}", file=sys.stderr)
+    results: list[list[dict[str, Any]]] = [[] for _ in grid]
+    t0: float = time.perf_counter()
+    with ThreadPoolExecutor(jobs) as pool:
+        futs: dict[Any, tuple[int, int]] = {}
+        for idx, (pi, p) in enumerate(trials):
+            cfg: dict[str, Any] = _overlay({**base, "sim_seed": seed0 + idx % a.repeats}, p)
+            futs[pool.submit(run_trial, idx, out, cfg, a.max_turns, a.timeout)] = (idx, pi)
+        for fut in as_completed(futs):
+            idx, pi = futs[fut]
+            m: dict[str, Any] = metrics(fut.result())
+            m["trial"] = idx
+            results[pi].append(m)
+            state: str = m.get("error") or f"success={m['success']} turns={m['turns']} {m['turn_mean_ms']}ms/turn"
+            print(f"[{sum(map(len, results))}/{len(trials)}] trial_{idx:03d} {grid[pi]} {state}", file=sys.stderr)
+    rows: list[dict[str, Any]] = sorted((aggregate(p, r) for p, r in zip(grid, results)), key=_rank)
+    report: dict[str, Any] = {
+        "params": params, "base": base, "random": a.random, "seed": a.seed, "repeats": a.repeats,
+        "jobs": jobs, "max_turns": a.max_turns, "wall_s": round(time.perf_counter() - t0, 3), "ranking": rows,
+        "trials": [dict(m, params=p) for p, rs in zip(grid, results) for m in sorted(rs, key=lambda m: m["trial"])],
+    }
+    (out / "report.json").write_text(json.dumps(report, indent=2), "utf-8")
+    print(_table(rows, list(params)))
+    print(f"report: {out / 'report.json'} ({report['wall_s']}s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
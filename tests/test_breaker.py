@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+import breaker
+
+
+@pytest.mark.parametrize(
+    ("attempt", "lo", "hi"), [(0, 0.5, 1.0), (1, 0.5, 1.0), (2, 1.0, 2.0), (4, 4.0, 8.0), (9, 5.0, 10.0)],
+)
+def test_backoff_doubles_with_jitter_and_cap(attempt: int, lo: float, hi: float) -> None:
+    rng: random.Random = random.Random(attempt)
+    for _ in range(50):
+        assert lo <= breaker.backoff(attempt, 1.0, 10.0, rng) <= hi
+
+
+def test_opens_after_threshold_failures() -> None:
+    cb: breaker.CircuitBreaker = breaker.CircuitBreaker(3, 10.0)
+    for _ in range(2):
+        cb.failure(now=0.0)
+        assert cb.state == "closed" and cb.allow(now=0.0)
+    cb.failure(now=0.0)
+    assert cb.state == "open" and cb.opens == 1
+    assert not cb.allow(now=5.0)
+    assert cb.wait_s(now=5.0) == pytest.approx(5.0)
+
+
+def test_success_resets_the_failure_count() -> None:
+    cb: breaker.CircuitBreaker = breaker.CircuitBreaker(2, 10.0)
+    cb.failure(now=0.0)
+    cb.success()
+    cb.failure(now=0.0)
+    assert cb.state == "closed"
+
+
+def test_half_open_probe_closes_or_reopens_with_longer_cooldown() -> None:
+    cb: breaker.CircuitBreaker = breaker.CircuitBreaker(1, 10.0, 25.0)
+    cb.failure(now=0.0)
+    assert cb.allow(now=10.0) and cb.state == "half_open"
+    cb.failure(now=10.0)
+    assert cb.state == "open" and cb.cooldown == 20.0 and cb.opens == 2
+    assert not cb.allow(now=29.0) and cb.allow(now=30.0)
+    cb.failure(now=30.0)
+    assert cb.cooldown == 25.0
+    assert cb.allow(now=55.0)
+    cb.success()
+    assert cb.state == "closed" and cb.cooldown == 10.0 and cb.allow(now=55.0)
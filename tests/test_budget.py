@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import budget
+
+EST: budget.Estimator = budget.Estimator(4.0)
+
+
+def _narrative(n: int, head: str = "") -> str:
+    return head + " ".join(f"On turn {i} I clicked element {i} and the window changed to state {i}." for i in range(n))
+
+
+def test_one_line_narrative_is_trimmed_not_emptied() -> None:
+    text: str = _narrative(400)
+    out, steps = budget.compact(text, 1500, EST)
+    assert out and "over_budget" not in steps
+    assert EST.tokens(len(out)) <= 1500
+    assert "trim_sentences" in ",".join(steps)
+    assert out.endswith("state 399.")
+    assert "turn 0 " not in out
+
+
+def test_tiny_budget_cuts_characters() -> None:
+    out, steps = budget.compact(_narrative(50), 10, EST)
+    assert out.startswith(budget.ELLIPSIS) and out.endswith("state 49.")
+    assert EST.tokens(len(out)) <= 10
+    assert any(s.startswith("trim_chars") for s in steps)
+
+
+def test_inline_goal_narrative_is_compacted() -> None:
+    text: str = _narrative(400, "Goal: archive the quarterly report. ")
+    out, steps = budget.compact(text, 1500, EST)
+    assert out and "over_budget" not in steps
+    assert EST.tokens(len(out)) <= 1500
+
+
+def test_goal_line_is_kept_when_separate() -> None:
+    goal: str = "Goal: archive the quarterly report."
+    text: str = goal + "\n\n" + "\n".join(_narrative(1) .replace("0", str(i)) for i in range(400))
+    out, steps = budget.compact(text, 1500, EST)
+    assert out.startswith(goal + "\n")
+    assert "over_budget" not in steps and EST.tokens(len(out)) <= 1500
+
+
+def test_goal_heading_section_is_kept() -> None:
+    text: str = "# Goal\nArchive the report.\nThen empty the trash.\n\n# Notes\n" + _narrative(400)
+    out, _ = budget.compact(text, 1500, EST)
+    assert out.startswith("# Goal\nArchive the report.\nThen empty the trash.\n")
+
+
+def test_under_budget_is_untouched() -> None:
+    text: str = _narrative(3)
+    assert budget.compact(text, 1500, EST) == (text, [])
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import fanout
+
+
+def test_second_client_refused_until_ttl_expires() -> None:
+    lease: fanout.Lease = fanout.Lease(ttl=5.0)
+    assert lease.claim("a", now=0.0) and lease.current(now=1.0) == "a"
+    assert not lease.claim("b", now=4.9)
+    assert lease.claim("b", now=5.0) and lease.current(now=5.0) == "b"
+    assert lease.grants == 2
+
+
+def test_holder_renews_without_new_grant() -> None:
+    lease: fanout.Lease = fanout.Lease(ttl=5.0)
+    lease.claim("a", now=0.0)
+    assert lease.claim("a", now=4.0) and lease.expires == 9.0
+    assert not lease.claim("b", now=8.0)
+    assert lease.grants == 1
+
+
+def test_release_only_by_holder() -> None:
+    lease: fanout.Lease = fanout.Lease(ttl=5.0)
+    assert not lease.claim("", now=0.0)
+    lease.claim("a", now=0.0)
+    assert not lease.release("b") and not lease.release("")
+    assert lease.release("a") and lease.current(now=0.0) == ""
+    assert lease.claim("b", now=0.1)
+
+
+def test_broadcast_builds_once_per_key() -> None:
+    bc: fanout.Broadcast = fanout.Broadcast()
+    calls: list[int] = []
+
+    def build(version: int) -> bytes:
+        calls.append(version)
+        return f"v{version}".encode()
+
+    assert bc.get(1, build) == b"v1"
+    assert bc.get(1, build) == b"v1"
+    assert bc.get(2, build) == b"v2"
+    assert calls == [1, 2]
+    assert bc.as_dict() == {"version": 2, "builds": 2, "hits": 1, "bytes": 2}
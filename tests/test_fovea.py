@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+import franz
+import pipeline
+
+
+def _geo(out: tuple[int, int]) -> franz.Geometry:
+    return franz.Geometry(version=1, screen_w=1000, screen_h=500, crop=(0, 0, 1000, 500), out_w=out[0], out_h=out[1])
+
+
+@pytest.fixture
+def fovea(monkeypatch: pytest.MonkeyPatch) -> dict[str, Any]:
+    conf: dict[str, Any] = {"fovea_crops": 3, "fovea_pad": 0.0, "fovea_crop_px": 448}
+    monkeypatch.setattr(franz, "_CFG", conf)
+    monkeypatch.setattr(franz, "S", franz.State(), raising=False)
+    monkeypatch.setattr(franz, "FOVEA_SRC", (bytes(1000 * 500 * 4), 1000, 500))
+    return conf
+
+
+def _regions(*boxes: list[int]) -> list[dict[str, Any]]:
+    return [{"bbox_2d": b, "label": f"r{i}", "source": "zoom"} for i, b in enumerate(boxes)]
+
+
+@pytest.mark.parametrize("budget", [120_000, 200_000, 400_000])
+def test_crops_plus_overview_fit_the_pixel_budget(fovea: dict[str, Any], budget: int) -> None:
+    fovea["fovea_pixel_budget"] = budget
+    geo: franz.Geometry = _geo((224, 112))
+    crops: list[dict[str, Any]] = franz._fovea_crops(_regions([0, 0, 500, 500], [500, 0, 1000, 1000], [100, 600, 400, 900]), geo)
+    assert crops
+    assert sum(c["w"] * c["h"] for c in crops) + geo.out_w * geo.out_h <= budget
+    for c in crops:
+        assert len(c["frame"].bgra) == c["w"] * c["h"] * 4 and c["frame"].b64
+
+
+def test_crops_keep_native_size_under_a_loose_budget(fovea: dict[str, Any]) -> None:
+    fovea["fovea_pixel_budget"] = 10_000_000
+    crops: list[dict[str, Any]] = franz._fovea_crops(_regions([100, 100, 300, 300]), _geo((224, 112)))
+    assert [(c["w"], c["h"], c["scale"]) for c in crops] == [(200, 100, 1.0)]
+
+
+def test_source_frame_is_consumed_once(fovea: dict[str, Any]) -> None:
+    assert franz._fovea_crops(_regions([100, 100, 300, 300]), _geo((224, 112)))
+    assert franz.FOVEA_SRC is None
+    assert franz._fovea_crops(_regions([100, 100, 300, 300]), _geo((224, 112))) == []
+
+
+def test_regions_prefer_zoom_then_fresh_ghosts_without_overlap(fovea: dict[str, Any]) -> None:
+    franz.S.ghosts_overlay = [
+        {"bbox_2d": [600, 600, 700, 700], "label": "old", "age": 5},
+        {"bbox_2d": [0, 0, 100, 100], "label": "dup", "age": 0},
+        {"bbox_2d": [300, 300, 400, 400], "label": "new", "age": 1},
+    ]
+    result: pipeline.PipelineResult = pipeline.PipelineResult(zoom=[{"bbox_2d": [0, 0, 100, 100], "label": "z"}])
+    assert [(r["label"], r["source"]) for r in franz._fovea_regions(result)] == [("z", "zoom"), ("new", "ghost"), ("old", "ghost")]
+    fovea["fovea_crops"] = 1
+    assert [r["label"] for r in franz._fovea_regions(result)] == ["z"]
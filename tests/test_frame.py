@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import base64
+import threading
+
+import encodepool
+
+
+def _bgra(w: int, h: int, seed: int = 0) -> bytes:
+    return bytes((x * 7 + seed) & 0xFF for x in range(w * h * 4))
+
+
+def test_b64_encodes_only_once() -> None:
+    f: encodepool.Frame = encodepool.Frame(_bgra(8, 4), 8, 4)
+    first: str = f.b64
+    assert f.b64 == first and f.b64_bytes == first.encode("ascii") and f.png
+    assert f.encodes == 1
+    assert base64.b64decode(first) == encodepool.png_bgra(f.bgra, 8, 4)
+
+
+def test_concurrent_readers_share_one_encode() -> None:
+    f: encodepool.Frame = encodepool.Frame(_bgra(64, 64), 64, 64, encodepool.EncodePool("inline"))
+    threads: list[threading.Thread] = [threading.Thread(target=lambda: f.b64) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert f.encodes == 1
+
+
+def test_from_b64_decodes_png_without_encoding() -> None:
+    src: encodepool.Frame = encodepool.Frame(_bgra(4, 4), 4, 4)
+    f: encodepool.Frame = encodepool.Frame.from_b64(src.b64)
+    assert f and f.png == src.png and f.encodes == 0 and f.digest
+    assert not encodepool.Frame() and encodepool.Frame().b64 == "" and encodepool.Frame().digest == ""
+
+
+def test_memo_runs_each_key_once() -> None:
+    f: encodepool.Frame = encodepool.Frame(_bgra(2, 2), 2, 2)
+    calls: list[str] = []
+    for _ in range(3):
+        f.memo("k", lambda fr: calls.append("k") or len(fr.bgra))
+    assert calls == ["k"] and f.memo("k", lambda fr: -1) == 16
+
+
+def test_adopt_reuses_encodings_of_identical_pixels() -> None:
+    prev: encodepool.Frame = encodepool.Frame(_bgra(8, 8), 8, 8)
+    prev.b64
+    prev.memo("dhash", lambda fr: 42)
+    same: encodepool.Frame = encodepool.Frame(_bgra(8, 8), 8, 8)
+    assert same.adopt(prev) and same.reused
+    assert same.b64 == prev.b64 and same.encodes == 0 and same.memo("dhash", lambda fr: 0) == 42
+    other: encodepool.Frame = encodepool.Frame(_bgra(8, 8, seed=1), 8, 8)
+    assert not other.adopt(prev) and not other.adopt(None) and not other.adopt(other)
+    assert not encodepool.Frame(_bgra(4, 16), 4, 16).adopt(prev)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+import framering
+
+SIZE: int = 64 * 48 * 4
+
+
+def _px(v: int) -> bytes:
+    return bytes([v]) * SIZE
+
+
+@pytest.fixture()
+def rings(tmp_path: Path) -> Iterator[tuple[framering.FrameRing, framering.FrameRing]]:
+    w: framering.FrameRing = framering.FrameRing(tmp_path / "frames.ring", 2, SIZE)
+    w.put(1, _px(1), 64, 48)
+    w.put(2, _px(2), 64, 48)
+    r: framering.FrameRing = framering.FrameRing.open(tmp_path / "frames.ring")
+    yield w, r
+    r.close()
+    w.close()
+
+
+def test_reader_sees_frames_written_by_another_mapping(
+    rings: tuple[framering.FrameRing, framering.FrameRing],
+) -> None:
+    w, r = rings
+    got: tuple[bytes, framering.Slot] | None = r.read(2, verify=True)
+    assert got is not None and got[0] == _px(2) and got[1].turn == 2
+    w.put(3, _px(3), 64, 48)
+    assert [s.turn for s in r] == [2, 3]
+    assert r.read(1) is None
+
+
+def test_slot_being_written_is_invisible(rings: tuple[framering.FrameRing, framering.FrameRing]) -> None:
+    w, r = rings
+    s: framering.Slot | None = r.find(1)
+    assert s is not None
+    framering.META.pack_into(w._mm, framering.HEAD.size + s.index * framering.META_SIZE,
+                             -1, s.seq + 1, 0, 0, 0, 0, 0, 0.0)
+    assert r.slot(s.index) is None
+    assert r.read(1) is None
+
+
+def test_read_retries_when_the_slot_is_overwritten_mid_copy(
+    rings: tuple[framering.FrameRing, framering.FrameRing], monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    w, r = rings
+    view = r.view
+    calls: list[int] = []
+
+    def racing_view(s: framering.Slot) -> memoryview:
+        if not calls:
+            w.put(3, _px(3), 64, 48)
+        calls.append(s.turn)
+        return view(s)
+
+    monkeypatch.setattr(r, "view", racing_view)
+    assert r.read(1) is None
+    assert calls == [1]
+    got: tuple[bytes, framering.Slot] | None = r.read(2)
+    assert got is not None and got[0] == _px(2)
+
+
+def test_oversized_frame_is_dropped(rings: tuple[framering.FrameRing, framering.FrameRing]) -> None:
+    w, _ = rings
+    assert w.put(9, b"x" * (w.slot_bytes + 1), 1, 1) == -1
+    assert w.dropped == 1 and w.find(9) is None
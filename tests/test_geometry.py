@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+import franz
+
+
+def _geo(crop: tuple[int, int, int, int], out: tuple[int, int] = (500, 250)) -> franz.Geometry:
+    return franz.Geometry(version=1, screen_w=3000, screen_h=2000, crop=crop, out_w=out[0], out_h=out[1])
+
+
+@pytest.mark.parametrize("crop", [(0, 0, 1920, 1080), (100, 50, 2600, 1900)])
+def test_norm_round_trips_on_large_crops(crop: tuple[int, int, int, int]) -> None:
+    g: franz.Geometry = _geo(crop)
+    for n in range(0, franz.NORM + 1, 7):
+        assert g.s2n(*g.n2s(n, n)) == (n, n)
+
+
+def test_screen_round_trips_on_small_crops() -> None:
+    g: franz.Geometry = _geo((10, 20, 310, 220))
+    for px in range(10, 310):
+        assert g.n2s(*g.s2n(px, 20))[0] == px
+    assert g.n2s(0, 0) == (10, 20) and g.n2s(franz.NORM, franz.NORM) == (309, 219)
+
+
+def test_degenerate_crop_maps_to_origin() -> None:
+    g: franz.Geometry = _geo((40, 40, 40, 41))
+    assert g.n2s(500, 500) == (40, 40) and g.s2n(99, 99) == (0, 0)
+
+
+def test_bboxes_to_img_scales_and_clamps() -> None:
+    g: franz.Geometry = _geo((0, 0, 100, 100))
+    assert g.bboxes_to_img([[0, 0, 1000, 1000], [500, 200, 1200, 600]]) == [(0, 0, 500, 250), (250, 50, 500, 150)]
+
+
+def test_with_output_reuses_or_copies() -> None:
+    g: franz.Geometry = _geo((0, 0, 100, 100))
+    assert g.with_output(500, 250) is g
+    h: franz.Geometry = g.with_output(64, 32)
+    assert (h.out_w, h.out_h, h.crop) == (64, 32, g.crop) and (g.out_w, g.out_h) == (500, 250)
+
+
+def test_geometry_rebuilds_only_on_config_change(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(franz, "SIM", SimpleNamespace(w=2000, h=1000))
+    monkeypatch.setattr(franz, "_CFG", {})
+    monkeypatch.setattr(franz, "_CFG_VER", 0)
+    monkeypatch.setattr(franz, "_GEO", None)
+    g: franz.Geometry = franz.geometry()
+    assert franz.geometry() is g and g.crop == (0, 0, 2000, 1000)
+    franz._set_config({"capture_crop": {"x1": 0, "y1": 0, "x2": 500, "y2": 1000}})
+    h: franz.Geometry = franz.geometry()
+    assert h is not g and h.version == g.version + 1 and h.crop == (0, 0, 1000, 1000)
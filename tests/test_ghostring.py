@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import pytest
+
+import ghostring
+
+
+def _ghost(bbox: list[int], label: str = "", turn: int = 0) -> ghostring.Ghost:
+    return ghostring.Ghost(bbox_2d=bbox, turn=turn, image_b64="", label=label, first_turn=turn)
+
+
+def test_iou_handles_overlap_disjoint_and_swapped_corners() -> None:
+    assert ghostring.iou([0, 0, 100, 100], [0, 0, 100, 100]) == 1.0
+    assert ghostring.iou([0, 0, 100, 100], [50, 0, 150, 100]) == pytest.approx(1 / 3)
+    assert ghostring.iou([0, 0, 100, 100], [100, 0, 200, 100]) == 0.0
+    assert ghostring.iou([100, 100, 0, 0], [0, 0, 100, 100]) == 1.0
+    assert ghostring.iou([5, 5, 5, 5], [5, 5, 5, 5]) == 0.0
+
+
+def test_same_label_treats_blank_as_wildcard() -> None:
+    assert ghostring.same_label(" OK ", "ok")
+    assert ghostring.same_label("", "cancel")
+    assert not ghostring.same_label("ok", "cancel")
+
+
+def test_nms_keeps_first_of_each_overlapping_group() -> None:
+    regions: list[dict] = [
+        {"bbox_2d": [0, 0, 100, 100], "n": 0},
+        {"bbox_2d": [5, 5, 105, 105], "n": 1},
+        {"bbox_2d": [300, 300, 400, 400], "n": 2},
+    ]
+    assert [r["n"] for r in ghostring.nms(regions, 0.5)] == [0, 2]
+    assert [r["n"] for r in ghostring.nms(regions, 0.95)] == [0, 1, 2]
+
+
+def test_grid_candidates_follow_insert_and_remove() -> None:
+    grid: ghostring.GridIndex = ghostring.GridIndex(100)
+    grid.insert(1, [10, 10, 90, 90])
+    grid.insert(2, [150, 150, 350, 250])
+    assert grid.candidates([0, 0, 50, 50]) == {1}
+    assert grid.candidates([300, 200, 310, 210]) == {2}
+    assert grid.candidates([600, 600, 700, 700]) == set()
+    grid.remove(2)
+    grid.remove(99)
+    assert grid.candidates([300, 200, 310, 210]) == set() and not any(2 in s for s in grid._cells.values())
+
+
+def test_grid_clamps_out_of_range_boxes() -> None:
+    grid: ghostring.GridIndex = ghostring.GridIndex(125)
+    grid.insert(1, [-50, -50, 1200, 1200])
+    assert grid.candidates([990, 990, 1000, 1000]) == {1}
+
+
+def test_match_picks_best_iou_with_compatible_label() -> None:
+    ring: ghostring.GhostRing = ghostring.GhostRing()
+    a: int = ring.add(_ghost([0, 0, 100, 100], "ok"))
+    b: int = ring.add(_ghost([10, 0, 110, 100], "cancel"))
+    assert ring.match([10, 0, 110, 100], "ok", 0.5) == a
+    assert ring.match([10, 0, 110, 100], "", 0.5) == b
+    assert ring.match([500, 500, 600, 600], "", 0.1) is None
+
+
+def test_touch_refreshes_lru_order_before_eviction() -> None:
+    ring: ghostring.GhostRing = ghostring.GhostRing()
+    keys: list[int] = [ring.add(_ghost([i * 100, 0, i * 100 + 50, 50])) for i in range(3)]
+    g: ghostring.Ghost = ring.touch(keys[0], turn=5)
+    assert (g.turn, g.hits) == (5, 2)
+    assert ring.evict(2) == 1
+    assert [x.gid for x in ring] == [keys[2], keys[0]]
+    assert ring.match([100, 0, 150, 50], "", 0.5) is None
+
+
+def test_clear_drops_ghosts_and_index() -> None:
+    ring: ghostring.GhostRing = ghostring.GhostRing()
+    ring.add(_ghost([0, 0, 100, 100]))
+    ring.clear()
+    assert len(ring) == 0 and ring.match([0, 0, 100, 100], "", 0.1) is None
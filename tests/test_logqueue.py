@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+
+import pytest
+
+import logqueue
+
+
+def _record(level: int, msg: str = "same template") -> logging.LogRecord:
+    return logging.LogRecord("t", level, __file__, 1, msg, None, None)
+
+
+def test_only_debug_is_rate_limited() -> None:
+    f: logqueue.RateLimitFilter = logqueue.RateLimitFilter(0.001, 2)
+    assert all(f.filter(_record(logging.INFO)) for _ in range(50))
+    assert [f.filter(_record(logging.DEBUG)) for _ in range(4)] == [True, True, False, False]
+    assert f.suppressed == 2
+
+
+def test_stop_is_idempotent() -> None:
+    root: logging.Logger = logging.getLogger()
+    saved: list[logging.Handler] = root.handlers[:]
+    level: int = root.level
+    try:
+        lq: logqueue.LogQueue = logqueue.start(logging.INFO, None, lambda: (0, ""))
+        lq.stop()
+        lq.stop()
+        assert lq.stopped
+    finally:
+        root.handlers[:] = saved
+        root.setLevel(level)
+
+
+def test_full_queue_drops_info_but_spills_warnings(capsys: pytest.CaptureFixture[str]) -> None:
+    q: queue.Queue[logging.LogRecord] = queue.Queue(1)
+    h: logqueue.DroppingQueueHandler = logqueue.DroppingQueueHandler(q, block_s=0.01)
+    h.handle(_record(logging.INFO, "first"))
+    h.handle(_record(logging.INFO, "lost"))
+    h.handle(_record(logging.ERROR, "kept"))
+    assert (h.dropped, h.spilled, q.qsize()) == (1, 1, 1)
+    err: str = capsys.readouterr().err
+    assert "[ERROR] kept" in err and "lost" not in err
+
+
+def test_warning_waits_for_room() -> None:
+    q: queue.Queue[logging.LogRecord] = queue.Queue(1)
+    h: logqueue.DroppingQueueHandler = logqueue.DroppingQueueHandler(q, block_s=5.0)
+    h.handle(_record(logging.INFO, "first"))
+    threading.Timer(0.05, q.get_nowait).start()
+    h.handle(_record(logging.WARNING, "late"))
+    assert (h.dropped, h.spilled) == (0, 0) and q.get_nowait().getMessage() == "late"
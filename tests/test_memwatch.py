@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import memwatch
+
+MB: int = memwatch.MB
+
+
+def test_relieved_needs_rss_below_80_percent_of_budget(tmp_path: Path) -> None:
+    m: memwatch.MemoryWatch = memwatch.MemoryWatch(tmp_path, budget_mb=100)
+    assert m.relieved(79 * MB)
+    assert not m.relieved(80 * MB)
+    assert not m.relieved(95 * MB)
+    assert not memwatch.MemoryWatch(tmp_path).relieved(1)
+
+
+def test_sample_flags_over_budget_and_sorts_holders(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    rss: list[int] = [50 * MB]
+    monkeypatch.setattr(memwatch, "rss_bytes", lambda: rss[0])
+    m: memwatch.MemoryWatch = memwatch.MemoryWatch(tmp_path, budget_mb=64)
+    out: dict[str, Any] = m.sample(1, {"small": MB, "big": 8 * MB})
+    assert not out["over_budget"] and list(out["holders_mb"]) == ["big", "small"]
+    rss[0] = 70 * MB
+    assert m.sample(2, {})["over_budget"] and m.degraded == 1
+    rss[0] = 40 * MB
+    assert m.sample(3, {})["peak_mb"] == 70.0
+
+
+def test_rss_bytes_is_positive() -> None:
+    assert memwatch.rss_bytes() > MB
+
+
+def test_snapshot_starts_tracing_then_writes_a_diff(tmp_path: Path) -> None:
+    if tracemalloc.is_tracing():
+        pytest.skip("tracemalloc already running")
+    m: memwatch.MemoryWatch = memwatch.MemoryWatch(tmp_path, snapshot_every=1)
+    try:
+        assert m.snapshot(1) == {"started": True, "frames": 1}
+        m.snapshot(2)
+        keep: list[bytes] = [bytes(1024) for _ in range(200)]
+        out: dict[str, Any] = m.snapshot(3)
+        assert keep and out["file"] == "memory_turn_0003.txt"
+        assert "## diff vs turn 2" in (tmp_path / out["file"]).read_text("utf-8")
+    finally:
+        m.stop()
+    assert not tracemalloc.is_tracing()
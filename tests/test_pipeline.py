@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+import pipeline
+import pipeline_batch
+
+CORPUS: list[tuple[str, list[str], str, int]] = [
+    ('{"observation": "ok", "actions": [{"type": "click", "bbox_2d": [1, 2, 3, 4]}]}', [], "ok", 1),
+    ('```json\n{"observation": "ok", "actions": []}\n```', ["code_fence"], "ok", 0),
+    ('Here you go: {"observation": "ok", "actions": []} hope that helps', ["leading_text", "trailing_text"], "ok", 0),
+    ("{'observation': 'it\\'s ok', 'actions': []}", ["single_quotes"], "it's ok", 0),
+    ('{"observation": "ok", "actions": [{"type": "click", "bbox_2d": [1, 2, 3, 4]},],}', ["trailing_comma"], "ok", 1),
+    ('{"observation": "ok", "done": True, "x": None, "actions": []}', ["python_literals"], "ok", 0),
+    (
+        '{"observation": "ok", "actions": [{"type": "click", "bbox_2d": [1, 2, 3, 4]}, {"type": "type", "te',
+        ["truncated", "cut_incomplete"], "ok", 1,
+    ),
+    ('{"observation": "I clicked the but', ["truncated", "closed_string"], "I clicked the but", 0),
+    ("I cannot help with that.", ["no_object"], "I cannot help with that.", 0),
+    ("[1, 2, 3]", ["not_object"], "[1, 2, 3]", 0),
+]
+
+
+@pytest.mark.parametrize(("raw", "repair", "next_turn", "n_actions"), CORPUS)
+def test_repair_corpus(raw: str, repair: list[str], next_turn: str, n_actions: int) -> None:
+    r: pipeline.PipelineResult = pipeline.process(raw)
+    assert r.repair == repair
+    assert r.next_turn == next_turn
+    assert len(r.actions) == n_actions
+
+
+def test_corpus_report() -> None:
+    rep: dict[str, object] = pipeline_batch.corpus_report([raw for raw, *_ in CORPUS])
+    assert (rep["turns"], rep["strict_ok"], rep["recovered"], rep["failed"]) == (10, 1, 7, 2)
+
+
+def test_iter_corpus_reads_recorded_runs_and_warns_on_missing_vlm_raw(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str],
+) -> None:
+    rd: Path = tmp_path / "runs" / "run_0001"
+    rd.mkdir(parents=True)
+    recs: list[dict[str, object]] = [
+        {"turn": 1, "stage": "raw", "observation": "old", "actions": [], "raw_png": "turn_0001_raw.png"},
+        {"turn": 1, "stage": "ann", "annotated": True, "ann_png": "turn_0001_ann.png"},
+        {"turn": 2, "stage": "raw", "observation": "ok", "vlm_raw": CORPUS[1][0], "raw_png": "turn_0002_raw.png"},
+        {"turn": 3, "stage": "raw", "observation": "ok", "vlm_raw": CORPUS[6][0], "raw_png": "turn_0003_raw.png"},
+    ]
+    (rd / "turns.jsonl").write_text("".join(json.dumps(r) + "\n" for r in recs), "utf-8")
+    items: list[pipeline_batch.Item] = list(pipeline_batch.iter_corpus([str(tmp_path / "runs")]))
+    assert [(run, turn) for run, turn, _ in items] == [("run_0001", 2), ("run_0001", 3)]
+    assert "1 turn record(s) without vlm_raw" in capsys.readouterr().err
+    rep: dict[str, object] = pipeline_batch.corpus_report([raw for *_, raw in items])
+    assert (rep["turns"], rep["recovered"], rep["failed"]) == (2, 2, 0)
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Final
+
+import pytest
+
+import pipeline_host
+
+GOOD: Final[str] = "import types\n\ndef process(raw):\n    return types.SimpleNamespace(next_turn=raw.upper())\n"
+BROKEN: Final[str] = "def process(raw):\n    raise ValueError('boom')\n"
+HANGS: Final[str] = "import time\n\ndef process(raw):\n    time.sleep(30)\n"
+
+
+@pytest.fixture
+def host(tmp_path: Path) -> Iterator[pipeline_host.PipelineHost]:
+    path: Path = tmp_path / "pipeline.py"
+    path.write_text(GOOD, "utf-8")
+    h: pipeline_host.PipelineHost = pipeline_host.PipelineHost(path, timeout=1.0)
+    yield h
+    h.close()
+
+
+def test_fallback_keeps_raw_text() -> None:
+    r = pipeline_host._fallback("  hello \n")
+    assert r.next_turn == "hello"
+    assert r.raw_display == {"observation": "hello", "regions": [], "actions": []}
+
+
+def test_to_result_drops_unknown_fields() -> None:
+    r = pipeline_host._to_result({"next_turn": "x", "bogus": 1})
+    assert r.next_turn == "x" and not hasattr(r, "bogus")
+
+
+def test_process_runs_current_version(host: pipeline_host.PipelineHost) -> None:
+    r, info = host.process("abc")
+    assert r.next_turn == "ABC"
+    assert info["fallback"] is None and info["version"] == host.digest[:12]
+    assert host.last_good == host.digest
+
+
+def test_broken_version_falls_back_to_last_good(host: pipeline_host.PipelineHost) -> None:
+    host.process("warm")
+    good: str = host.digest
+    host.path.write_text(BROKEN, "utf-8")
+    r, info = host.process("abc")
+    assert r.next_turn == "ABC"
+    assert info["version"] == good[:12] and info["fallback"].startswith("last_good")
+    assert host.digest in host.bad
+
+
+def test_reload_reports_load_errors(host: pipeline_host.PipelineHost) -> None:
+    reply: dict = host.reload("def nope(:\n")
+    assert not reply["ok"] and "SyntaxError" in reply["err"]
+    assert host.digest in host.bad
+
+
+def test_hung_worker_is_killed_and_respawned(host: pipeline_host.PipelineHost) -> None:
+    host.process("warm")
+    pid: int = host._proc.pid
+    host.timeout = 0.5
+    host.path.write_text(HANGS, "utf-8")
+    r, info = host.process("abc")
+    assert host._proc.pid != pid
+    assert r.next_turn == "ABC" and info["fallback"].startswith("last_good")
+
+
+def test_raw_fallback_without_a_good_version(tmp_path: Path) -> None:
+    path: Path = tmp_path / "pipeline.py"
+    path.write_text(BROKEN, "utf-8")
+    h: pipeline_host.PipelineHost = pipeline_host.PipelineHost(path, timeout=1.0)
+    try:
+        r, info = h.process(" raw ")
+    finally:
+        h.close()
+    assert r.next_turn == "raw" and info["fallback"].startswith("raw: ValueError")
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import runindex
+
+OBS: tuple[str, ...] = (
+    "Opened notes.txt in the editor",
+    "The dialog says don't save",
+    "login dialog is open",
+    "clicked NEAR the login button",
+)
+
+
+@pytest.fixture()
+def db(tmp_path: Path) -> sqlite3.Connection:
+    conn: sqlite3.Connection = runindex.connect(tmp_path / runindex.INDEX_NAME)
+    fts: bool = runindex._has_fts(conn)
+    for i, obs in enumerate(OBS):
+        runindex._insert(conn, "run_0001", {"turn": i + 1, "stage": "vlm", "observation": obs}, fts)
+    return conn
+
+
+def _turns(db: sqlite3.Connection, text: str, **kw: Any) -> list[int]:
+    return [r["turn"] for r in runindex.query(db, text, **kw)]
+
+
+def test_fts_terms_quotes_each_word() -> None:
+    assert runindex.fts_terms('say "hi"  now') == '"say" """hi""" "now"'
+
+
+@pytest.mark.parametrize("text", ["notes.txt", "don't", '"unbalanced', "AND", "a:b", "(x", "*"])
+def test_user_text_never_raises(db: sqlite3.Connection, text: str) -> None:
+    runindex.query(db, text)
+
+
+def test_words_match_literally(db: sqlite3.Connection) -> None:
+    assert _turns(db, "notes.txt") == [1]
+    assert _turns(db, "don't") == [2]
+    assert _turns(db, "login dialog") == [3]
+    assert _turns(db, "NEAR login") == [4]
+
+
+def test_raw_fts_opt_in(db: sqlite3.Connection) -> None:
+    if not runindex._has_fts(db):
+        pytest.skip("SQLite built without FTS5")
+    assert _turns(db, "login OR editor", raw_fts=True) == [1, 3, 4]
+    with pytest.raises(sqlite3.OperationalError):
+        runindex.query(db, "notes.txt", raw_fts=True)
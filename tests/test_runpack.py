@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+import runpack
+
+
+def _rgba(w: int, h: int, seed: int) -> bytearray:
+    return bytearray((i * 7 + seed) & 0xFF for i in range(w * h * 4))
+
+
+def test_pack_is_indexed_without_close(tmp_path: Path) -> None:
+    path: Path = tmp_path / runpack.PACK_NAME
+    w: runpack.PackWriter = runpack.PackWriter(path, index_every=1)
+    for turn in range(1, 4):
+        w.png(turn, "raw", b"png%d" % turn)
+        w.record({"turn": turn, "stage": "raw"})
+    r: runpack.PackReader = runpack.PackReader(path)
+    assert r.indexed and r.turns() == [1, 2, 3]
+    assert r.get(2, runpack.RAW) == b"png2"
+    assert [x["turn"] for x in r.records()] == [1, 2, 3]
+    r.close()
+    w._f.close()
+
+
+def test_png_after_index_drops_the_footer(tmp_path: Path) -> None:
+    path: Path = tmp_path / runpack.PACK_NAME
+    w: runpack.PackWriter = runpack.PackWriter(path, index_every=1)
+    w.record({"turn": 1})
+    w.png(2, "raw", b"x" * 3)
+    w._f.close()
+    r: runpack.PackReader = runpack.PackReader(path)
+    assert not r.indexed and r.turns() == [1, 2]
+    r.close()
+
+
+def test_reopen_and_out_of_order_turns(tmp_path: Path) -> None:
+    path: Path = tmp_path / runpack.PACK_NAME
+    w: runpack.PackWriter = runpack.PackWriter(path, index_every=1)
+    w.record({"turn": 5})
+    w.record({"turn": 6})
+    w._f.close()
+    w = runpack.PackWriter(path)
+    w.record({"turn": 2})
+    w.record({"turn": 6, "n": 2})
+    w.close()
+    w.close()
+    r: runpack.PackReader = runpack.PackReader(path)
+    assert r.indexed and r.turns() == [2, 5, 6]
+    assert r.turn_records(6) == [{"turn": 6}, {"turn": 6, "n": 2}]
+    r.close()
+
+
+def test_index_every_n_records(tmp_path: Path) -> None:
+    path: Path = tmp_path / runpack.PACK_NAME
+    w: runpack.PackWriter = runpack.PackWriter(path, index_every=3)
+    indexed: list[bool] = []
+    for turn in range(1, 7):
+        w.record({"turn": turn})
+        r: runpack.PackReader = runpack.PackReader(path)
+        indexed.append(r.indexed)
+        assert len(list(r.records())) == turn
+        r.close()
+    assert indexed == [False, False, True, False, False, True]
+    w.close()
+
+
+def test_default_indexes_only_on_close(tmp_path: Path) -> None:
+    path: Path = tmp_path / runpack.PACK_NAME
+    w: runpack.PackWriter = runpack.PackWriter(path)
+    for turn in range(1, 50):
+        w.record({"turn": turn})
+    r: runpack.PackReader = runpack.PackReader(path)
+    assert not r.indexed and len(r.entries) == 49
+    r.close()
+    w.close()
+    r = runpack.PackReader(path)
+    assert r.indexed
+    r.close()
+
+
+def test_delta_round_trip() -> None:
+    base: bytearray = _rgba(16, 8, 0)
+    ann: bytearray = bytearray(base)
+    ann[4 * 16 * 3 + 8:4 * 16 * 3 + 16] = b"\x01\x02\x03\xff" * 2
+    raw_png: bytes = runpack.png_encode(base, 16, 8)
+    delta: bytes | None = runpack.make_delta(raw_png, runpack.png_encode(ann, 16, 8))
+    assert delta is not None
+    _, _, d = runpack.png_decode(delta)
+    assert sum(1 for i in range(3, len(d), 4) if d[i]) == 2
+    assert runpack.png_decode(runpack.apply_delta(raw_png, delta))[2] == ann
+
+
+def test_index_after_interval(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    now: list[float] = [100.0]
+    monkeypatch.setattr(runpack.time, "monotonic", lambda: now[0])
+    path: Path = tmp_path / runpack.PACK_NAME
+    w: runpack.PackWriter = runpack.PackWriter(path, index_s=60.0)
+    w.record({"turn": 1})
+    now[0] += 61.0
+    w.record({"turn": 2})
+    r: runpack.PackReader = runpack.PackReader(path)
+    assert r.indexed and r.turns() == [1, 2]
+    r.close()
+    w.close()
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import marshal
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import sampleprof
+
+
+def _busy_turns(turn: list[int], stop: threading.Event) -> None:
+    while not stop.is_set():
+        end: float = time.perf_counter() + 0.02
+        while time.perf_counter() < end:
+            sum(range(200))
+        turn[0] += 1
+
+
+def test_stops_itself_after_n_turns(tmp_path: Path) -> None:
+    turn: list[int] = [0]
+    stop: threading.Event = threading.Event()
+    worker: threading.Thread = threading.Thread(target=_busy_turns, args=(turn, stop), name="engine")
+    done: list[sampleprof.SampleProfiler] = []
+    p: sampleprof.SampleProfiler = sampleprof.SampleProfiler(0.001)
+    worker.start()
+    try:
+        last: int = turn[0] + 3
+        p.start(lambda: turn[0] > last, done.append)
+        p._thread.join(5.0)
+        assert not p.running and done == [p]
+        assert last < turn[0] <= last + 2
+    finally:
+        stop.set()
+        worker.join()
+    assert p.samples > 0 and p.wall_s > 0
+    top: dict[str, Any] = p.top()
+    assert "engine" in top["threads"]
+    assert any("_busy_turns" in r["func"] for r in top["top_cum"])
+    files: dict[str, str] = p.write(tmp_path / "profile")
+    assert any(fn[2] == "_busy_turns" for fn in marshal.loads((tmp_path / files["pstats"]).read_bytes()))
+    assert (tmp_path / files["collapsed"]).read_text("utf-8").startswith("engine;")
+
+
+def test_idle_threads_are_not_sampled() -> None:
+    ev: threading.Event = threading.Event()
+    waiter: threading.Thread = threading.Thread(target=ev.wait, name="idle")
+    waiter.start()
+    p: sampleprof.SampleProfiler = sampleprof.SampleProfiler(0.001)
+    try:
+        p.start()
+        time.sleep(0.05)
+        p.stop()
+    finally:
+        ev.set()
+        waiter.join()
+    assert p.idle_samples > 0
+    assert all(thread != "idle" for thread, _ in p.stacks)
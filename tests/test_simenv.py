@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import simenv
+import timeline
+
+
+def _ev(kind: str, x: int = 0, y: int = 0, code: int = 0, text: str = "") -> timeline.InputEvent:
+    return timeline.InputEvent(0.0, kind, x, y, code, text)
+
+
+def _click(sim: simenv.SimDesktop, x: int, y: int) -> None:
+    for kind in ("move", "down", "up"):
+        sim.send(_ev(kind, x, y))
+
+
+def _login(sim: simenv.SimDesktop) -> None:
+    _click(sim, 300, 200)
+    sim.send(_ev("text", text="admin"))
+    _click(sim, 300, 270)
+    sim.send(_ev("clipboard", text="hunter2"))
+    for kind, vk in (("key_down", timeline.VK_CONTROL), ("key_down", timeline.VK_V),
+                     ("key_up", timeline.VK_V), ("key_up", timeline.VK_CONTROL)):
+        sim.send(_ev(kind, code=vk))
+    _click(sim, 400, 350)
+
+
+def test_sign_in_rejected_until_fields_match() -> None:
+    sim: simenv.SimDesktop = simenv.SimDesktop(simenv.DEFAULT_SCENARIO)
+    _click(sim, 400, 350)
+    assert sim.state == "login" and sim.counts["rejected"] == 1
+    _click(sim, 10, 10)
+    assert sim.counts["miss"] == 1
+    sim.send(_ev("text", text="lost"))
+    assert sim.counts["type_lost"] == 1
+
+
+def test_login_then_drag_then_delete_reaches_goal() -> None:
+    sim: simenv.SimDesktop = simenv.SimDesktop(simenv.DEFAULT_SCENARIO)
+    _login(sim)
+    assert sim.state == "desktop" and sim.focus == ""
+    sim.send(_ev("move", 140, 140))
+    sim.send(_ev("down"))
+    sim.send(_ev("move", 300, 300))
+    sim.send(_ev("up"))
+    assert sim.state == "desktop" and sim.counts["drop_miss"] == 1
+    sim.send(_ev("move", 140, 140))
+    sim.send(_ev("down"))
+    sim.send(_ev("move", 650, 450))
+    sim.send(_ev("up"))
+    assert sim.state == "confirm"
+    sim.turn = 7
+    _click(sim, 480, 320)
+    assert sim.done and sim.summary()["goal_turn"] == 7 and sim.counts["goal"] == 1
+
+
+def test_decoy_returns_to_previous_state() -> None:
+    sim: simenv.SimDesktop = simenv.SimDesktop(simenv.DEFAULT_SCENARIO)
+    sim.state = "confirm"
+    _click(sim, 300, 320)
+    assert sim.state == "desktop" and not sim.done
+
+
+def test_typed_keys_respect_shift_and_backspace() -> None:
+    sim: simenv.SimDesktop = simenv.SimDesktop(simenv.DEFAULT_SCENARIO)
+    _click(sim, 300, 200)
+    sim.send(_ev("key_down", code=timeline.VK_SHIFT))
+    sim.send(_ev("key_down", code=ord("A")))
+    sim.send(_ev("key_up", code=timeline.VK_SHIFT))
+    sim.send(_ev("key_down", code=ord("B")))
+    sim.send(_ev("key_down", code=simenv.VK_BACK))
+    sim.send(_ev("key_down", code=ord("C")))
+    assert sim.values["user"] == "Ac"
+
+
+def test_plan_follows_the_current_state() -> None:
+    sim: simenv.SimDesktop = simenv.SimDesktop(simenv.DEFAULT_SCENARIO)
+    assert [s["type"] for s in sim.plan()] == ["click", "type"]
+    _login(sim)
+    assert [s["type"] for s in sim.plan()] == ["drag_start", "drag_end"]
+    sim.state = "confirm"
+    assert sim.plan() == [{"type": "click", "box": (430, 300, 550, 340), "widget": "delete"}]
+    sim.state = "done"
+    assert sim.plan() == []
+
+
+def test_render_paints_background_and_widgets() -> None:
+    sim: simenv.SimDesktop = simenv.SimDesktop(simenv.DEFAULT_SCENARIO)
+    buf: bytes = sim.render()
+    assert len(buf) == sim.w * sim.h * 4
+    assert buf[:4] == bytes((56, 48, 48, 255))
+    o: int = (350 * sim.w + 400) * 4
+    assert buf[o:o + 4] == bytes((200, 130, 70, 255))
+
+
+def test_outcomes_are_flushed_as_jsonl(tmp_path: Path) -> None:
+    path: Path = tmp_path / "sim.jsonl"
+    sim: simenv.SimDesktop = simenv.SimDesktop(simenv.DEFAULT_SCENARIO, path)
+    _click(sim, 10, 10)
+    assert not path.exists()
+    sim.close()
+    rec: dict = json.loads(path.read_text("utf-8"))
+    assert rec["event"] == "miss" and rec["state"] == "login"
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+import stagewatch
+
+
+@pytest.fixture()
+def clock(monkeypatch: pytest.MonkeyPatch) -> list[float]:
+    now: list[float] = [1000.0]
+    monkeypatch.setattr(stagewatch.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_overdue_fires_once_after_the_deadline(clock: list[float]) -> None:
+    w: stagewatch.StageWatch = stagewatch.StageWatch({"calling_vlm": 2.0, "off": 0})
+    assert w.deadlines == {"calling_vlm": 2.0}
+    w.enter("calling_vlm", 1)
+    clock[0] += 2.0
+    assert w.check() is None
+    clock[0] += 0.5
+    ev: dict[str, Any] | None = w.check()
+    assert ev is not None and ev["event"] == "overdue" and ev["phase"] == "calling_vlm" and ev["elapsed_s"] == 2.5
+    assert w.check() is None
+    assert w.counts["overdue:calling_vlm"] == 1
+
+
+def test_stage_without_deadline_never_expires(clock: list[float]) -> None:
+    w: stagewatch.StageWatch = stagewatch.StageWatch({"calling_vlm": 2.0})
+    w.enter("executing", 1)
+    clock[0] += 3600.0
+    assert w.check() is None
+
+
+def test_entering_a_stage_rearms_the_deadline(clock: list[float]) -> None:
+    w: stagewatch.StageWatch = stagewatch.StageWatch({"capturing": 1.0})
+    w.enter("capturing", 1)
+    clock[0] += 1.5
+    assert w.fallback("skip")["action"] == "skip"
+    assert w.check() is None
+    w.enter("capturing", 2)
+    clock[0] += 1.5
+    assert w.check() is not None
+
+
+def test_turn_timings(clock: list[float]) -> None:
+    w: stagewatch.StageWatch = stagewatch.StageWatch({})
+    w.enter("capturing", 1)
+    clock[0] += 0.1
+    w.enter("calling_vlm", 1)
+    clock[0] += 0.4
+    done: dict[str, Any] = w.turn_done()
+    assert done == {"stages_ms": {"capturing": 100.0, "calling_vlm": 400.0}, "turn_ms": 500.0}
+    d: dict[str, Any] = w.as_dict()
+    assert d["turns_done"] == 1 and d["worst_turn_ms"] == 500.0 and d["stage_max_ms"]["calling_vlm"] == 400.0
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from typing import Any
+
+import stuckloop
+
+W: int = 64
+H: int = 48
+
+
+def _frame(shade: int = 0, box: tuple[int, int, int, int] | None = None) -> bytes:
+    px: bytearray = bytearray()
+    for y in range(H):
+        for x in range(W):
+            v: int = (x * 4 + y * 2 + shade) & 0xFF
+            if box and box[0] <= x < box[2] and box[1] <= y < box[3]:
+                v = 255 - v
+            px += bytes((v, v, v, 255))
+    return bytes(px)
+
+
+def _click(x: int = 500, y: int = 500) -> list[dict[str, Any]]:
+    return [{"type": "click", "bbox_2d": [x - 10, y - 10, x + 10, y + 10]}]
+
+
+def test_frame_hash_ignores_small_changes_and_sees_big_ones() -> None:
+    base: int = stuckloop.frame_hash(_frame(), W, H)
+    assert stuckloop.frame_hash(_frame(), W, H) == base
+    assert stuckloop.hamming(base, stuckloop.frame_hash(_frame(shade=1), W, H)) <= 3
+    assert stuckloop.hamming(base, stuckloop.frame_hash(_frame(box=(0, 0, W // 2, H)), W, H)) > 3
+    assert stuckloop.frame_hash(b"", W, H) == 0
+
+
+def test_text_hash_is_close_for_near_duplicate_observations() -> None:
+    a: str = "The login dialog is open. I typed the user name and will now click the OK button to continue."
+    near: str = a.replace("now click", "then click")
+    other: str = "A spreadsheet with quarterly revenue numbers is visible; the chart shows a steady decline."
+    assert stuckloop.hamming(stuckloop.text_hash(a), stuckloop.text_hash(near)) <= 8
+    assert stuckloop.hamming(stuckloop.text_hash(a), stuckloop.text_hash(other)) > 8
+
+
+def test_action_key_snaps_to_the_grid() -> None:
+    assert stuckloop.action_key(_click(500, 500)) == stuckloop.action_key(_click(505, 510))
+    assert stuckloop.action_key(_click(500, 500)) != stuckloop.action_key(_click(560, 500))
+
+
+def test_detects_repeated_action_on_a_static_frame_and_recovers() -> None:
+    d: stuckloop.StuckDetector = stuckloop.StuckDetector(window=6, repeats=4)
+    frame: int = stuckloop.frame_hash(_frame(), W, H)
+    hits: list[stuckloop.Detection | None] = [d.update(t, _click(), frame, f"turn {t} unique words {t * 7}")
+                                               for t in range(1, 6)]
+    assert hits[:3] == [None, None, None]
+    assert hits[3] is not None and hits[3].repeats == 4 and hits[3].frame_static == 3
+    assert hits[4] is None and d.active is not None and d.detections == 1
+    moved: int = stuckloop.frame_hash(_frame(box=(0, 0, W // 2, H)), W, H)
+    assert d.update(6, _click(100, 100), moved, "something new") is None
+    assert d.active is None and d.recovered is not None and d.recovered.info["recovered_after"] == 2
+
+
+def test_changing_frame_and_text_is_not_stuck() -> None:
+    d: stuckloop.StuckDetector = stuckloop.StuckDetector(window=6, repeats=4)
+    texts: list[str] = ["alpha beta gamma delta", "one two three four five", "red green blue yellow", "x y z w v u",
+                        "cats and dogs and birds", "north south east west"]
+    for t, text in enumerate(texts):
+        frame: int = stuckloop.frame_hash(_frame(box=(0, 0, (t % 2 + 1) * W // 3, H)), W, H)
+        assert d.update(t, _click(), frame, text) is None
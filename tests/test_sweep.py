@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import argparse
+from typing import Any
+
+import pytest
+
+import sweep
+
+
+def test_parse_param_lists_and_ranges() -> None:
+    assert sweep.parse_param("jpeg=50,75,true,fast") == ("jpeg", [50, 75, True, "fast"])
+    assert sweep.parse_param("delay=0.1..0.5") == ("delay", {"min": 0.1, "max": 0.5})
+    with pytest.raises(argparse.ArgumentTypeError):
+        sweep.parse_param("nokey")
+    with pytest.raises(argparse.ArgumentTypeError):
+        sweep.parse_param("=1,2")
+
+
+def test_grid_is_the_full_product() -> None:
+    grid: list[dict[str, Any]] = sweep.points({"a": [1, 2], "b": ["x", "y", "z"]}, 0, 0)
+    assert len(grid) == 6 and grid[0] == {"a": 1, "b": "x"} and grid[-1] == {"a": 2, "b": "z"}
+
+
+def test_grid_rejects_ranges() -> None:
+    with pytest.raises(ValueError, match="b"):
+        sweep.points({"a": [1], "b": {"min": 0, "max": 1}}, 0, 0)
+
+
+def test_random_points_are_unique_seeded_and_in_range() -> None:
+    space: dict[str, Any] = {"n": {"min": 1, "max": 100}, "f": {"min": 0.0, "max": 1.0}, "c": ["p", "q"]}
+    pts: list[dict[str, Any]] = sweep.points(space, 25, 7)
+    assert pts == sweep.points(space, 25, 7) and pts != sweep.points(space, 25, 8)
+    assert len({(p["n"], p["f"], p["c"]) for p in pts}) == 25
+    for p in pts:
+        assert isinstance(p["n"], int) and 1 <= p["n"] <= 100 and 0.0 <= p["f"] <= 1.0 and p["c"] in ("p", "q")
+
+
+def test_random_stops_when_the_space_is_exhausted() -> None:
+    assert len(sweep.points({"a": [1, 2]}, 10, 0)) == 2
+
+
+def test_overlay_reaches_nested_keys_without_mutating_base() -> None:
+    base: dict[str, Any] = {"capture_crop": {"x1": 0, "x2": 1000}, "jpeg": 80}
+    out: dict[str, Any] = sweep._overlay(base, {"capture_crop.x2": 500, "new.deep.key": 1, "jpeg": 60})
+    assert out == {"capture_crop": {"x1": 0, "x2": 500}, "jpeg": 60, "new": {"deep": {"key": 1}}}
+    assert base == {"capture_crop": {"x1": 0, "x2": 1000}, "jpeg": 80}
+
+
+def test_aggregate_averages_successful_runs_only() -> None:
+    ok: dict[str, Any] = {"success": True, "goal_turn": 4, "turns": 6, "wall_s": 1.0, "turn_mean_ms": 10.0,
+                          "worst_turn_ms": 20.0, "vlm_ms": 5.0, "capture_ms": 1.0, "prompt_tokens": 100,
+                          "completion_tokens": 10, "vlm_failed": 0, "vlm_truncated": 0, "breaker_opens": 0}
+    row: dict[str, Any] = sweep.aggregate({"a": 1}, [ok, {**ok, "success": False, "goal_turn": None, "turns": 10},
+                                                      {"error": "timeout"}])
+    assert (row["runs"], row["errors"], row["success_rate"]) == (3, 1, 0.333)
+    assert row["goal_turn"] == 4.0 and row["turns"] == 8.0
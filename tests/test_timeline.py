@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import replace
+from typing import Any
+
+import pytest
+
+import timeline
+
+VK_MAP: dict[str, int] = {"enter": 0x0D, "tab": 0x09, "ctrl": 0x11, "shift": 0x10}
+
+
+def _timing(mode: str) -> timeline.Timing:
+    return timeline.Timing(
+        settle=0.0, action_delay=0.0, char_hold=0.0, key_hold=0.0, double_click_gap=0.0, drag_steps=1,
+        drag_step_delay=0.0, hotkey_gap=0.0, type_mode=mode, batch_delay=0.0, paste_settle=0.0,
+    )
+
+
+def _types(*texts: str) -> list[dict[str, Any]]:
+    return [{"type": "type", "bbox_2d": [0, 0, 10, 10], "params": t} for t in texts]
+
+
+def _run(actions: list[dict[str, Any]], mode: str, rb: timeline.RecordingBackend | None = None) -> dict[str, Any]:
+    rb = rb or timeline.RecordingBackend()
+    tl: timeline.Timeline = timeline.compile_actions(actions, lambda x, y: (x, y), _timing(mode), VK_MAP)
+    return timeline.replay(tl, rb, rb)
+
+
+@pytest.mark.parametrize("mode", ["unicode", "paste", "keys"])
+def test_every_text_of_a_turn_verifies(mode: str) -> None:
+    rb: timeline.RecordingBackend = timeline.RecordingBackend()
+    stats: dict[str, Any] = _run(_types("hello", "World 42"), mode, rb)
+    assert stats["type_verify_failed"] == 0
+    assert rb.typed_text() == "helloWorld 42"
+
+
+@pytest.mark.parametrize("mode", ["unicode", "paste"])
+def test_crlf_text_verifies(mode: str) -> None:
+    rb: timeline.RecordingBackend = timeline.RecordingBackend()
+    assert _run(_types("line one\r\nline two\r\n", "x"), mode, rb)["type_verify_failed"] == 0
+    assert rb.typed_text() == "line one\nline two\nx"
+
+
+def test_texts_verify_across_turns() -> None:
+    rb: timeline.RecordingBackend = timeline.RecordingBackend()
+    _run(_types("first"), "unicode", rb)
+    assert _run(_types("second", "third"), "unicode", rb)["type_verify_failed"] == 0
+
+
+class _Dropping(timeline.RecordingBackend):
+    def send(self, ev: timeline.InputEvent) -> None:
+        if ev.kind == "text" and ev.text.startswith("wor"):
+            return
+        super().send(ev)
+
+
+def test_lost_text_fails_only_its_own_entry() -> None:
+    rb: _Dropping = _Dropping()
+    tl: timeline.Timeline = timeline.compile_actions(
+        _types("hello", "world", "again"), lambda x, y: (x, y), _timing("unicode"), VK_MAP,
+    )
+    assert timeline.replay(tl, rb, rb)["type_verify_failed"] == 1
+
+
+def test_typed_text_slices_and_cap() -> None:
+    rb: timeline.RecordingBackend = timeline.RecordingBackend(keep=2)
+    _run(_types("abcdefgh"), "unicode", rb)
+    start: int = rb.mark()
+    _run(_types("xyz"), "unicode", rb)
+    assert rb.typed_text(start, rb.mark()) == "xyz"
+    assert rb.typed_text() == "defghxyz"
+    assert not rb.verify("abc", 0, 3)
+
+
+def _act(atype: str, x: int, y: int, params: str = "") -> dict[str, Any]:
+    return {"type": atype, "bbox_2d": [x, y, x, y], "params": params}
+
+
+def _compile(actions: list[dict[str, Any]], **kw: Any) -> timeline.Timeline:
+    tm: timeline.Timing = replace(_timing("unicode"), **kw)
+    return timeline.compile_actions(actions, lambda x, y: (x, y), tm, VK_MAP)
+
+
+def test_moves_to_the_same_point_are_coalesced() -> None:
+    tl: timeline.Timeline = _compile([_act("click", 100, 100), _act("click", 100, 100), _act("click", 200, 50)])
+    assert [(e.kind, e.x, e.y) for e in tl.events if e.kind == "move"] == [("move", 100, 100), ("move", 200, 50)]
+    assert [e.kind for e in tl.events] == ["move", "down", "up", "down", "up", "move", "down", "up"]
+    assert tl.coalesced == 1
+
+
+def test_drag_path_steps_with_button_held() -> None:
+    tl: timeline.Timeline = _compile([_act("drag_start", 0, 0), _act("drag_end", 100, 50)], drag_steps=4)
+    kinds: list[str] = [e.kind for e in tl.events]
+    assert kinds == ["move", "down", "move", "move", "move", "move", "up"]
+    assert [(e.x, e.y) for e in tl.events if e.kind == "move"] == [(0, 0), (25, 12), (50, 25), (75, 37), (100, 50)]
+    assert tl.actions == 2
+
+
+def test_duration_is_the_sum_of_planned_waits() -> None:
+    tl: timeline.Timeline = _compile(
+        [_act("click", 10, 10), _act("drag_start", 0, 0), _act("drag_end", 40, 0)],
+        settle=0.01, action_delay=0.05, drag_steps=2, drag_step_delay=0.02,
+    )
+    click: float = 0.01 * 2 + 0.05
+    drag: float = 0.01 * 3 + 0.02 * 2 + 0.05
+    assert tl.duration == pytest.approx(click + drag)
+    assert [e.at for e in tl.events] == sorted(e.at for e in tl.events)
+
+
+def test_replay_follows_the_schedule_and_reports_jitter() -> None:
+    tl: timeline.Timeline = _compile([_act("click", 1, 1), _act("click", 5, 5)], settle=0.02, action_delay=0.03)
+    rb: timeline.RecordingBackend = timeline.RecordingBackend()
+    stats: dict[str, Any] = timeline.replay(tl, rb)
+    assert stats["events"] == len(tl.events) == len(rb.events)
+    assert [r["kind"] for r in rb.events] == [e.kind for e in tl.events]
+    t0: float = rb.events[0]["t"]
+    for rec, ev in zip(rb.events, tl.events):
+        assert rec["t"] - t0 >= ev.at - 0.002
+    assert 0.0 <= stats["jitter_mean_ms"] <= stats["jitter_max_ms"] < 50.0
+    assert stats["actual_ms"] >= stats["planned_ms"] == pytest.approx(tl.duration * 1000, abs=1e-3)
+    assert not stats["aborted"]
+
+
+@pytest.mark.parametrize(("actions", "held"), [
+    ([_act("hotkey", 0, 0, "ctrl shift")], [("key_up", 0x10), ("key_up", 0x11)]),
+    ([_act("drag_start", 0, 0), _act("drag_end", 100, 0)], [("up", "left")]),
+])
+def test_abort_releases_held_keys_and_buttons(actions: list[dict[str, Any]], held: list[tuple[str, Any]]) -> None:
+    tl: timeline.Timeline = _compile(actions, settle=0.02, hotkey_gap=0.02, drag_steps=2, drag_step_delay=5.0)
+    rb: timeline.RecordingBackend = timeline.RecordingBackend()
+    abort: threading.Event = threading.Event()
+    cut: int = next(i for i, e in enumerate(tl.events) if e.at > 0.03)
+    timer: threading.Timer = threading.Timer(tl.events[cut - 1].at + 0.01, abort.set)
+    timer.start()
+    stats: dict[str, Any] = timeline.replay(tl, rb, abort=abort)
+    timer.cancel()
+    assert stats["aborted"] and stats["events"] == cut
+    released: list[tuple[str, Any]] = [(r["kind"], r.get("vk", r.get("button"))) for r in list(rb.events)[cut:]]
+    assert sorted(released) == sorted(held)
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+import franz
+import timeline
+
+
+@pytest.fixture()
+def sent(monkeypatch: pytest.MonkeyPatch) -> list[tuple[Any, ...]]:
+    out: list[tuple[Any, ...]] = []
+    monkeypatch.setattr(franz, "_winmm", SimpleNamespace(timeBeginPeriod=lambda n: 0), raising=False)
+    monkeypatch.setattr(franz, "_send_unicode", lambda text: out.append(("text", text)))
+    monkeypatch.setattr(franz, "_kev", lambda code, up=False: out.append(("key", code, up)))
+    return out
+
+
+def _paste(text: str) -> list[timeline.InputEvent]:
+    tl: timeline.Timeline = timeline.compile_actions(
+        [{"type": "type", "bbox_2d": [0, 0, 10, 10], "params": text}], lambda x, y: (x, y),
+        timeline.Timing(type_mode="paste"), {},
+    )
+    return tl.events
+
+
+def test_failed_clipboard_types_instead_of_pasting(
+    sent: list[tuple[Any, ...]], monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(franz, "_set_clipboard", lambda text: False)
+    be: franz.Win32Backend = franz.Win32Backend()
+    for ev in _paste("one\ntwo"):
+        be.send(ev)
+    assert sent == [("text", "one"), ("key", timeline.VK_RETURN, False), ("key", timeline.VK_RETURN, True),
+                    ("text", "two")]
+    assert be.paste_fallbacks == 1 and not be._skip_paste
+
+
+def test_clipboard_ok_sends_ctrl_v(sent: list[tuple[Any, ...]], monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(franz, "_set_clipboard", lambda text: True)
+    be: franz.Win32Backend = franz.Win32Backend()
+    for ev in _paste("hello"):
+        be.send(ev)
+    assert [s[1] for s in sent] == [timeline.VK_CONTROL, timeline.VK_V, timeline.VK_V, timeline.VK_CONTROL]
+    assert be.paste_fallbacks == 0
@@ -0,0 +1,486 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Final, Protocol
+
+VK_SHIFT: Final[int] = 0x10
+VK_CONTROL: Final[int] = 0x11
+VK_MENU: Final[int] = 0x12
+VK_RETURN: Final[int] = 0x0D
+VK_TAB: Final[int] = 0x09
+VK_V: Final[int] = 0x56
+WHEEL_DELTA: Final[int] = 120
+SPIN_WINDOW: Final[float] = 0.0015
+
+log: Final[logging.Logger] = logging.getLogger("franz.timeline")
+
+
+@dataclass
+class InputEvent:
+    at: float
+    kind: str
+    x: int = 0
+    y: int = 0
+    code: int = 0
+    text: str = ""
+
+    def as_dict(self) -> dict[str, Any]:
+        d: dict[str, Any] = {"at": round(self.at, 6), "kind": self.kind}
+        if self.kind == "move":
+            d["x"], d["y"] = self.x, self.y
+        elif self.kind in ("down", "up"):
+            d["button"] = "right" if self.code else "left"
+        elif self.kind == "wheel":
+            d["delta"] = self.code
+        elif self.kind in ("key_down", "key_up"):
+            d["vk"] = self.code
+        elif self.kind == "text":
+            d["chars"] = len(self.text)
+        if self.text:
+            d["text"] = self.text
+        return d
+
+
+@dataclass
+class Timing:
+    action_delay: float = 0.05
+    settle: float = 0.03
+    double_click_gap: float = 0.05
+    drag_steps: int = 20
+    drag_step_delay: float = 0.01
+    key_hold: float = 0.03
+    char_hold: float = 0.01
+    char_gap: float = 0.02
+    hotkey_gap: float = 0.02
+    type_mode: str = "auto"
+    paste_threshold: int = 64
+    batch_size: int = 32
+    batch_delay: float = 0.005
+    paste_settle: float = 0.05
+
+
+@dataclass
+class Timeline:
+    events: list[InputEvent] = field(default_factory=list)
+    duration: float = 0.0
+    actions: int = 0
+    coalesced: int = 0
+    typed: list[str] = field(default_factory=list)
+    typed_spans: list[tuple[int, int]] = field(default_factory=list)
+
+
+class InputBackend(Protocol):
+    name: str
+
+    def send(self, ev: InputEvent) -> None: ...
+
+    def flush(self) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class TypeVerifier(Protocol):
+    def mark(self) -> int: ...
+
+    def verify(self, text: str, start: int, end: int) -> bool: ...
+
+
+def normalize_typed(text: str) -> str:
+    return "".join(ch for ch in text.replace("\r\n", "\n") if ch in "\n\t" or ch.isprintable())
+
+
+class RecordingBackend:
+    name: str = "recording"
+
+    def __init__(self, path: Path | None = None, keep: int = 10000) -> None:
+        self.path: Path | None = path
+        self.events: deque[dict[str, Any]] = deque(maxlen=keep)
+        self.keep_chars: int = max(1, keep) * 4
+        self._pending: list[str] = []
+        self._t0: float = time.perf_counter()
+        self._chunks: list[str] = []
+        self._base: int = 0
+        self._len: int = 0
+        self._clip: str = ""
+        self._shift: bool = False
+        self._ctrl: bool = False
+
+    def send(self, ev: InputEvent) -> None:
+        rec: dict[str, Any] = ev.as_dict()
+        rec["t"] = round(time.perf_counter() - self._t0, 6)
+        rec["ts"] = round(time.time(), 6)
+        self.events.append(rec)
+        self._type(ev)
+        if self.path is not None:
+            self._pending.append(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+
+    def _type(self, ev: InputEvent) -> None:
+        kind: str = ev.kind
+        out: str = ""
+        if kind == "text":
+            out = ev.text
+        elif kind == "clipboard":
+            self._clip = ev.text.replace("\r\n", "\n")
+        elif kind in ("key_down", "key_up"):
+            vk: int = ev.code
+            down: bool = kind == "key_down"
+            if vk == VK_SHIFT:
+                self._shift = down
+            elif vk == VK_CONTROL:
+                self._ctrl = down
+            elif not down:
+                pass
+            elif self._ctrl:
+                if vk == VK_V:
+                    out = self._clip
+            elif vk == VK_RETURN:
+                out = "\n"
+            elif vk == VK_TAB:
+                out = "\t"
+            elif 0x30 <= vk <= 0x5A or vk == 0x20:
+                out = chr(vk) if self._shift else chr(vk).lower()
+        if out:
+            self._chunks.append(out)
+            self._len += len(out)
+
+    def flush(self) -> None:
+        if self.path is None or not self._pending:
+            return
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write("\n".join(self._pending))
+            f.write("\n")
+        self._pending.clear()
+
+    def close(self) -> None:
+        self.flush()
+
+    def _text(self) -> str:
+        if len(self._chunks) != 1:
+            text: str = "".join(self._chunks)
+            if len(text) > self.keep_chars:
+                self._base += len(text) - self.keep_chars
+                text = text[-self.keep_chars:]
+            self._chunks = [text]
+        return self._chunks[0]
+
+    def typed_text(self, start: int = 0, end: int | None = None) -> str:
+        lo: int = max(0, start - self._base)
+        return self._text()[lo:None if end is None else max(lo, end - self._base)]
+
+    def mark(self) -> int:
+        return self._len
+
+    def verify(self, text: str, start: int, end: int) -> bool:
+        return start >= self._base and normalize_typed(self.typed_text(start, end)) == normalize_typed(text)
+
+
+def ascii_vk_scan(ch: str) -> int:
+    if "a" <= ch <= "z" or "0" <= ch <= "9":
+        return ord(ch.upper())
+    if "A" <= ch <= "Z":
+        return ord(ch) | 0x100
+    if ch == " ":
+        return 0x20
+    if ch == "\n":
+        return 0x0D
+    if ch == "\t":
+        return 0x09
+    return -1
+
+
+class _Builder:
+    def __init__(self) -> None:
+        self.events: list[InputEvent] = []
+        self.t: float = 0.0
+        self.pos: tuple[int, int] | None = None
+        self.held: int = 0
+        self.coalesced: int = 0
+
+    def emit(self, kind: str, code: int = 0, text: str = "") -> None:
+        self.events.append(InputEvent(self.t, kind, code=code, text=text))
+
+    def move(self, x: int, y: int) -> None:
+        if self.pos == (x, y):
+            self.coalesced += 1
+            return
+        last: InputEvent | None = self.events[-1] if self.events else None
+        if last is not None and last.kind == "move" and not self.held:
+            last.x, last.y = x, y
+            self.coalesced += 1
+        else:
+            self.events.append(InputEvent(self.t, "move", x, y))
+        self.pos = (x, y)
+
+    def button(self, right: bool, up: bool) -> None:
+        self.emit("up" if up else "down", 1 if right else 0)
+        self.held += -1 if up else 1
+
+    def key(self, vk: int, up: bool = False) -> None:
+        self.emit("key_up" if up else "key_down", vk)
+
+    def wait(self, s: float) -> None:
+        self.t += max(0.0, s)
+
+
+def _scroll_clicks(params: str) -> int:
+    p: str = params.strip()
+    return int(p) if p.isdigit() else 3
+
+
+def _center(bbox: list[int]) -> tuple[int, int]:
+    return (bbox[0] + bbox[2]) // 2, (bbox[1] + bbox[3]) // 2
+
+
+def _compile_unicode(b: _Builder, text: str, tm: Timing) -> None:
+    n: int = max(1, tm.batch_size)
+    run: list[str] = []
+
+    def flush_run() -> None:
+        s: str = "".join(run)
+        for i in range(0, len(s), n):
+            b.emit("text", text=s[i:i + n])
+            b.wait(tm.batch_delay)
+        run.clear()
+
+    for ch in text.replace("\r\n", "\n"):
+        if ch in ("\n", "\t"):
+            flush_run()
+            vk: int = VK_RETURN if ch == "\n" else VK_TAB
+            b.key(vk)
+            b.wait(tm.char_hold)
+            b.key(vk, True)
+            b.wait(tm.batch_delay)
+        elif ch.isprintable():
+            run.append(ch)
+    flush_run()
+
+
+def _compile_paste(b: _Builder, text: str, tm: Timing) -> None:
+    b.emit("clipboard", text=text.replace("\r\n", "\n").replace("\n", "\r\n"))
+    b.wait(tm.char_hold)
+    b.key(VK_CONTROL)
+    b.key(VK_V)
+    b.wait(tm.char_hold)
+    b.key(VK_V, True)
+    b.key(VK_CONTROL, True)
+    b.wait(tm.paste_settle)
+
+
+def type_mode(text: str, tm: Timing) -> str:
+    mode: str = tm.type_mode.lower()
+    if mode in ("keys", "unicode", "paste"):
+        return mode
+    if len(text) >= tm.paste_threshold or text.count("\n") > 1:
+        return "paste"
+    return "unicode"
+
+
+def _compile_keys(b: _Builder, text: str, tm: Timing, vk_scan: Callable[[str], int]) -> int:
+    fallback: int = 0
+    for ch in text:
+        vs: int = vk_scan(ch)
+        if vs == -1:
+            fallback += 1
+            _compile_unicode(b, ch, tm)
+            continue
+        mods: list[int] = [m for bit, m in ((0x200, VK_CONTROL), (0x400, VK_MENU), (0x100, VK_SHIFT)) if vs & bit]
+        for m in mods:
+            b.key(m)
+        b.key(vs & 0xFF)
+        b.wait(tm.char_hold)
+        b.key(vs & 0xFF, True)
+        for m in reversed(mods):
+            b.key(m, True)
+        b.wait(tm.char_gap)
+    return fallback
+
+
+def _hotkey_vks(keys_str: str, vk_map: dict[str, int], vk_scan: Callable[[str], int]) -> list[int]:
+    vks: list[int] = []
+    for k in (k.strip().lower() for k in keys_str.split()):
+        vk: int | None = vk_map.get(k)
+        if vk is not None:
+            vks.append(vk)
+        elif len(k) == 1:
+            vs: int = vk_scan(k)
+            if vs != -1:
+                vks.append(vs & 0xFF)
+    return vks
+
+
+def compile_actions(
+    actions: list[dict[str, Any]],
+    to_screen: Callable[[int, int], tuple[int, int]],
+    tm: Timing,
+    vk_map: dict[str, int],
+    vk_scan: Callable[[str], int] = ascii_vk_scan,
+) -> Timeline:
+    b: _Builder = _Builder()
+    drag_start: tuple[int, int] | None = None
+    ds: int = max(1, tm.drag_steps)
+    typed: list[str] = []
+    spans: list[tuple[int, int]] = []
+    for a in actions:
+        atype: str = a.get("type", "")
+        sx, sy = to_screen(*_center(a["bbox_2d"]))
+        params: str = a.get("params", "")
+        match atype:
+            case "click" | "right_click":
+                log.debug("exec %s (%d,%d)", atype, sx, sy)
+                right: bool = atype == "right_click"
+                b.move(sx, sy)
+                b.wait(tm.settle)
+                b.button(right, False)
+                b.wait(tm.settle)
+                b.button(right, True)
+            case "double_click":
+                log.debug("exec double_click (%d,%d)", sx, sy)
+                b.move(sx, sy)
+                b.wait(tm.settle)
+                b.button(False, False)
+                b.wait(tm.settle)
+                b.button(False, True)
+                b.wait(tm.double_click_gap)
+                b.button(False, False)
+                b.wait(tm.settle)
+                b.button(False, True)
+            case "drag_start":
+                drag_start = (sx, sy)
+                log.debug("exec drag_start (%d,%d)", sx, sy)
+                continue
+            case "drag_end":
+                bx, by = drag_start if drag_start is not None else (sx, sy)
+                log.debug("exec drag (%d,%d)->(%d,%d)", bx, by, sx, sy)
+                b.move(bx, by)
+                b.wait(tm.settle)
+                b.button(False, False)
+                b.wait(tm.settle)
+                for i in range(1, ds + 1):
+                    b.move(bx + (sx - bx) * i // ds, by + (sy - by) * i // ds)
+                    b.wait(tm.drag_step_delay)
+                b.wait(tm.settle)
+                b.button(False, True)
+                drag_start = None
+            case "scroll_up" | "scroll_down":
+                clicks: int = _scroll_clicks(params)
+                log.debug("exec %s %d at (%d,%d)", atype, clicks, sx, sy)
+                b.move(sx, sy)
+                b.wait(tm.settle)
+                for _ in range(clicks):
+                    b.emit("wheel", WHEEL_DELTA if atype == "scroll_up" else -WHEEL_DELTA)
+                    b.wait(tm.settle)
+            case "type":
+                first: int = len(b.events)
+                mode: str = type_mode(params, tm)
+                log.debug("exec type len=%d mode=%s", len(params), mode)
+                if mode == "paste":
+                    _compile_paste(b, params, tm)
+                elif mode == "unicode":
+                    _compile_unicode(b, params, tm)
+                elif fallback := _compile_keys(b, params, tm, vk_scan):
+                    log.debug("exec type %d unmapped chars sent as unicode", fallback)
+                typed.append(params)
+                spans.append((first, len(b.events)))
+            case "hotkey":
+                log.debug("exec hotkey '%s'", params)
+                vks: list[int] = _hotkey_vks(params, vk_map, vk_scan)
+                for vk in vks:
+                    b.key(vk)
+                    b.wait(tm.hotkey_gap)
+                for vk in reversed(vks):
+                    b.key(vk, True)
+                    b.wait(tm.hotkey_gap)
+            case "key":
+                key_name: str = params.strip().lower()
+                vk_val: int | None = vk_map.get(key_name)
+                if vk_val is None:
+                    log.warning("exec unknown key '%s'", key_name)
+                else:
+                    log.debug("exec key '%s' vk=0x%02X", key_name, vk_val)
+                    b.key(vk_val)
+                    b.wait(tm.key_hold)
+                    b.key(vk_val, True)
+            case _:
+                log.warning("exec unknown action type: '%s'", atype)
+        b.wait(tm.action_delay)
+    return Timeline(events=b.events, duration=b.t, actions=len(actions), coalesced=b.coalesced, typed=typed,
+                    typed_spans=spans)
+
+
+def _sleep_until(target: float, abort: threading.Event | None = None) -> bool:
+    while True:
+        rem: float = target - time.perf_counter()
+        if rem <= 0:
+            return abort is None or not abort.is_set()
+        if rem > SPIN_WINDOW:
+            if abort is None:
+                time.sleep(rem - SPIN_WINDOW)
+            elif abort.wait(rem - SPIN_WINDOW):
+                return False
+
+
+def _release(backend: InputBackend, buttons: set[int], keys: set[int]) -> None:
+    for b in buttons:
+        backend.send(InputEvent(0.0, "up", code=b))
+    for vk in keys:
+        backend.send(InputEvent(0.0, "key_up", code=vk))
+
+
+def replay(
+    tl: Timeline, backend: InputBackend, verify: TypeVerifier | None = None,
+    abort: threading.Event | None = None,
+) -> dict[str, Any]:
+    late: list[float] = []
+    buttons: set[int] = set()
+    keys: set[int] = set()
+    aborted: bool = False
+    marks: list[int] = []
+    t0: float = time.perf_counter()
+    for ev in tl.events:
+        target: float = t0 + ev.at
+        if not _sleep_until(target, abort):
+            aborted = True
+            break
+        late.append(time.perf_counter() - target)
+        if verify is not None:
+            marks.append(verify.mark())
+        backend.send(ev)
+        if ev.kind in ("down", "up"):
+            (buttons.add if ev.kind == "down" else buttons.discard)(ev.code)
+        elif ev.kind in ("key_down", "key_up"):
+            (keys.add if ev.kind == "key_down" else keys.discard)(ev.code)
+    if aborted:
+        _release(backend, buttons, keys)
+        log.warning("replay aborted after %d of %d events, released %d buttons %d keys",
+                    len(late), len(tl.events), len(buttons), len(keys))
+    else:
+        _sleep_until(t0 + tl.duration, abort)
+    actual: float = time.perf_counter() - t0
+    backend.flush()
+    n: int = len(late)
+    failed: list[int] = []
+    if verify is not None and not aborted:
+        marks.append(verify.mark())
+        failed = [i for i, (text, (s, e)) in enumerate(zip(tl.typed, tl.typed_spans))
+                  if not verify.verify(text, marks[s], marks[e])]
+        if failed:
+            log.warning("type verify failed for %d of %d texts", len(failed), len(tl.typed))
+    return {
+        "backend": backend.name,
+        "actions": tl.actions,
+        "events": n,
+        "coalesced": tl.coalesced,
+        "planned_ms": round(tl.duration * 1000, 3),
+        "actual_ms": round(actual * 1000, 3),
+        "jitter_mean_ms": round(sum(late) / n * 1000, 3) if n else 0.0,
+        "jitter_max_ms": round(max(late) * 1000, 3) if n else 0.0,
+        "typed_chars": sum(len(t) for t in tl.typed),
+        "type_verify_failed": len(failed),
+        "aborted": aborted,
+    }